@@ -1,62 +1,59 @@
 import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import os
-import akshare as ak
-from scipy import stats
+from config import DATA_CONFIG
+from data_provider import get_provider
+from data_cache import get_daily_bars, get_cache_stats
+from benchmark_store import get_index_weekly
+from timing import StageTimer
+from trading_calendar import FUND_NAV_TIME
+from metadata_store import get_info, put_info
+from single_flight import single_flight
+from regression_kernels import last_window_linregress, rolling_linregress
 import warnings
 warnings.filterwarnings('ignore')
 
 # ===================== 基础数据获取函数（小幅优化） =====================
+@single_flight("fetch_fund_info")
 def fetch_fund_info(fund_code: str) -> dict:
-    try:
-        df = ak.fund_individual_basic_info_xq(symbol=fund_code)
-    except Exception as e:
-        print(f"获取基金{fund_code}信息失败: {str(e)}")
-        return {}
-    info = {}
-    for _, row in df.iterrows():
-        k = str(row.get("item", "")).strip()
-        v = str(row.get("value", "")).strip()
-        if k:
-            info[k] = v
+    """基本信息：优先本地信息库（有效期 DATA_CONFIG['metadata_days']），雪球接口较慢，只在未命中时请求"""
+    provider = get_provider()
+    if provider.use_cache:
+        info = get_info("fund", fund_code)
+        if info is not None:
+            return info
+    info = provider.fund_info(fund_code)
+    if not info:
+        # 接口失败时退回预加载的代码列表（名称、类型）
+        return (get_info("fund", fund_code, full=False) or {}) if provider.use_cache else {}
     info["基金代码"] = fund_code
+    if provider.use_cache:
+        put_info("fund", fund_code, info)
     return info
 
-def fetch_fund_weekly_nav(fund_code: str, years: int = 3) -> pd.DataFrame:
-    end_date = datetime.now().strftime("%Y%m%d")
-    start_date = (datetime.now() - timedelta(days=365 * years)).strftime("%Y%m%d")
-    try:
-        df = ak.fund_open_fund_info_em(symbol=fund_code, indicator="单位净值走势")
-    except Exception:
-        try:
-            df = ak.fund_em_open_fund_info(fund=fund_code, indicator="单位净值走势")
-        except Exception:
-            return pd.DataFrame()
-    
-    if df is None or len(df) == 0:
-        return pd.DataFrame()
-    
-    # 统一日期列名和格式
-    date_col = "净值日期" if "净值日期" in df.columns else "日期" if "日期" in df.columns else None
-    if not date_col:
-        return pd.DataFrame()
-    
-    df["date"] = pd.to_datetime(df[date_col])
-    df = df[(df["date"] >= pd.to_datetime(start_date)) & (df["date"] <= pd.to_datetime(end_date))]
-    
-    # 统一净值列名
-    price_col = "单位净值" if "单位净值" in df.columns else "收盘" if "收盘" in df.columns else None
-    if not price_col:
-        return pd.DataFrame()
-    
-    df[price_col] = pd.to_numeric(df[price_col], errors="coerce")
-    df = df.sort_values("date").dropna(subset=[price_col, "date"]).set_index("date")
-    
-    # 周频重采样（周五），补充多个均线
-    weekly = df[[price_col]].resample("W-FRI").last().dropna()
-    weekly = weekly.rename(columns={price_col: "close"})
+# 日线缓存候选键：(数据源, 复权类型)
+FUND_NAV_SOURCES = [("em_fund_nav", ""), ("em_fund_nav_legacy", "")]
+
+def _download_fund_nav(fund_code: str) -> tuple:
+    """由当前数据源下载基金完整单位净值走势，返回 (日线, 数据源, 复权类型)"""
+    return get_provider().fund_nav(fund_code)
+
+def _date_window(daily: pd.DataFrame, years: int) -> pd.DataFrame:
+    """截取最近 years 年的日线，并去掉价格缺失的行"""
+    end_date = pd.to_datetime(datetime.now().strftime("%Y%m%d"))
+    start_date = pd.to_datetime((datetime.now() - timedelta(days=365 * years)).strftime("%Y%m%d"))
+    daily = daily[(daily.index >= start_date) & (daily.index <= end_date)]
+    return daily.dropna(subset=["close"])
+
+def build_fund_weekly(daily: pd.DataFrame) -> pd.DataFrame:
+    """净值日线 → 周线（W-FRI），附加多周期均线、收益率和20周波动率"""
+    weekly = daily[["close"]].resample("W-FRI").last().dropna()
     
     # 增加多周期均线（10/20/30周）
     weekly["ma10"] = weekly["close"].rolling(10).mean()
@@ -72,63 +69,60 @@ def fetch_fund_weekly_nav(fund_code: str, years: int = 3) -> pd.DataFrame:
     
     return weekly.dropna()
 
-def fetch_index_weekly_close(index_symbol: str = "sh000300", years: int = 5) -> pd.DataFrame:
-    end_date = datetime.now().strftime("%Y%m%d")
-    start_date = (datetime.now() - timedelta(days=365 * years)).strftime("%Y%m%d")
-    
-    try:
-        df = ak.stock_zh_index_daily(symbol=index_symbol)
-    except Exception:
-        try:
-            code = index_symbol.replace("sh", "").replace("sz", "")
-            df = ak.index_zh_a_hist(symbol=code, period="daily")
-        except Exception as e:
-            print(f"获取指数{index_symbol}数据失败: {str(e)}")
-            return pd.DataFrame()
-    
-    if df is None or len(df) == 0:
-        return pd.DataFrame()
-    
-    # 统一日期和价格列
-    date_col = "日期" if "日期" in df.columns else "date" if "date" in df.columns else None
-    price_col = "收盘" if "收盘" in df.columns else "close" if "close" in df.columns else None
-    if not date_col or not price_col:
+@single_flight("fetch_fund_daily_nav")
+def fetch_fund_daily_nav(fund_code: str, max_age_hours: float = None) -> pd.DataFrame:
+    """
+    获取完整净值日线（优先本地缓存，当晚净值公布后才过期）
+    净值接口不支持日期区间，过期时仍需下载完整走势，但只把尾部的行合并进缓存；无法合并时直接使用这次下载
+    """
+    return get_daily_bars(fund_code, FUND_NAV_SOURCES, lambda start: _download_fund_nav(fund_code),
+                          max_age_hours=max_age_hours, use_cache=get_provider().use_cache,
+                          publish_time=FUND_NAV_TIME, ranged=False)
+
+def fetch_fund_weekly_nav(fund_code: str, years: int = 3) -> pd.DataFrame:
+    daily = fetch_fund_daily_nav(fund_code)
+    if len(daily) == 0:
         return pd.DataFrame()
-    
-    df["date"] = pd.to_datetime(df[date_col])
-    df = df[(df["date"] >= pd.to_datetime(start_date)) & (df["date"] <= pd.to_datetime(end_date))]
-    df[price_col] = pd.to_numeric(df[price_col], errors="coerce")
-    
-    df = df.sort_values("date").dropna(subset=[price_col, "date"]).set_index("date")
-    
-    # 周频重采样
-    weekly = df[[price_col]].resample("W-FRI").last().dropna()
-    weekly = weekly.rename(columns={price_col: "close"})
-    weekly["ret"] = weekly["close"].pct_change()
-    weekly["log_ret"] = np.log(weekly["close"] / weekly["close"].shift(1))
-    
-    return weekly.dropna()
+    return build_fund_weekly(_date_window(daily, years))
+
+def fetch_index_weekly_close(index_symbol: str = "sh000300", years: int = 5) -> pd.DataFrame:
+    # 基准指数由进程内共享存储提供，每个交易时段只加载一次
+    return get_index_weekly(index_symbol, years, with_log_ret=True)
+
+def sync_fund_nav(fund_codes: list) -> dict:
+    """
+    批量同步基金净值（适合净值公布后的夜间任务），返回本次同步的缓存统计增量
+    """
+    before = get_cache_stats()
+    for code in fund_codes:
+        fetch_fund_daily_nav(code, max_age_hours=0)
+    after = get_cache_stats()
+    return {k: after[k] - before[k] for k in ("incremental", "full", "rows_fetched", "errors")}
 
 # ===================== 核心分析函数（重点优化） =====================
 def compute_ma_slope(series: pd.Series, window: int = 10) -> tuple[float, float]:
     """
     计算均线斜率 + R²（拟合优度），更准确判断趋势
+    斜率已按窗口均值标准化（消除量纲影响）
     return: (斜率, R²)
     """
     if len(series.dropna()) < window:
         return 0.0, 0.0
     
-    series_clean = series.dropna().iloc[-window:]
-    x = np.arange(len(series_clean))
-    y = series_clean.values
-    
-    # 线性回归
-    slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
-    
-    # 标准化斜率（消除量纲影响）
-    slope_normalized = slope / series_clean.mean() * 100
-    
-    return slope_normalized, r_value **2
+    _, slope_normalized, r2 = last_window_linregress(series.dropna().to_numpy(dtype=float), window)
+    return slope_normalized, r2
+
+def _stage_reason(rule: int, diff30: float, slope30: float, r2_30: float, vol_ratio: float) -> str:
+    """阶段判断理由；rule 为命中的规则（4/2/3/1），0 表示无明确特征"""
+    if rule == 4:
+        return f"价格低于30周均线{diff30:.1f}%，均线斜率{slope30:.2f}（R²={r2_30:.2f}），空头排列，确认下跌趋势"
+    if rule == 2:
+        return f"价格高于30周均线{diff30:.1f}%，均线斜率{slope30:.2f}（R²={r2_30:.2f}），多头排列，量能充足，确认上升趋势"
+    if rule == 3:
+        return f"价格在均线上方但均线走平，短期波动加大（波动率{vol_ratio:.1f}倍），顶部震荡特征"
+    if rule == 1:
+        return f"价格接近均线（偏离{diff30:.1f}%），成交量萎缩（波动率{vol_ratio:.1f}倍），筑底特征明显"
+    return f"无明确趋势特征，均线偏离{diff30:.1f}%，斜率{slope30:.2f}，暂归为筑底观察"
 
 def judge_stage_enhanced(weekly_df: pd.DataFrame) -> dict:
     """
@@ -173,34 +167,34 @@ def judge_stage_enhanced(weekly_df: pd.DataFrame) -> dict:
         ma_arrangement == -1 and close < prev_week["close"]):
         stage = 4
         confidence = min(0.9, abs(slope30)/1 + (abs(diff30)/5) + (1 - vol_ratio/2))
-        reason = f"价格低于30周均线{diff30:.1f}%，均线斜率{slope30:.2f}（R²={r2_30:.2f}），空头排列，确认下跌趋势"
+        reason = _stage_reason(4, diff30, slope30, r2_30, vol_ratio)
     
     # 2: 上升阶段（高置信度）
     elif (diff30 > 1 and slope30 > 0.1 and r2_30 > 0.7 and 
           ma_arrangement == 1 and close > prev_week["close"] and vol_ratio > 0.8):
         stage = 2
         confidence = min(0.9, slope30/1 + diff30/10 + r2_30)
-        reason = f"价格高于30周均线{diff30:.1f}%，均线斜率{slope30:.2f}（R²={r2_30:.2f}），多头排列，量能充足，确认上升趋势"
+        reason = _stage_reason(2, diff30, slope30, r2_30, vol_ratio)
     
     # 3: 顶部震荡
     elif (diff30 > 0 and slope30 < 0.1 and r2_30 < 0.5 and 
           abs(diff10) < 2 and vol_ratio > 1.2):
         stage = 3
         confidence = min(0.8, (abs(diff10)/2) + (vol_ratio/2) + (1 - r2_30))
-        reason = f"价格在均线上方但均线走平，短期波动加大（波动率{vol_ratio:.1f}倍），顶部震荡特征"
+        reason = _stage_reason(3, diff30, slope30, r2_30, vol_ratio)
     
     # 1: 筑底阶段
     elif (diff30 < 0 and slope30 > -0.1 and r2_30 < 0.5 and 
           vol_ratio < 0.8 and close > ma10):
         stage = 1
         confidence = min(0.8, (1 - abs(diff30)/5) + (1 - vol_ratio) + r2_30)
-        reason = f"价格接近均线（偏离{diff30:.1f}%），成交量萎缩（波动率{vol_ratio:.1f}倍），筑底特征明显"
+        reason = _stage_reason(1, diff30, slope30, r2_30, vol_ratio)
     
     # 未明确阶段
     else:
         stage = 1
         confidence = 0.3
-        reason = f"无明确趋势特征，均线偏离{diff30:.1f}%，斜率{slope30:.2f}，暂归为筑底观察"
+        reason = _stage_reason(0, diff30, slope30, r2_30, vol_ratio)
     
     return {
         "stage": stage,
@@ -225,7 +219,7 @@ def relative_strength_enhanced(fund_weekly: pd.DataFrame, index_weekly: pd.DataF
     # 对齐日期
     aligned = fund_weekly.join(index_weekly[["ret", "log_ret"]], how="inner", rsuffix="_index")
     if len(aligned) < max(lookback_periods):
-        return {"rs_scores": {}, "win_rate": 0.0, "risk_adjusted_rs": 0.0}
+        return {"rs_scores": {}, "win_rates": {}, "risk_adjusted_rs": 0.0, "latest_rs": 0.0}
     
     rs_scores = {}
     win_rates = {}
@@ -267,7 +261,7 @@ def risk_assessment(weekly_df: pd.DataFrame) -> dict:
     3. 夏普比率（无风险利率按年化2%计算）
     """
     if len(weekly_df) < 20:
-        return {"max_drawdown": 0.0, "downside_vol": 0.0, "sharpe": 0.0}
+        return {"max_drawdown": 0.0, "downside_vol_pct": 0.0, "sharpe_ratio": 0.0}
     
     # 最大回撤
     roll_max = weekly_df["close"].rolling(window=len(weekly_df), min_periods=1).max()
@@ -290,6 +284,19 @@ def risk_assessment(weekly_df: pd.DataFrame) -> dict:
         "sharpe_ratio": round(sharpe, 3)
     }
 
+# 仓位建议（取区间中值，便于展示和回测）
+POSITION_SUGGESTION = {
+    "重仓买入": 80,   # 70~90
+    "买入": 50,       # 40~60
+    "轻仓买入": 20,   # 10~30
+    "轻仓布局": 10,   # 5~15
+    "部分止盈": 30,   # 20~40
+    "减仓": 10,       # 0~20
+    "卖出": 0,
+    "止损卖出": 0,
+    "观望": 0
+}
+
 def generate_advice_enhanced(stage_info: dict, rs_info: dict, risk_info: dict) -> dict:
     """
     增强版投资建议：
@@ -351,54 +358,313 @@ def generate_advice_enhanced(stage_info: dict, rs_info: dict, risk_info: dict) -
             note = f"{note}，最大回撤{max_dd}%，夏普比率{sharpe}，建议立即止损"
             action = "止损卖出"
     
-    # 仓位建议
-    position_suggestion = {
-        "重仓买入": 70-90,
-        "买入": 40-60,
-        "轻仓买入": 10-30,
-        "轻仓布局": 5-15,
-        "部分止盈": 20-40,
-        "减仓": 0-20,
-        "卖出": 0,
-        "止损卖出": 0,
-        "观望": 0
-    }
-    
     return {
         "建议操作": action,
-        "建议仓位(%)": position_suggestion.get(action, 0),
+        "建议仓位(%)": POSITION_SUGGESTION.get(action, 0),
         "建议说明": note,
         "评分": final_score,
         "建议置信度": round(stage_confidence * 100, 1)
     }
 
+# ===================== 全历史逐周信号 =====================
+# 最新分析只取最近 ANALYSIS_YEARS 年净值；全历史的每一周也以当周最后一个净值日为分析日，回看同样的年限
+ANALYSIS_YEARS = 3
+
+def _window_apply(values: np.ndarray, window: int, func) -> np.ndarray:
+    """对每个末端对齐的窗口调用 func(窗口数组, axis=-1)，不足 window 的位置为 NaN"""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = func(sliding_window_view(values, window), axis=-1)
+    return out
+
+def _masked_windows(values: np.ndarray, start: np.ndarray) -> np.ndarray:
+    """第 t 行为 values[start[t]:t+1]，右对齐成等宽窗口，窗口之外为 NaN"""
+    n = len(values)
+    width = int((np.arange(n) - start).max()) + 1
+    padded = np.concatenate([np.full(width - 1, np.nan), values.astype(float)])
+    positions = np.arange(n)[:, None] - (width - 1) + np.arange(width)
+    return np.where(positions >= start[:, None], sliding_window_view(padded, width), np.nan)
+
+def fund_signal_history(fund_weekly: pd.DataFrame, index_weekly: pd.DataFrame,
+                        lookback_periods: list = [12, 26, 52], risk_start: np.ndarray = None) -> pd.DataFrame:
+    """
+    全历史逐周信号（一次向量化计算）
+    每一行等价于只用截至该周的周线调用 judge_stage_enhanced / relative_strength_enhanced /
+    risk_assessment / generate_advice_enhanced 得到的结果
+    :param risk_start: 每一周风险指标窗口的起始行号（见 _analysis_window_starts），None 表示从第一周开始
+    """
+    w = fund_weekly
+    n = len(w)
+    if n == 0:
+        return pd.DataFrame()
+    close = w["close"].to_numpy()
+    ma10, ma20, ma30 = (w[c].to_numpy() for c in ("ma10", "ma20", "ma30"))
+    rows = np.arange(n)
+
+    # ---- 阶段（judge_stage_enhanced）----
+    _, slope30, r2_30 = rolling_linregress(ma30, 10)
+    avg_vol = w["vol"].rolling(20).mean().to_numpy()
+    vol = w["vol"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol_ratio = np.where(avg_vol > 0, vol / avg_vol, 1.0)
+        diff30 = (close / ma30 - 1) * 100
+        diff10 = (close / ma10 - 1) * 100
+    ma_arrangement = np.where((ma10 > ma20) & (ma20 > ma30), 1, np.where((ma10 < ma20) & (ma20 < ma30), -1, 0))
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+
+    rule4 = (diff30 < -3) & (slope30 < -0.1) & (r2_30 > 0.7) & (ma_arrangement == -1) & (close < prev_close)
+    rule2 = (diff30 > 1) & (slope30 > 0.1) & (r2_30 > 0.7) & (ma_arrangement == 1) & (close > prev_close) & (vol_ratio > 0.8)
+    rule3 = (diff30 > 0) & (slope30 < 0.1) & (r2_30 < 0.5) & (np.abs(diff10) < 2) & (vol_ratio > 1.2)
+    rule1 = (diff30 < 0) & (slope30 > -0.1) & (r2_30 < 0.5) & (vol_ratio < 0.8) & (close > ma10)
+    enough = rows >= 29
+    rule = np.select([rule4, rule2, rule3, rule1], [4, 2, 3, 1], 0)
+    stage = np.where(enough, np.where(rule == 0, 1, rule), 0)
+    confidence = np.select(
+        [rule4, rule2, rule3, rule1],
+        [np.minimum(0.9, np.abs(slope30) + np.abs(diff30) / 5 + (1 - vol_ratio / 2)),
+         np.minimum(0.9, slope30 + diff30 / 10 + r2_30),
+         np.minimum(0.8, np.abs(diff10) / 2 + vol_ratio / 2 + (1 - r2_30)),
+         np.minimum(0.8, (1 - np.abs(diff30) / 5) + (1 - vol_ratio) + r2_30)],
+        0.3)
+    confidence = np.where(enough, np.round(confidence, 2), 0.0)
+
+    # ---- 相对强度（relative_strength_enhanced），先在对齐后的日期上计算再映射回每一周 ----
+    aligned = w.join(index_weekly[["ret", "log_ret"]], how="inner", rsuffix="_index")
+    rs_cols = {}
+    if len(aligned) > 0:
+        fund_ret = aligned["ret"].to_numpy()
+        idx_ret = aligned["ret_index"].to_numpy()
+        for lookback in lookback_periods:
+            fund_cum = _window_apply(1 + fund_ret, lookback, np.prod) - 1
+            index_cum = _window_apply(1 + idx_ret, lookback, np.prod) - 1
+            rs_cols[f"rs_{lookback}"] = np.round(fund_cum - index_cum, 4)
+            rs_cols[f"win_{lookback}"] = np.round(_window_apply((fund_ret > idx_ret).astype(float), lookback, np.sum) / lookback, 2)
+        excess = (aligned["log_ret"] - aligned["log_ret_index"]).to_numpy()
+        ex_mean = _window_apply(excess, 52, np.mean)
+        ex_std = _window_apply(excess, 52, lambda a, axis: np.std(a, axis=axis, ddof=1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs_cols["risk_adjusted_rs"] = np.round(np.where(ex_std > 0, ex_mean / ex_std, 0.0), 3)
+        rs_cols["aligned_len"] = np.arange(1, len(aligned) + 1)
+    rs_frame = pd.DataFrame(rs_cols, index=aligned.index).reindex(w.index).ffill()
+    rs_ready = rs_frame.get("aligned_len", pd.Series(0, index=w.index)).fillna(0).to_numpy() >= max(lookback_periods)
+    short = str(min(lookback_periods))
+    latest_rs = np.where(rs_ready, rs_frame.get(f"rs_{short}", pd.Series(0.0, index=w.index)).to_numpy(), 0.0) \
+        if f"rs_{short}" in rs_frame else np.zeros(n)
+    risk_adjusted_rs = np.where(rs_ready, rs_frame["risk_adjusted_rs"].to_numpy(), 0.0) \
+        if "risk_adjusted_rs" in rs_frame else np.zeros(n)
+
+    # ---- 风险（risk_assessment），每一周只看 risk_start 起的窗口 ----
+    ret = w["ret"]
+    start = np.zeros(n, dtype=int) if risk_start is None else np.asarray(risk_start, dtype=int)
+    close_win = _masked_windows(close, start)
+    ret_win = _masked_windows(ret.to_numpy(), start)
+    max_drawdown = np.round(np.nanmin(close_win / np.fmax.accumulate(close_win, axis=-1) - 1, axis=-1) * 100, 2)
+    downside_vol = np.round(np.nanstd(np.where(ret_win < 0, ret_win, np.nan), axis=-1, ddof=1)
+                            * np.sqrt(52) * 100, 2)
+    annual_ret = np.nanmean(ret_win, axis=-1) * 52
+    annual_vol = np.nanstd(ret_win, axis=-1, ddof=1) * np.sqrt(52)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.round(np.where(annual_vol > 0, (annual_ret - 0.02) / annual_vol, 0.0), 3)
+    risk_ready = rows - start >= 19
+    max_drawdown = np.where(risk_ready, max_drawdown, 0.0)
+    downside_vol = np.where(risk_ready, downside_vol, 0.0)
+    sharpe = np.where(risk_ready, sharpe, 0.0)
+
+    # ---- 建议（generate_advice_enhanced）----
+    base_score = np.select([stage == 1, stage == 2, stage == 3, stage == 4], [50, 80, 40, 20], 0)
+    rs_factor = np.minimum(1.0, np.maximum(0.0, latest_rs + 0.1))
+    risk_factor = np.minimum(1.0, np.maximum(0.5, 1 + sharpe / 2))
+    final_score = np.round(base_score * confidence * rs_factor * risk_factor, 1)
+    action = np.select(
+        [(stage == 2) & (latest_rs > 0.05) & (sharpe > 1.0),
+         (stage == 2) & (latest_rs > 0) & (sharpe > 0),
+         stage == 2,
+         (stage == 1) & (latest_rs > 0) & (max_drawdown > -10),
+         stage == 1,
+         (stage == 3) & (latest_rs > 0) & (confidence < 0.5),
+         stage == 3,
+         (stage == 4) & (max_drawdown < -20) & (sharpe < 0),
+         stage == 4],
+        ["重仓买入", "买入", "轻仓买入", "轻仓布局", "观望", "部分止盈", "减仓", "止损卖出", "卖出"],
+        "等待")
+    position = np.array([POSITION_SUGGESTION.get(a, 0) for a in action.tolist()]) if n else np.zeros(0)
+
+    history = pd.DataFrame({
+        "单位净值": close,
+        "30周均线": ma30,
+        "周收益": ret.to_numpy(),
+        "stage": stage,
+        "rule": rule,
+        "confidence": confidence,
+        "ma30_diff_pct": diff30,
+        "ma30_slope": slope30,
+        "ma30_r2": r2_30,
+        "vol_ratio": vol_ratio,
+        "ma_arrangement": ma_arrangement,
+        "rs_ready": rs_ready,
+        "latest_rs": latest_rs,
+        "risk_adjusted_rs": risk_adjusted_rs,
+        "max_drawdown": max_drawdown,
+        "downside_vol_pct": downside_vol,
+        "sharpe_ratio": sharpe,
+        "建议操作": action,
+        "建议仓位(%)": position,
+        "评分": final_score,
+        "建议置信度": np.round(confidence * 100, 1),
+    }, index=w.index)
+    for lookback in lookback_periods:
+        for prefix in ("rs", "win"):
+            col = f"{prefix}_{lookback}"
+            history[col] = rs_frame[col].to_numpy() if col in rs_frame else np.nan
+    return history
+
+def _history_row_results(row: pd.Series, lookback_periods: list = [12, 26, 52]) -> tuple:
+    """把全历史中的一行还原成 (阶段, 相对强度, 风险) 三个结果字典"""
+    if row["stage"] == 0:
+        stage_result = {"stage": 0, "confidence": 0.0, "reason": "数据不足"}
+    else:
+        stage_result = {
+            "stage": int(row["stage"]),
+            "confidence": float(row["confidence"]),
+            "reason": _stage_reason(int(row["rule"]), row["ma30_diff_pct"], row["ma30_slope"], row["ma30_r2"], row["vol_ratio"]),
+            "key_metrics": {
+                "ma30_diff_pct": round(float(row["ma30_diff_pct"]), 2),
+                "ma30_slope": round(float(row["ma30_slope"]), 2),
+                "ma30_r2": round(float(row["ma30_r2"]), 2),
+                "vol_ratio": round(float(row["vol_ratio"]), 2),
+                "ma_arrangement": int(row["ma_arrangement"])
+            }
+        }
+    if row["rs_ready"]:
+        rs_result = {
+            "rs_scores": {f"{lb}周": float(row[f"rs_{lb}"]) for lb in lookback_periods},
+            "win_rates": {f"{lb}周": float(row[f"win_{lb}"]) for lb in lookback_periods},
+            "risk_adjusted_rs": float(row["risk_adjusted_rs"]),
+            "latest_rs": float(row["latest_rs"]),
+        }
+    else:
+        rs_result = {"rs_scores": {}, "win_rates": {}, "risk_adjusted_rs": 0.0, "latest_rs": 0.0}
+    risk_result = {
+        "max_drawdown": float(row["max_drawdown"]),
+        "downside_vol_pct": float(row["downside_vol_pct"]),
+        "sharpe_ratio": float(row["sharpe_ratio"]),
+    }
+    return stage_result, rs_result, risk_result
+
+_HISTORY_CACHE_SIZE = 128
+_history_cache = OrderedDict()
+_history_lock = threading.Lock()
+
+def _analysis_window_starts(daily: pd.DataFrame, fund_weekly: pd.DataFrame, years: int) -> np.ndarray:
+    """
+    每一周在 fund_weekly 中的分析窗口起始行：以当周最后一个净值日为分析日，
+    与最新分析一样只取之前 years 年净值（_date_window）生成周线，再去掉均线预热的前几周
+    """
+    week_last = daily.index.to_series().resample("W-FRI").last().dropna()
+    raw_pos = week_last.index.get_indexer(fund_weekly.index)
+    # 完整走势生成周线时同样去掉了预热周，第一行在原始周线中的位置即预热周数
+    warmup = raw_pos[0]
+    window_start = week_last.to_numpy()[raw_pos] - np.timedelta64(365 * years, "D")
+    first_week = np.searchsorted(week_last.to_numpy(), window_start, side="left")
+    return np.searchsorted(raw_pos, first_week + warmup, side="left")
+
+def analyze_fund_history(fund_code: str, benchmark_code: str = "sh000300") -> pd.DataFrame:
+    """
+    基金全历史逐周信号（见 fund_signal_history），覆盖缓存中的完整净值走势
+    同一份净值只计算一次，后续按日期回看直接复用
+    """
+    daily = fetch_fund_daily_nav(fund_code)
+    if len(daily) > 0:
+        daily = daily.dropna(subset=["close"])
+    if len(daily) == 0:
+        return pd.DataFrame()
+    fund_weekly = build_fund_weekly(daily)
+    # 基准指数覆盖整段净值历史（早于指数数据的周没有相对强度）
+    years = max(ANALYSIS_YEARS, (datetime.now() - daily.index[0]).days // 365 + 1)
+    index_weekly = fetch_index_weekly_close(benchmark_code, years=years)
+    if len(fund_weekly) == 0 or len(index_weekly) == 0:
+        return pd.DataFrame()
+    key = (fund_code, benchmark_code, fund_weekly.index[-1], len(fund_weekly),
+           index_weekly.index[0], index_weekly.index[-1])
+    with _history_lock:
+        if key in _history_cache:
+            _history_cache.move_to_end(key)
+            return _history_cache[key]
+    history = fund_signal_history(fund_weekly, index_weekly,
+                                  risk_start=_analysis_window_starts(daily, fund_weekly, ANALYSIS_YEARS))
+    with _history_lock:
+        _history_cache[key] = history
+        while len(_history_cache) > _HISTORY_CACHE_SIZE:
+            _history_cache.popitem(last=False)
+    return history
+
 # ===================== 主分析函数 =====================
-def analyze_fund_enhanced(fund_code: str, benchmark_code: str = "sh000300") -> dict:
+@single_flight("analyze_fund_enhanced")
+def analyze_fund_enhanced(fund_code: str, benchmark_code: str = "sh000300", as_of=None, timing: bool = None) -> dict:
     """
     增强版基金分析主函数
+    :param as_of: 回看日期（字符串或日期），取不晚于该日期的最近一个周线的分析结果；
+                  全历史信号只计算一次并复用，None 表示分析最新数据
+    :param timing: 是否记录各阶段耗时（结果中的「耗时统计」），默认取 LOGGING_CONFIG['timing']
     """
+    timer = StageTimer(timing)
+    try:
+        result = _analyze_fund(fund_code, benchmark_code, as_of, timer)
+    except Exception as e:
+        # 与 analyze_stock 一致：取数或计算中的异常转换为错误结果，不向调用方抛出
+        result = {"错误": f"分析出错: {str(e)}", "基金代码": fund_code}
+    return timer.attach(result, f"analyze_fund_enhanced {fund_code}")
+
+def _analyze_fund(fund_code: str, benchmark_code: str, as_of, timer: StageTimer) -> dict:
     # 1. 获取基础数据
-    fund_info = fetch_fund_info(fund_code)
-    fund_weekly = fetch_fund_weekly_nav(fund_code, years=3)
-    index_weekly = fetch_index_weekly_close(benchmark_code, years=3)
-    
-    # 数据校验
-    if len(fund_weekly) == 0:
-        return {"错误": "无法获取基金净值数据", "基金代码": fund_code}
-    if len(index_weekly) == 0:
-        return {"错误": "无法获取基准指数数据", "基金代码": fund_code}
-    
+    with timer.span("基本信息"):
+        fund_info = fetch_fund_info(fund_code)
+
     # 2. 核心分析
-    stage_result = judge_stage_enhanced(fund_weekly)
-    rs_result = relative_strength_enhanced(fund_weekly, index_weekly)
-    risk_result = risk_assessment(fund_weekly)
-    advice_result = generate_advice_enhanced(stage_result, rs_result, risk_result)
+    if as_of is not None:
+        # 全历史信号自行获取完整净值和基准指数
+        with timer.span("全历史信号"):
+            history = analyze_fund_history(fund_code, benchmark_code)
+        if len(history) == 0:
+            return {"错误": "无法获取基金净值或基准指数数据", "基金代码": fund_code}
+        rows = history.loc[:pd.Timestamp(as_of)]
+        if len(rows) == 0:
+            return {"错误": f"{pd.Timestamp(as_of).strftime('%Y-%m-%d')} 之前没有净值数据", "基金代码": fund_code}
+        row = rows.iloc[-1]
+        stage_result, rs_result, risk_result = _history_row_results(row)
+        latest_date = rows.index[-1].strftime("%Y-%m-%d")
+        latest_close = round(float(row["单位净值"]), 4)
+        latest_ma30 = round(float(row["30周均线"]), 4)
+    else:
+        with timer.span("净值获取"):
+            daily = fetch_fund_daily_nav(fund_code)
+        with timer.span("周线重采样"):
+            fund_weekly = build_fund_weekly(_date_window(daily, ANALYSIS_YEARS)) if len(daily) > 0 else pd.DataFrame()
+        with timer.span("基准指数"):
+            index_weekly = fetch_index_weekly_close(benchmark_code, years=ANALYSIS_YEARS)
+
+        # 数据校验
+        if len(fund_weekly) == 0:
+            return {"错误": "无法获取基金净值数据", "基金代码": fund_code}
+        if len(index_weekly) == 0:
+            return {"错误": "无法获取基准指数数据", "基金代码": fund_code}
+
+        with timer.span("阶段判断"):
+            stage_result = judge_stage_enhanced(fund_weekly)
+        with timer.span("相对强度"):
+            rs_result = relative_strength_enhanced(fund_weekly, index_weekly)
+        with timer.span("风险评估"):
+            risk_result = risk_assessment(fund_weekly)
+        latest_date = fund_weekly.index[-1].strftime("%Y-%m-%d")
+        latest_close = round(float(fund_weekly.iloc[-1]["close"]), 4)
+        latest_ma30 = round(float(fund_weekly.iloc[-1]["ma30"]), 4)
+    with timer.span("投资建议"):
+        advice_result = generate_advice_enhanced(stage_result, rs_result, risk_result)
+    if as_of is not None:
+        # 评分取逐周序列中的值，保持与全历史的舍入一致
+        advice_result["评分"] = float(row["评分"])
     
     # 3. 整合结果
-    latest_date = fund_weekly.index[-1].strftime("%Y-%m-%d")
-    latest_close = round(float(fund_weekly.iloc[-1]["close"]), 4)
-    latest_ma30 = round(float(fund_weekly.iloc[-1]["ma30"]), 4)
-    
     result = {
         "基金基本信息": fund_info,
         "分析日期": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
@@ -416,4 +682,64 @@ def analyze_fund_enhanced(fund_code: str, benchmark_code: str = "sh000300") -> d
         "投资建议": advice_result
     }
     
-    return result
\ No newline at end of file
+    return result
+
+
+# ===================== 批量分析 =====================
+# 批量结果 DataFrame 的列（由 analyze_fund_enhanced 的嵌套结果展开）
+FUND_RESULT_COLUMNS = [
+    "基金代码", "基金名称", "基金类型", "分析日期", "净值日期", "单位净值", "30周均线", "阶段", "阶段置信度",
+    "最新相对强度", "风险调整相对强度", "最大回撤(%)", "下行波动率(%)", "夏普比率",
+    "建议操作", "建议仓位(%)", "评分", "建议置信度", "建议说明", "错误",
+]
+
+
+def fund_result_row(fund_code: str, result: dict) -> dict:
+    """把 analyze_fund_enhanced 的结果展开为一行（FUND_RESULT_COLUMNS）"""
+    info = result.get("基金基本信息") or {}
+    latest = result.get("最新数据", {})
+    stage = result.get("趋势分析", {})
+    rs = result.get("相对强度分析", {})
+    advice = result.get("投资建议", {})
+    return {
+        "基金代码": fund_code,
+        "基金名称": info.get("基金名称", ""),
+        "基金类型": info.get("基金类型", ""),
+        "分析日期": result.get("分析日期", datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        "净值日期": latest.get("净值日期", ""),
+        "单位净值": latest.get("单位净值", np.nan),
+        "30周均线": latest.get("30周均线", np.nan),
+        "阶段": stage.get("stage", np.nan),
+        "阶段置信度": stage.get("confidence", np.nan),
+        "最新相对强度": rs.get("latest_rs", np.nan),
+        "风险调整相对强度": rs.get("risk_adjusted_rs", np.nan),
+        "最大回撤(%)": latest.get("最大回撤(%)", np.nan),
+        "下行波动率(%)": latest.get("下行波动率(%)", np.nan),
+        "夏普比率": latest.get("夏普比率", np.nan),
+        "建议操作": advice.get("建议操作", ""),
+        "建议仓位(%)": advice.get("建议仓位(%)", np.nan),
+        "评分": advice.get("评分", np.nan),
+        "建议置信度": advice.get("建议置信度", np.nan),
+        "建议说明": advice.get("建议说明", ""),
+        "错误": result.get("错误", ""),
+    }
+
+
+def analyze_funds(fund_codes: list, max_workers: int = None, benchmark_code: str = "sh000300") -> pd.DataFrame:
+    """
+    批量分析基金：有界线程池并发分析（基准指数由 benchmark_store 共享）
+    返回 FUND_RESULT_COLUMNS 列的 DataFrame（按输入顺序），单只基金的异常写入「错误」列
+    """
+    codes = list(dict.fromkeys(str(c).strip() for c in fund_codes if str(c).strip()))
+    if max_workers is None:
+        max_workers = DATA_CONFIG['max_workers']
+
+    def analyze_one(code):
+        try:
+            return fund_result_row(code, analyze_fund_enhanced(code, benchmark_code))
+        except Exception as e:
+            return fund_result_row(code, {"错误": f"分析出错: {str(e)}"})
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        rows = list(executor.map(analyze_one, codes))
+    return pd.DataFrame(rows, columns=FUND_RESULT_COLUMNS)
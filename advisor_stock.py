@@ -1,79 +1,55 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
-import akshare as ak
+from data_provider import get_provider
+from data_cache import get_daily_bars, get_cache_stats
+from benchmark_store import get_index_weekly
+from market_snapshot import snapshot_stock_info
+from metadata_store import get_info, get_many, put_info
+from single_flight import single_flight
+from config import DATA_CONFIG, ANALYSIS_CONFIG
+from regression_kernels import last_window_linregress
+from timing import StageTimer
+from panel_engine import compute_panel, history_indicators, align_index_returns
 import warnings
 warnings.filterwarnings('ignore')
+@single_flight("fetch_stock_info")
 def fetch_stock_info(stock_code: str) -> dict:
-    if ak is None:
-        return {}
-    info = {}
-    df = None
-    try:
-        df = ak.stock_individual_info_em(symbol=stock_code)
-    except Exception:
-        df = None
-    if df is not None and len(df) > 0:
-        for _, row in df.iterrows():
-            k = str(row.get("item", "")).strip()
-            v = str(row.get("value", "")).strip()
-            if k:
-                info[k] = v
-    if not info:
-        try:
-            spot = ak.stock_zh_a_spot_em()
-            row = spot[spot["代码"] == stock_code]
-            if len(row) > 0:
-                r = row.iloc[0]
-                info = {
-                    "股票代码": stock_code,
-                    "股票名称": str(r.get("名称", "")),
-                    "最新价": str(r.get("最新价", "")),
-                    "涨跌幅": str(r.get("涨跌幅", "")),
-                }
-        except Exception:
-            info = {"股票代码": stock_code}
+    """基本信息：优先本地信息库（有效期 DATA_CONFIG['metadata_days']），再请求个股信息接口"""
+    provider = get_provider()
+    if provider.use_cache:
+        info = get_info("stock", stock_code)
+        if info is not None:
+            return info
+    info = provider.stock_info(stock_code)
+    if info:
+        info["股票代码"] = stock_code
+        if provider.use_cache:
+            put_info("stock", stock_code, info)
+        return info
+    # 个股信息接口失败时先用预加载的代码列表，再从共享的全市场快照中查找（快照每个周期只下载一次）
+    info = (get_info("stock", stock_code, full=False) if provider.use_cache else None) \
+        or snapshot_stock_info(stock_code)
     info["股票代码"] = stock_code
     return info
 
 
-def fetch_stock_weekly(stock_code: str, years: int = 5) -> pd.DataFrame:
-    if ak is None:
-        return pd.DataFrame()
-    end_date = datetime.now().strftime("%Y%m%d")
-    start_date = (datetime.now() - timedelta(days=365 * years)).strftime("%Y%m%d")
-    df = None
-    try:
-        df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")
-    except Exception:
-        df = None
-    if df is None or len(df) == 0:
-        try:
-            pref = "sh" if stock_code.startswith("6") else "sz"
-            try:
-                df = ak.stock_zh_a_daily(symbol=f"{pref}{stock_code}", start_date=start_date, end_date=end_date, adjust="qfq")
-            except Exception:
-                df = ak.stock_zh_a_daily(symbol=f"{pref}{stock_code}", start_date=start_date, end_date=end_date)
-        except Exception:
-            df = None
-    if df is None or len(df) == 0:
-        return pd.DataFrame()
-    if "日期" in df.columns:
-        df["date"] = pd.to_datetime(df["日期"])
-    elif "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"])
-    else:
-        return pd.DataFrame()
-    price_col = "收盘" if "收盘" in df.columns else ("close" if "close" in df.columns else None)
-    if price_col is None:
-        return pd.DataFrame()
-    df[price_col] = pd.to_numeric(df[price_col], errors="coerce")
-    if vol_col := ("成交量" if "成交量" in df.columns else ("volume" if "volume" in df.columns else None)):
-        df[vol_col] = pd.to_numeric(df[vol_col], errors="coerce")
-    df = df.sort_values("date")
-    df = df.set_index("date")
-    weekly = df[[price_col] + ([vol_col] if vol_col else [])].resample("W-FRI").last().dropna()
-    weekly = weekly.rename(columns={price_col: "close", vol_col: "volume"} if vol_col else {price_col: "close"})
+# 日线缓存候选键：(数据源, 复权类型)，按数据质量优先级排列
+STOCK_DAILY_SOURCES = [("em_hist", "qfq"), ("sina_daily", "qfq"), ("sina_daily", "")]
+
+
+def _download_stock_daily(stock_code: str, start_date: str, end_date: str) -> tuple:
+    """由当前数据源下载日线，返回 (日线, 数据源, 复权类型)"""
+    return get_provider().stock_daily(stock_code, start_date, end_date)
+
+
+def build_stock_weekly(daily: pd.DataFrame) -> pd.DataFrame:
+    """日线 → 周线（W-FRI），附加30周均线、周收益、20周支撑/阻力"""
+    cols = ["close"] + (["volume"] if "volume" in daily.columns else [])
+    weekly = daily[cols].resample("W-FRI").last().dropna()
     weekly["ma30"] = weekly["close"].rolling(30).mean()
     weekly["ret"] = weekly["close"].pct_change()
     weekly["support"] = weekly["close"].rolling(20).min()
@@ -82,51 +58,73 @@ def fetch_stock_weekly(stock_code: str, years: int = 5) -> pd.DataFrame:
     return weekly
 
 
-def fetch_index_weekly_close(index_symbol: str = "sh000300", years: int = 3) -> pd.DataFrame:
-    if ak is None:
-        return pd.DataFrame()
+@single_flight("fetch_stock_daily")
+def fetch_stock_daily(stock_code: str, years: int = 5, max_age_hours: float = None) -> pd.DataFrame:
+    """获取最近 years 年的标准化日线（优先本地缓存，过期时只同步尾部）"""
     end_date = datetime.now().strftime("%Y%m%d")
     start_date = (datetime.now() - timedelta(days=365 * years)).strftime("%Y%m%d")
-    df = None
-    try:
-        df = ak.stock_zh_index_daily(symbol=index_symbol, start_date=start_date, end_date=end_date)
-    except Exception:
-        df = None
-    if df is None or len(df) == 0:
-        try:
-            code = index_symbol.replace("sh", "").replace("sz", "")
-            df = ak.index_zh_a_hist(symbol=code, period="daily", start_date=start_date, end_date=end_date)
-        except Exception:
-            df = None
-    if df is None or len(df) == 0:
-        return pd.DataFrame()
-    if "日期" in df.columns:
-        df["date"] = pd.to_datetime(df["日期"])
-    elif "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"])
-    else:
+    daily = get_daily_bars(
+        stock_code, STOCK_DAILY_SOURCES,
+        lambda start: _download_stock_daily(stock_code, start or start_date, end_date),
+        start_date, max_age_hours, get_provider().use_cache,
+    )
+    if len(daily) == 0:
         return pd.DataFrame()
-    price_col = "收盘" if "收盘" in df.columns else ("close" if "close" in df.columns else None)
-    if price_col is None:
+    return daily.loc[pd.to_datetime(start_date):]
+
+
+def fetch_stock_weekly(stock_code: str, years: int = 5) -> pd.DataFrame:
+    daily = fetch_stock_daily(stock_code, years)
+    if len(daily) == 0:
         return pd.DataFrame()
-    df[price_col] = pd.to_numeric(df[price_col], errors="coerce")
-    df = df.sort_values("date")
-    df = df.set_index("date")
-    weekly = df[[price_col]].resample("W-FRI").last().dropna()
-    weekly = weekly.rename(columns={price_col: "close"})
-    weekly["ret"] = weekly["close"].pct_change()
-    weekly = weekly.dropna()
-    return weekly
+    return build_stock_weekly(daily)
+
+
+def fetch_index_weekly_close(index_symbol: str = "sh000300", years: int = 3) -> pd.DataFrame:
+    # 基准指数由进程内共享存储提供，每个交易时段只加载一次
+    return get_index_weekly(index_symbol, years)
+
+
+def sync_stock_daily(stock_codes: list, years: int = 5) -> dict:
+    """
+    批量同步股票日线（适合收盘后的夜间任务）：已有缓存的代码只下载缓存尾部之后的数据
+    返回本次同步的缓存统计增量
+    """
+    before = get_cache_stats()
+    for code in stock_codes:
+        fetch_stock_daily(code, years, max_age_hours=0)
+    after = get_cache_stats()
+    return {k: after[k] - before[k] for k in ("incremental", "full", "rows_fetched", "errors")}
+
+
+def stock_params(params: dict = None) -> dict:
+    """
+    股票信号参数：默认取 ANALYSIS_CONFIG['stock']，params 中给出的键覆盖默认值
+    :return: rs_lookback / rs_threshold / breakout_lookback / breakout_threshold / volume_multiplier
+    """
+    cfg = ANALYSIS_CONFIG['stock']
+    merged = {
+        "rs_lookback": cfg['relative_strength_period'],
+        "rs_threshold": cfg['rs_threshold'],
+        "breakout_lookback": cfg['breakout_period'],
+        "breakout_threshold": cfg['breakout_threshold'],
+        "volume_multiplier": cfg['volume_threshold'],
+    }
+    if params:
+        unknown = set(params) - set(merged)
+        if unknown:
+            raise ValueError(f"未知的股票分析参数: {', '.join(sorted(unknown))}")
+        merged.update(params)
+    return merged
 
 
 def compute_ma_slope(series: pd.Series, window: int = 10) -> float:
     s = series.dropna()
     if len(s) < window:
         return 0.0
-    x = np.arange(window)
-    y = s.iloc[-window:].to_numpy()
-    coeffs = np.polyfit(x, y, 1)
-    return float(coeffs[0])
+    # 与横截面引擎共用同一个回归核，水平均线的斜率严格为 0
+    slope, _, _ = last_window_linregress(s.to_numpy(dtype=float), window)
+    return slope
 
 
 def judge_stage(weekly_df: pd.DataFrame) -> int:
@@ -144,7 +142,9 @@ def judge_stage(weekly_df: pd.DataFrame) -> int:
     return 1
 
 
-def relative_strength(stock_weekly: pd.DataFrame, index_weekly: pd.DataFrame, lookback: int = 12) -> float:
+def relative_strength(stock_weekly: pd.DataFrame, index_weekly: pd.DataFrame, lookback: int = None) -> float:
+    if lookback is None:
+        lookback = ANALYSIS_CONFIG['stock']['relative_strength_period']
     aligned = stock_weekly.join(index_weekly[["ret"]], how="inner", rsuffix="_index")
     if len(aligned) < lookback:
         return 0.0
@@ -154,7 +154,11 @@ def relative_strength(stock_weekly: pd.DataFrame, index_weekly: pd.DataFrame, lo
     return float(s_ret - i_ret)
 
 
-def detect_breakout(weekly_df: pd.DataFrame, lookback: int = 12, threshold: float = 0.01) -> bool:
+def detect_breakout(weekly_df: pd.DataFrame, lookback: int = None, threshold: float = None) -> bool:
+    if lookback is None:
+        lookback = ANALYSIS_CONFIG['stock']['breakout_period']
+    if threshold is None:
+        threshold = ANALYSIS_CONFIG['stock']['breakout_threshold']
     if len(weekly_df) < lookback + 1:
         return False
     recent = weekly_df.iloc[-(lookback + 1):-1]
@@ -168,7 +172,7 @@ def generate_advice(
     rs_score: float, 
     breakout: bool, 
     volume_ok: bool,
-    rs_threshold: float = 0.005  # 相对强度临界值（微弱正/负的区分）
+    rs_threshold: float = None  # 相对强度临界值（微弱正/负的区分）
 ) -> dict:
     """
     生成投资建议，基于阶段、相对强度、突破、量能多维度判断
@@ -176,9 +180,11 @@ def generate_advice(
     :param rs_score: 相对强度（股票-指数周度收益率均值）
     :param breakout: 是否突破阻力位
     :param volume_ok: 量能是否放大（突破时成交量>近12周均值1.5倍）
-    :param rs_threshold: 相对强度临界值，区分「微弱正/负」
+    :param rs_threshold: 相对强度临界值，区分「微弱正/负」，默认取 ANALYSIS_CONFIG['stock']['rs_threshold']
     :return: 包含建议、说明、评分的字典
     """
+    if rs_threshold is None:
+        rs_threshold = ANALYSIS_CONFIG['stock']['rs_threshold']
     # === 核心逻辑：按「趋势阶段→强弱信号→量能/突破」分层 ===
     # 1. 第二阶段（上升趋势）：核心分「强势/中性/弱势」
     if stage == 2:
@@ -259,69 +265,270 @@ def generate_advice(
     }
 
 
-def analyze_stock(stock_code: str) -> dict:
-    """分析单个股票"""
-    try:
-        info = fetch_stock_info(stock_code)
-        weekly = fetch_stock_weekly(stock_code)
-        index_weekly = fetch_index_weekly_close("sh000300")
+def stop_loss_price(support):
+    """止损位：支撑位向下取整后减0.05（支撑位恰为整数时为支撑位-0.05），支持标量和数组"""
+    integer_price = np.floor(support)
+    return np.where(support > integer_price, integer_price - 0.05, support - 0.05)
+
+
+def generate_advice_vectorized(stage, rs_score, breakout, volume_ok, rs_threshold: float = None) -> tuple:
+    """
+    generate_advice 的数组版本（规则完全相同），用于全历史/全市场的逐周建议
+    :return: (建议数组, 评分数组)
+    """
+    if rs_threshold is None:
+        rs_threshold = ANALYSIS_CONFIG['stock']['rs_threshold']
+    stage = np.asarray(stage)
+    rs_score = np.asarray(rs_score, dtype=float)
+    breakout = np.asarray(breakout, dtype=bool)
+    volume_ok = np.asarray(volume_ok, dtype=bool)
+    strong = rs_score > rs_threshold
+    flat = np.abs(rs_score) <= rs_threshold
+    conditions = [
+        (stage == 2) & strong & breakout & volume_ok,
+        (stage == 2) & strong & breakout,
+        (stage == 2) & strong,
+        (stage == 2) & flat & breakout,
+        stage == 2,
+        stage == 1,
+        (stage == 3) & strong,
+        stage == 3,
+        (stage == 4) & ~breakout,
+        stage == 4,
+    ]
+    actions = ["买入", "观望", "观望", "观望", "观望", "观望", "减仓", "减仓", "止损", "清仓"]
+    scores = [85, 70, 65, 60, 55, 60, 45, 40, 25, 15]
+    return np.select(conditions, actions, "观望"), np.select(conditions, scores, 50)
+
+
+def stock_signal_history(daily: pd.DataFrame, index_weekly: pd.DataFrame, params: dict = None) -> pd.DataFrame:
+    """
+    全历史逐周信号（一次向量化计算）
+    每一行等价于只用截至该周的数据调用 analyze_stock 得到的指标与建议
+    :param params: 覆盖的信号参数（见 stock_params）
+    """
+    p = stock_params(params)
+    cols = ["close"] + (["volume"] if "volume" in daily.columns else [])
+    raw = daily[cols].resample("W-FRI").last().dropna()
+    if len(raw) == 0:
+        return pd.DataFrame()
+    volume = raw[["volume"]].to_numpy(dtype=float) if "volume" in raw.columns else None
+    panel = compute_panel(raw[["close"]].to_numpy(dtype=float), volume, align_index_returns(index_weekly, raw.index),
+                          p["rs_lookback"], p["breakout_lookback"], p["breakout_threshold"], p["volume_multiplier"])
+    hist = {k: v[:, 0] for k, v in history_indicators(panel).items()}
+    actions, scores = generate_advice_vectorized(hist["stage"], hist["rs"], hist["breakout"], hist["volume_ok"],
+                                                 p["rs_threshold"])
+    history = pd.DataFrame({
+        "最新收盘": hist["close"],
+        "30周均值": hist["ma30"],
+        "周收益": hist["ret"],
+        "阶段": hist["stage"],
+        "相对强度": hist["rs"],
+        "是否突破": hist["breakout"],
+        "量能是否放大": hist["volume_ok"],
+        "支撑位": hist["support"],
+        "阻力位": hist["resistance"],
+        "止损建议": stop_loss_price(hist["support"]),
+        "投资建议": actions,
+        "投资评分": scores,
+    }, index=raw.index)
+    return history[hist["valid"]]
+
+
+def _analyze_stock_data(stock_code: str, info: dict, weekly: pd.DataFrame, index_weekly: pd.DataFrame,
+                        params: dict = None, timer: StageTimer = None) -> dict:
+    """基于已获取的数据计算指标并生成建议（不做任何网络请求）"""
+    timer = timer or StageTimer(False)
+    p = stock_params(params)
+    with timer.span("指标计算"):
         stage = judge_stage(weekly)
-        rs = relative_strength(weekly, index_weekly, 12) if len(index_weekly) > 0 else 0.0
-        bo = bool(detect_breakout(weekly, 12, 0.01))
+        rs = relative_strength(weekly, index_weekly, p["rs_lookback"]) if len(index_weekly) > 0 else 0.0
+        bo = bool(detect_breakout(weekly, p["breakout_lookback"], p["breakout_threshold"]))
         vol_ok = True
         
         if "volume" in weekly.columns and bo:
-            recent = weekly.iloc[-13:-1]
+            recent = weekly.iloc[-(p["breakout_lookback"] + 1):-1]
             vol_mean = recent["volume"].mean()
-            vol_ok = bool(weekly.iloc[-1]["volume"] > vol_mean * 1.5)
-        
-        advice = generate_advice(stage, rs, bo, vol_ok)
-        latest_close = float(weekly.iloc[-1]["close"])
-        latest_ma = float(weekly.iloc[-1]["ma30"])
-        support = float(weekly.iloc[-1]["support"])
-        resistance = float(weekly.iloc[-1]["resistance"])
-        integer_price = np.floor(support)
-        stop_loss = (integer_price - 0.05) if support > integer_price else (support - 0.05)
-        
-        # 整理结果为扁平结构，方便写入CSV
-        result = {
-            "股票代码": stock_code,
-            "股票名称": info.get("股票简称", ""),
-            "分析日期": datetime.today().strftime("%Y-%m-%d"),
-            "最新收盘": latest_close,
-            "30周均值": latest_ma,
-            "阶段": stage,
-            "相对强度": rs,
-            "是否突破": bo,
-            "量能是否放大": vol_ok,
-            "支撑位": support,
-            "阻力位": resistance,
-            "止损建议": stop_loss,
-            "投资建议": advice["建议"],
-            "投资说明": advice["说明"],
-            "投资评分": advice["评分"],
-            "错误信息": ""
-        }
-        
-        return result
+            vol_ok = bool(weekly.iloc[-1]["volume"] > vol_mean * p["volume_multiplier"])
+    
+    with timer.span("投资建议"):
+        advice = generate_advice(stage, rs, bo, vol_ok, p["rs_threshold"])
+    latest_close = float(weekly.iloc[-1]["close"])
+    latest_ma = float(weekly.iloc[-1]["ma30"])
+    support = float(weekly.iloc[-1]["support"])
+    resistance = float(weekly.iloc[-1]["resistance"])
+    stop_loss = float(stop_loss_price(support))
     
+    # 整理结果为扁平结构，方便写入CSV
+    return {
+        "股票代码": stock_code,
+        "股票名称": info.get("股票简称", ""),
+        "分析日期": datetime.today().strftime("%Y-%m-%d"),
+        "最新收盘": latest_close,
+        "30周均值": latest_ma,
+        "阶段": stage,
+        "相对强度": rs,
+        "是否突破": bo,
+        "量能是否放大": vol_ok,
+        "支撑位": support,
+        "阻力位": resistance,
+        "止损建议": stop_loss,
+        "投资建议": advice["建议"],
+        "投资说明": advice["说明"],
+        "投资评分": advice["评分"],
+        "错误信息": ""
+    }
+
+
+# analyze_stock 结果的列顺序（批量结果 DataFrame 使用）
+STOCK_RESULT_COLUMNS = [
+    "股票代码", "股票名称", "分析日期", "最新收盘", "30周均值", "阶段", "相对强度", "是否突破",
+    "量能是否放大", "支撑位", "阻力位", "止损建议", "投资建议", "投资说明", "投资评分", "错误信息",
+]
+
+
+def _error_result(stock_code: str, e: Exception) -> dict:
+    return {
+        "股票代码": stock_code,
+        "股票名称": "",
+        "分析日期": datetime.today().strftime("%Y-%m-%d"),
+        "最新收盘": np.nan,
+        "30周均值": np.nan,
+        "阶段": np.nan,
+        "相对强度": np.nan,
+        "是否突破": False,
+        "量能是否放大": False,
+        "支撑位": np.nan,
+        "阻力位": np.nan,
+        "止损建议": np.nan,
+        "投资建议": "",
+        "投资说明": "",
+        "投资评分": np.nan,
+        "错误信息": f"分析出错: {str(e)}"
+    }
+
+
+_HISTORY_CACHE_SIZE = 128
+_history_cache = OrderedDict()
+_history_lock = threading.Lock()
+
+
+def analyze_stock_history(stock_code: str, params: dict = None) -> pd.DataFrame:
+    """
+    股票全历史逐周信号（见 stock_signal_history）
+    同一份日线只计算一次，后续按日期回看直接复用
+    """
+    p = stock_params(params)
+    daily = fetch_stock_daily(stock_code)
+    if len(daily) == 0:
+        return pd.DataFrame()
+    index_weekly = fetch_index_weekly_close("sh000300", years=5)
+    key = (stock_code, daily.index[-1], len(daily), index_weekly.index[-1] if len(index_weekly) > 0 else None,
+           tuple(sorted(p.items())))
+    with _history_lock:
+        if key in _history_cache:
+            _history_cache.move_to_end(key)
+            return _history_cache[key]
+    history = stock_signal_history(daily, index_weekly, p)
+    with _history_lock:
+        _history_cache[key] = history
+        while len(_history_cache) > _HISTORY_CACHE_SIZE:
+            _history_cache.popitem(last=False)
+    return history
+
+
+def _history_row_result(stock_code: str, info: dict, history: pd.DataFrame, as_of, params: dict = None,
+                        timer: StageTimer = None) -> dict:
+    """取不晚于 as_of 的最近一周信号，整理成与 analyze_stock 相同的结构"""
+    rows = history.loc[:pd.Timestamp(as_of)]
+    if len(rows) == 0:
+        raise ValueError(f"{pd.Timestamp(as_of).strftime('%Y-%m-%d')} 之前没有足够的周线数据")
+    row = rows.iloc[-1]
+    stage = int(row["阶段"])
+    rs = float(row["相对强度"])
+    bo = bool(row["是否突破"])
+    vol_ok = bool(row["量能是否放大"])
+    with (timer or StageTimer(False)).span("投资建议"):
+        advice = generate_advice(stage, rs, bo, vol_ok, stock_params(params)["rs_threshold"])
+    return {
+        "股票代码": stock_code,
+        "股票名称": info.get("股票简称", ""),
+        "分析日期": rows.index[-1].strftime("%Y-%m-%d"),
+        "最新收盘": float(row["最新收盘"]),
+        "30周均值": float(row["30周均值"]),
+        "阶段": stage,
+        "相对强度": rs,
+        "是否突破": bo,
+        "量能是否放大": vol_ok,
+        "支撑位": float(row["支撑位"]),
+        "阻力位": float(row["阻力位"]),
+        "止损建议": float(row["止损建议"]),
+        "投资建议": advice["建议"],
+        "投资说明": advice["说明"],
+        "投资评分": advice["评分"],
+        "错误信息": ""
+    }
+
+
+@single_flight("analyze_stock")
+def analyze_stock(stock_code: str, as_of=None, params: dict = None, timing: bool = None) -> dict:
+    """
+    分析单个股票
+    :param as_of: 回看日期（字符串或日期），取不晚于该日期的最近一个周线（W-FRI）的分析结果；
+                  全历史信号只计算一次并复用，None 表示分析最新数据
+    :param params: 覆盖的信号参数（见 stock_params），默认取 ANALYSIS_CONFIG['stock']
+    :param timing: 是否记录各阶段耗时（结果中的「耗时统计」），默认取 LOGGING_CONFIG['timing']
+    """
+    timer = StageTimer(timing)
+    try:
+        with timer.span("基本信息"):
+            info = fetch_stock_info(stock_code)
+        if as_of is not None:
+            with timer.span("全历史信号"):
+                history = analyze_stock_history(stock_code, params)
+            result = _history_row_result(stock_code, info, history, as_of, params, timer)
+        else:
+            with timer.span("日线获取"):
+                daily = fetch_stock_daily(stock_code)
+            with timer.span("周线重采样"):
+                weekly = build_stock_weekly(daily) if len(daily) > 0 else pd.DataFrame()
+            with timer.span("基准指数"):
+                index_weekly = fetch_index_weekly_close("sh000300")
+            result = _analyze_stock_data(stock_code, info, weekly, index_weekly, params, timer)
     except Exception as e:
-        return {
-            "股票代码": stock_code,
-            "股票名称": "",
-            "分析日期": datetime.today().strftime("%Y-%m-%d"),
-            "最新收盘": np.nan,
-            "30周均值": np.nan,
-            "阶段": np.nan,
-            "相对强度": np.nan,
-            "是否突破": False,
-            "量能是否放大": False,
-            "支撑位": np.nan,
-            "阻力位": np.nan,
-            "止损建议": np.nan,
-            "投资建议": "",
-            "投资说明": "",
-            "投资评分": np.nan,
-            "错误信息": f"分析出错: {str(e)}"
-        }
+        result = _error_result(stock_code, e)
+    return timer.attach(result, f"analyze_stock {stock_code}")
+
+
+def _fetch_stock_inputs(stock_code: str, info: dict = None) -> tuple:
+    return info if info is not None else fetch_stock_info(stock_code), fetch_stock_weekly(stock_code)
+
+
+def analyze_stocks(stock_codes: list, max_workers: int = None, params: dict = None) -> pd.DataFrame:
+    """
+    批量分析股票：有界线程池并发获取数据，每只股票数据到达后立即计算
+    返回与 analyze_stock 同列的 DataFrame（按输入顺序），单只股票的异常写入「错误信息」列
+    """
+    codes = list(dict.fromkeys(str(c).strip() for c in stock_codes if str(c).strip()))
+    if max_workers is None:
+        max_workers = DATA_CONFIG['max_workers']
+    # 基准指数只取一次，所有股票共用
+    try:
+        index_weekly = fetch_index_weekly_close("sh000300")
+    except Exception:
+        index_weekly = pd.DataFrame()
+
+    # 基本信息一次批量查询本地信息库，只有未命中的股票才逐只请求
+    infos = get_many("stock", codes) if get_provider().use_cache else {}
 
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_fetch_stock_inputs, code, infos.get(code)): code for code in codes}
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                info, weekly = future.result()
+                results[code] = _analyze_stock_data(code, info, weekly, index_weekly, params)
+            except Exception as e:
+                results[code] = _error_result(code, e)
+    return pd.DataFrame([results[code] for code in codes], columns=STOCK_RESULT_COLUMNS)
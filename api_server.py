@@ -0,0 +1,313 @@
+"""
+本地 JSON HTTP 接口（asyncio，HTTP/1.1 长连接）
+供其他服务直接获取分析结果，不必抓取 Web 页面：
+- GET  /health                      存活检查
+- GET  /api/stats                   结果缓存、任务队列、预计算结果库、全市场快照、取数调度（各接口、对冲）和请求合并的统计
+- GET  /api/stock/<代码>            单只股票分析（analyze_stock）
+- GET  /api/fund/<代码>             单只基金分析（analyze_fund_enhanced）
+- POST /api/batch                   批量分析，请求体 {"type": "stock" | "fund", "codes": [...], "stream": false}
+                                    stream 为 true（或 ?stream=1、Accept: application/x-ndjson）时按完成顺序逐行返回 NDJSON
+结果经由共享结果缓存（result_cache）和分析任务队列（job_queue）获取：
+由 run_app.py api 启动；开启 SERVER_CONFIG['api_with_ui'] 时随 Web 界面启动，与界面共用同一份缓存，未命中时在工作进程中计算，不阻塞事件循环
+"""
+
+import asyncio
+import json
+import math
+import threading
+from urllib.parse import urlsplit, parse_qs
+from config import SERVER_CONFIG
+from result_cache import get_result_cache, is_error_result
+from app_logging import get_logger
+
+# 接口中的分析类型 -> 结果缓存中的类型（与 Web 界面一致，两者共用缓存条目）
+KIND_LABELS = {"stock": "股票分析", "fund": "基金分析"}
+NDJSON = "application/x-ndjson"
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway"}
+
+_logger = get_logger("api_server")
+
+
+def _jsonable(value):
+    """分析结果转换为可序列化的 JSON：numpy 标量转为 Python 类型，NaN/inf 转为 null，日期转为字符串"""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (str, bool, int)) or value is None:
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return _jsonable(value.item())
+    return str(value)
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(_jsonable(obj), ensure_ascii=False, allow_nan=False).encode("utf-8")
+
+
+def _compute(label: str, code: str):
+    """结果缓存未命中时的计算：提交到分析任务队列并等待（在结果缓存的线程中执行）"""
+    from job_queue import get_job_queue
+    queue = get_job_queue()
+    return queue.result(queue.submit(label, code))
+
+
+# ===================== 分析 =====================
+async def analyze(kind: str, code: str) -> dict:
+    """
+    单个代码的分析结果
+    :return: {"type", "code", "cache": hit/stale/miss, "computed_at", "result"}，失败时另有 "error"
+    """
+    label = KIND_LABELS[kind]
+    cache = get_result_cache()
+    item = {"type": kind, "code": code}
+    try:
+        result, status, future = cache.lookup(label, code, lambda: _compute(label, code))
+        if status == "miss":
+            result = await asyncio.wrap_future(future)
+    except Exception as e:
+        item["error"] = f"分析出错: {str(e)}"
+        return item
+    item["cache"] = status
+    item["computed_at"] = cache.entry_info(label, code).get("computed_at")
+    item["result"] = result
+    if is_error_result(result):
+        item["error"] = (result.get("错误") or result.get("错误信息")) if isinstance(result, dict) else "分析结果无效"
+    return item
+
+
+def _batch_codes(payload) -> tuple:
+    """校验批量请求体，返回 (类型, 代码列表)；无效时抛出 ValueError"""
+    if not isinstance(payload, dict):
+        raise ValueError("请求体应为 JSON 对象")
+    kind = payload.get("type", "stock")
+    if kind not in KIND_LABELS:
+        raise ValueError(f"未知的分析类型: {kind}")
+    codes = payload.get("codes")
+    if not isinstance(codes, list) or not codes:
+        raise ValueError("codes 应为非空列表")
+    codes = list(dict.fromkeys(str(c).strip() for c in codes if str(c).strip()))
+    if len(codes) > SERVER_CONFIG['api_max_batch']:
+        raise ValueError(f"单次最多 {SERVER_CONFIG['api_max_batch']} 个代码")
+    return kind, codes
+
+
+# ===================== HTTP =====================
+class _Request:
+    __slots__ = ("method", "path", "query", "version", "headers", "body")
+
+    def __init__(self, method, target, version, headers, body):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path.rstrip("/") or "/"
+        self.query = parse_qs(parts.query)
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+def _head(status: int, content_type: str, keep_alive: bool, length: int = None, chunked: bool = True) -> bytes:
+    """length 为 None 时按分块传输；chunked 为 False 时两者都不发送（由关闭连接表示响应结束）"""
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if keep_alive:
+        lines.append(f"Keep-Alive: timeout={SERVER_CONFIG['api_keep_alive']}")
+    if length is not None:
+        lines.append(f"Content-Length: {length}")
+    elif chunked:
+        lines.append("Transfer-Encoding: chunked")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, obj, keep_alive: bool):
+    body = _dumps(obj)
+    writer.write(_head(status, "application/json; charset=utf-8", keep_alive, len(body)) + body)
+    await writer.drain()
+
+
+async def _send_ndjson(writer: asyncio.StreamWriter, items, keep_alive: bool, chunked: bool = True):
+    """
+    每个结果完成后立即写出一行
+    :param chunked: 分块传输；HTTP/1.0 客户端不支持分块，此时直接写出各行并以关闭连接表示结束
+    """
+    if not chunked:
+        writer.write(_head(200, f"{NDJSON}; charset=utf-8", False, chunked=False))
+        async for item in items:
+            writer.write(_dumps(item) + b"\n")
+            await writer.drain()
+        writer.close()
+        return
+    writer.write(_head(200, f"{NDJSON}; charset=utf-8", keep_alive))
+    async for item in items:
+        line = _dumps(item) + b"\n"
+        writer.write(f"{len(line):x}\r\n".encode("latin-1") + line + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+async def _as_completed(kind: str, codes: list):
+    for next_item in asyncio.as_completed([analyze(kind, code) for code in codes]):
+        yield await next_item
+
+
+async def _dispatch(request: _Request, writer: asyncio.StreamWriter):
+    keep_alive = request.keep_alive
+    parts = request.path.strip("/").split("/")
+
+    if request.path == "/health":
+        return await _send_json(writer, 200, {"status": "ok"}, keep_alive)
+
+    if request.path == "/api/stats":
+        import job_queue
+        from precompute_store import get_store_stats
+        from market_snapshot import get_snapshot_stats
+        from fetch_orchestrator import get_fetch_stats, get_hedge_stats
+        from single_flight import get_single_flight_stats
+        # 统计请求不启动任务队列（否则每次查询都可能拉起一个进程池）；尚未使用时为 null
+        queue = job_queue._queue
+        stats = {"result_cache": get_result_cache().stats(), "jobs": queue.stats() if queue is not None else None,
+                 "precomputed": get_store_stats(), "snapshot": get_snapshot_stats(),
+                 "fetch": get_fetch_stats(), "hedge": get_hedge_stats(), "single_flight": get_single_flight_stats()}
+        return await _send_json(writer, 200, stats, keep_alive)
+
+    if len(parts) == 3 and parts[0] == "api" and parts[1] in KIND_LABELS:
+        if request.method != "GET":
+            return await _send_json(writer, 405, {"error": "只支持 GET"}, keep_alive)
+        item = await analyze(parts[1], parts[2])
+        return await _send_json(writer, 502 if "error" in item else 200, item, keep_alive)
+
+    if request.path == "/api/batch":
+        if request.method != "POST":
+            return await _send_json(writer, 405, {"error": "只支持 POST"}, keep_alive)
+        try:
+            payload = json.loads(request.body or b"null")
+            kind, codes = _batch_codes(payload)
+        except ValueError as e:   # json.JSONDecodeError 是 ValueError 的子类
+            return await _send_json(writer, 400, {"error": str(e)}, keep_alive)
+        stream = (payload.get("stream") is True or request.query.get("stream", ["0"])[0] in ("1", "true")
+                  or NDJSON in request.headers.get("accept", ""))
+        if stream:
+            return await _send_ndjson(writer, _as_completed(kind, codes), keep_alive,
+                                      chunked=request.version != "HTTP/1.0")
+        items = await asyncio.gather(*(analyze(kind, code) for code in codes))
+        return await _send_json(writer, 200, {"type": kind, "count": len(items), "results": items}, keep_alive)
+
+    return await _send_json(writer, 404, {"error": f"未知的路径: {request.path}"}, keep_alive)
+
+
+class _LengthRequired(Exception):
+    """请求体使用了不支持的传输编码"""
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """
+    读取一个请求；连接关闭或空闲超时时返回 None，请求体过大时抛出 OverflowError，
+    请求体使用分块传输（Transfer-Encoding）时抛出 _LengthRequired（只支持 Content-Length）
+    """
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), SERVER_CONFIG['api_keep_alive'])
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+        return None
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, version = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "identity").lower() != "identity":
+        raise _LengthRequired(headers["transfer-encoding"])
+    length = int(headers.get("content-length", 0))
+    if length > SERVER_CONFIG['api_max_body']:
+        raise OverflowError(length)
+    body = await reader.readexactly(length) if length else b""
+    return _Request(method, target, version, headers, body)
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except OverflowError:
+                await _send_json(writer, 413, {"error": "请求体过大"}, False)
+                break
+            except _LengthRequired:
+                # 无法确定请求体的结束位置，回复后关闭连接
+                await _send_json(writer, 411, {"error": "请求体须带 Content-Length，不支持分块传输"}, False)
+                break
+            except (ValueError, asyncio.IncompleteReadError):
+                await _send_json(writer, 400, {"error": "无效的 HTTP 请求"}, False)
+                break
+            if request is None:
+                break
+            try:
+                await _dispatch(request, writer)
+            except ConnectionError:
+                break
+            except Exception as e:
+                _logger.exception(f"处理 {request.method} {request.path} 失败")
+                await _send_json(writer, 500, {"error": str(e)}, False)
+                break
+            if not request.keep_alive or writer.is_closing():
+                break
+    finally:
+        writer.close()
+
+
+# ===================== 启动 =====================
+async def serve(host: str = None, port: int = None):
+    """在当前事件循环中运行接口服务（直到被取消）"""
+    if host is None:
+        host = SERVER_CONFIG['host']
+    if port is None:
+        port = SERVER_CONFIG['api_port']
+    server = await asyncio.start_server(_handle_connection, host, port)
+    _logger.info(f"JSON 接口已启动: http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def run(host: str = None, port: int = None):
+    """前台运行接口服务（run_app.py api）"""
+    asyncio.run(serve(host, port))
+
+
+_background = None
+_background_lock = threading.Lock()
+
+
+def start_in_background(host: str = None, port: int = None) -> bool:
+    """
+    在后台线程中启动接口服务（每个进程只启动一次），与调用方进程共用结果缓存
+    :return: 是否由本次调用启动
+    """
+    global _background
+    with _background_lock:
+        if _background is not None:
+            return False
+        _background = threading.Thread(target=_run_background, args=(host, port), name="api-server", daemon=True)
+        _background.start()
+    return True
+
+
+def _run_background(host, port):
+    try:
+        run(host, port)
+    except OSError as e:
+        # 端口被占用（如同时运行了多个 Web 界面）时只记录，不影响界面
+        print(f"JSON 接口启动失败: {str(e)}")
+        _logger.warning(f"JSON 接口启动失败: {e}")
@@ -0,0 +1,35 @@
+"""
+日志配置
+按 LOGGING_CONFIG 创建日志记录器：写入 LOG_DIR 下的日志文件，级别和格式取自配置
+"""
+
+import os
+import logging
+import threading
+from config import LOGGING_CONFIG, LOG_DIR
+
+ROOT_LOGGER = "sf_analysis"
+
+_lock = threading.Lock()
+_configured = False
+
+
+def _configure():
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.setLevel(getattr(logging, str(LOGGING_CONFIG['level']).upper(), logging.INFO))
+        handler = logging.FileHandler(os.path.join(LOG_DIR, LOGGING_CONFIG['file']), encoding="utf-8")
+        handler.setFormatter(logging.Formatter(LOGGING_CONFIG['format']))
+        logger.addHandler(handler)
+        # 不向根记录器传播，避免与 streamlit 等框架的日志重复输出
+        logger.propagate = False
+        _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    """返回 sf_analysis.<name> 记录器，首次调用时按 LOGGING_CONFIG 配置文件输出"""
+    _configure()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -0,0 +1,200 @@
+"""
+向量化回测
+把逐周信号（advisor_stock.analyze_stock_history / advisor_fund.analyze_fund_history）转换为仓位序列，
+一次性计算多只标的的净值曲线、换手率和回撤
+
+约定：
+- 以周收盘价成交，第 t 周收盘时根据信号调整仓位，获得第 t+1 周的收益（不使用未来数据）
+- 交易成本按换手（仓位变化的绝对值）× fee_rate 在调仓当周扣除
+- 所有标的按周日期（W-FRI）对齐为 (周 × 代码) 的二维数组，停牌/无数据的周收益为 0、仓位沿用
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from config import DATA_CONFIG
+from advisor_stock import analyze_stock_history
+from advisor_fund import analyze_fund_history
+
+WEEKS_PER_YEAR = 52
+DEFAULT_FEE_RATE = 0.0015   # 单边交易成本（佣金+滑点）
+REDUCE_RATIO = 0.5          # 「减仓」每次减去当前仓位的一半（与建议说明「先减1/2仓位」一致）
+
+
+# ===================== 面板对齐 =====================
+def stack_histories(histories: dict, columns: list) -> tuple:
+    """
+    把 {代码: 逐周信号表} 按周日期对齐
+    :return: (周日期索引, 代码列表, {列名: DataFrame[周 × 代码]})
+    """
+    codes = [c for c, h in histories.items() if h is not None and len(h) > 0]
+    if not codes:
+        return pd.DatetimeIndex([]), [], {col: pd.DataFrame() for col in columns}
+    frames = {col: pd.concat({c: histories[c][col] for c in codes}, axis=1) for col in columns}
+    dates = frames[columns[0]].index
+    return dates, codes, frames
+
+
+# ===================== 仓位 =====================
+def _last_event(mask: np.ndarray) -> np.ndarray:
+    """每一行之前（含）最近一次事件所在的行号，尚无事件为 -1"""
+    rows = np.arange(mask.shape[0])[:, None]
+    return np.maximum.accumulate(np.where(mask, rows, -1), axis=0)
+
+
+def stock_positions(actions: np.ndarray, close: np.ndarray, stop: np.ndarray, use_stop: bool = True) -> np.ndarray:
+    """
+    股票信号 → 目标仓位（0~1）
+    - 买入：满仓；清仓：空仓；减仓：当前仓位减半；观望：保持
+    - 止损：持仓期间收盘价跌破上一周的止损位（stop_loss_price，支撑位-0.05）即空仓，
+      「止损」建议本身不改变仓位，只表示按止损位严格执行
+    :param actions: 投资建议 [T×N]，缺失为空字符串
+    :param close: 收盘价 [T×N]
+    :param stop: 止损位 [T×N]（止损建议列）
+    """
+    actions = np.asarray(actions, dtype=object)
+    close = np.asarray(close, dtype=float)
+    stop = pd.DataFrame(np.asarray(stop, dtype=float)).ffill().to_numpy()
+    prev_stop = np.vstack([np.full((1, stop.shape[1]), np.nan), stop[:-1]])
+
+    buy = actions == "买入"
+    exit_ = actions == "清仓"
+    if use_stop:
+        with np.errstate(invalid="ignore"):
+            exit_ = exit_ | (close < prev_stop)
+    reset = buy | exit_
+    reduce = (actions == "减仓") & ~reset
+
+    # 仓位 = 最近一次重置的取值 × 0.5^(此后的减仓次数)
+    last = _last_event(reset)
+    safe = np.maximum(last, 0)
+    level = np.where(last >= 0, np.take_along_axis(np.where(exit_, 0.0, 1.0), safe, axis=0), 0.0)
+    reduce_count = np.cumsum(reduce, axis=0)
+    reduce_since = reduce_count - np.where(last >= 0, np.take_along_axis(reduce_count, safe, axis=0), 0)
+    return level * REDUCE_RATIO ** reduce_since
+
+
+def fund_positions(position_pct: np.ndarray) -> np.ndarray:
+    """基金「建议仓位(%)」→ 目标仓位（0~1），缺失的周沿用上一周仓位"""
+    pct = pd.DataFrame(np.asarray(position_pct, dtype=float)).ffill().fillna(0.0).to_numpy()
+    return np.clip(pct / 100.0, 0.0, 1.0)
+
+
+# ===================== 净值 / 换手 / 回撤 =====================
+def run_backtest(weights: np.ndarray, returns: np.ndarray, fee_rate: float = DEFAULT_FEE_RATE) -> dict:
+    """
+    :param weights: 每周收盘后的目标仓位 [T×N]
+    :param returns: 每周收益 [T×N]，缺失视为 0
+    :return: 字典，strategy_ret / equity / turnover / drawdown 均为 [T×N]
+    """
+    weights = np.asarray(weights, dtype=float)
+    returns = np.nan_to_num(np.asarray(returns, dtype=float))
+    held = np.vstack([np.zeros((1, weights.shape[1])), weights[:-1]])
+    turnover = np.abs(weights - held)
+    strategy_ret = held * returns - turnover * fee_rate
+    equity = np.cumprod(1 + strategy_ret, axis=0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+    return {
+        "weights": weights,
+        "strategy_ret": strategy_ret,
+        "equity": equity,
+        "turnover": turnover,
+        "drawdown": drawdown,
+    }
+
+
+def summarize_backtest(result: dict, codes: list, returns: np.ndarray) -> pd.DataFrame:
+    """每个代码的回测汇总：累计/年化收益、年化波动、最大回撤、换手、交易次数、持仓占比，以及买入持有的对照收益"""
+    weeks = result["equity"].shape[0]
+    if weeks == 0:
+        return pd.DataFrame()
+    equity = result["equity"]
+    strategy_ret = result["strategy_ret"]
+    turnover = result["turnover"]
+    hold_equity = np.cumprod(1 + np.nan_to_num(np.asarray(returns, dtype=float)), axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annual_ret = equity[-1] ** (WEEKS_PER_YEAR / weeks) - 1
+    return pd.DataFrame({
+        "代码": codes,
+        "累计收益(%)": np.round((equity[-1] - 1) * 100, 2),
+        "年化收益(%)": np.round(annual_ret * 100, 2),
+        "年化波动(%)": np.round(strategy_ret.std(axis=0, ddof=1) * np.sqrt(WEEKS_PER_YEAR) * 100, 2) if weeks > 1 else 0.0,
+        "最大回撤(%)": np.round(result["drawdown"].min(axis=0) * 100, 2),
+        "累计换手": np.round(turnover.sum(axis=0), 2),
+        "交易次数": (turnover > 0).sum(axis=0),
+        "持仓周占比(%)": np.round((result["weights"] > 0).mean(axis=0) * 100, 1),
+        "买入持有收益(%)": np.round((hold_equity[-1] - 1) * 100, 2),
+    })
+
+
+def _package(dates, codes, weights, returns, fee_rate) -> dict:
+    result = run_backtest(weights, returns, fee_rate)
+    # 组合：各代码等权，每周再平衡
+    portfolio_ret = result["strategy_ret"].mean(axis=1) if codes else np.zeros(len(dates))
+    portfolio = pd.DataFrame({
+        "周收益": portfolio_ret,
+        "净值": np.cumprod(1 + portfolio_ret),
+        "换手": result["turnover"].mean(axis=1) if codes else np.zeros(len(dates)),
+    }, index=dates)
+    portfolio["回撤"] = portfolio["净值"] / portfolio["净值"].cummax() - 1
+    return {
+        "equity": pd.DataFrame(result["equity"], index=dates, columns=codes),
+        "positions": pd.DataFrame(result["weights"], index=dates, columns=codes),
+        "turnover": pd.DataFrame(result["turnover"], index=dates, columns=codes),
+        "drawdown": pd.DataFrame(result["drawdown"], index=dates, columns=codes),
+        "portfolio": portfolio,
+        "summary": summarize_backtest(result, codes, returns),
+    }
+
+
+# ===================== 对外接口 =====================
+def backtest_stock_histories(histories: dict, fee_rate: float = DEFAULT_FEE_RATE, use_stop: bool = True) -> dict:
+    """
+    基于已计算的股票逐周信号回测（不做网络请求）
+    :param histories: {股票代码: stock_signal_history 的结果}
+    :return: equity / positions / turnover / drawdown（DataFrame[周 × 代码]）、portfolio（等权组合）、summary（逐代码汇总）
+    """
+    dates, codes, f = stack_histories(histories, ["投资建议", "最新收盘", "止损建议", "周收益"])
+    weights = stock_positions(f["投资建议"].fillna("").to_numpy(), f["最新收盘"].to_numpy(),
+                              f["止损建议"].to_numpy(), use_stop) if codes else np.zeros((len(dates), 0))
+    return _package(dates, codes, weights, f["周收益"].to_numpy() if codes else weights, fee_rate)
+
+
+def backtest_fund_histories(histories: dict, fee_rate: float = DEFAULT_FEE_RATE) -> dict:
+    """
+    基于已计算的基金逐周信号回测，仓位取「建议仓位(%)」
+    :param histories: {基金代码: fund_signal_history 的结果}
+    """
+    dates, codes, f = stack_histories(histories, ["建议仓位(%)", "周收益"])
+    weights = fund_positions(f["建议仓位(%)"].to_numpy()) if codes else np.zeros((len(dates), 0))
+    return _package(dates, codes, weights, f["周收益"].to_numpy() if codes else weights, fee_rate)
+
+
+def _load_histories(loader, codes: list, max_workers: int = None) -> dict:
+    codes = list(dict.fromkeys(str(c).strip() for c in codes if str(c).strip()))
+    if max_workers is None:
+        max_workers = DATA_CONFIG['max_workers']
+
+    def load(code):
+        try:
+            return loader(code)
+        except Exception as e:
+            print(f"获取{code}逐周信号失败: {str(e)}")
+            return pd.DataFrame()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(codes, executor.map(load, codes)))
+
+
+def backtest_stocks(stock_codes: list, fee_rate: float = DEFAULT_FEE_RATE, use_stop: bool = True,
+                    max_workers: int = None, params: dict = None) -> dict:
+    """批量回测股票：并发获取每只股票的全历史信号后一次性回测；params 覆盖信号参数（见 advisor_stock.stock_params）"""
+    histories = _load_histories(lambda code: analyze_stock_history(code, params), stock_codes, max_workers)
+    return backtest_stock_histories(histories, fee_rate, use_stop)
+
+
+def backtest_funds(fund_codes: list, benchmark_code: str = "sh000300", fee_rate: float = DEFAULT_FEE_RATE,
+                   max_workers: int = None) -> dict:
+    """批量回测基金：并发获取每只基金的全历史信号后一次性回测"""
+    return backtest_fund_histories(
+        _load_histories(lambda code: analyze_fund_history(code, benchmark_code), fund_codes, max_workers), fee_rate)
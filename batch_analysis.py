@@ -0,0 +1,274 @@
+"""
+自选清单批量分析（无界面）
+读取代码清单文件，按块分发到多个进程分析，每完成一块立即追加写入结果文件，内存占用与清单长度无关：
+- CSV：追加写入单个文件
+- Parquet：输出为目录，每块写一个 part-xxxxx.parquet（先写临时文件再改名，中断时不会留下损坏的文件）
+再次运行同一命令时跳过结果中已有的代码，中断后可以从断点继续；出错的行在续跑前删除，重新分析。
+预计算结果库（precompute_store）中已有当前交易日结果的代码直接读取，不再重新分析；
+每个进程内部仍按 DATA_CONFIG['max_workers'] 并发取数；各进程的限速为配置值除以进程数
+（fetch_orchestrator.split_rate_limit，合计不超过 DATA_CONFIG['rate_limit']），熔断状态按进程独立计算
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+import multiprocessing
+import pandas as pd
+from config import BATCH_CONFIG, PRECOMPUTE_CONFIG
+
+# 各分析类型结果中的代码列
+CODE_COLUMNS = {"stock": "股票代码", "fund": "基金代码"}
+# 出错行的判断列
+ERROR_COLUMNS = {"stock": "错误信息", "fund": "错误"}
+_PART_PATTERN = re.compile(r"^part-(\d+)\.parquet$")
+
+
+# ===================== 清单与断点 =====================
+def read_watchlist(path: str) -> list:
+    """
+    读取代码清单：每行一个或多个代码（逗号/空白分隔），# 之后为注释；
+    纯数字代码补足 6 位，重复的代码只保留第一次出现
+    """
+    codes = []
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            for token in re.split(r"[,\s]+", line.split("#", 1)[0]):
+                if token:
+                    codes.append(token.zfill(6) if token.isdigit() else token)
+    return list(dict.fromkeys(codes))
+
+
+def output_format(output: str, fmt: str = None) -> str:
+    """未指定格式时按输出路径判断：.parquet 后缀或已有目录为 parquet，其余为 csv"""
+    if fmt:
+        return fmt
+    if output.endswith(".parquet") or os.path.isdir(output):
+        return "parquet"
+    return "csv"
+
+
+def _parts(output: str) -> list:
+    if not os.path.isdir(output):
+        return []
+    return sorted(name for name in os.listdir(output) if _PART_PATTERN.match(name))
+
+
+def _error_mask(df: pd.DataFrame, kind: str) -> pd.Series:
+    """错误列非空的行"""
+    column = ERROR_COLUMNS[kind]
+    if column not in df.columns:
+        return pd.Series(False, index=df.index)
+    return df[column].fillna("").astype(str).str.strip().ne("")
+
+
+def completed_codes(output: str, kind: str, fmt: str = None) -> set:
+    """结果文件中已成功分析的代码（断点续跑时跳过）；出错的行不计入，续跑时重新分析"""
+    column = CODE_COLUMNS[kind]
+    columns = [column, ERROR_COLUMNS[kind]]
+    if output_format(output, fmt) == "parquet":
+        codes = set()
+        for name in _parts(output):
+            df = pd.read_parquet(os.path.join(output, name), columns=columns)
+            codes.update(df.loc[~_error_mask(df, kind), column].astype(str))
+        return codes
+    if not os.path.exists(output) or os.path.getsize(output) == 0:
+        return set()
+    _repair_csv_tail(output)
+    df = pd.read_csv(output, usecols=lambda c: c in columns, dtype=str)
+    return set(df.loc[~_error_mask(df, kind), column].dropna())
+
+
+def drop_error_rows(output: str, kind: str, fmt: str = None) -> int:
+    """
+    删除结果中出错的行，使续跑时重新写入的结果不与旧的错误行重复
+    CSV 改写整个文件，Parquet 只改写含出错行的 part（均先写临时文件再改名）
+    :return: 删除的行数
+    """
+    dropped = 0
+    if output_format(output, fmt) == "parquet":
+        for name in _parts(output):
+            path = os.path.join(output, name)
+            df = pd.read_parquet(path)
+            mask = _error_mask(df, kind)
+            if not mask.any():
+                continue
+            dropped += int(mask.sum())
+            if mask.all():
+                os.remove(path)
+            else:
+                df[~mask].to_parquet(path + ".tmp", index=False)
+                os.replace(path + ".tmp", path)
+        return dropped
+    if not os.path.exists(output) or os.path.getsize(output) == 0:
+        return 0
+    _repair_csv_tail(output)
+    df = pd.read_csv(output, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    mask = _error_mask(df, kind)
+    if mask.any():
+        dropped = int(mask.sum())
+        df[~mask].to_csv(output + ".tmp", index=False, encoding="utf-8-sig")
+        os.replace(output + ".tmp", output)
+    return dropped
+
+
+def _repair_csv_tail(path: str):
+    """上次运行在写入中途被中断时，截掉末尾不完整的一行"""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # 从末尾向前找最后一个换行符
+        pos = size - 1
+        while pos > 0:
+            step = min(65536, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            idx = chunk.rfind(b"\n")
+            if idx >= 0:
+                f.truncate(pos - step + idx + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+# ===================== 结果写入 =====================
+class CsvResultWriter:
+    """追加写入 CSV；新文件先写表头"""
+
+    def __init__(self, path: str, columns: list):
+        self.columns = columns
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", encoding="utf-8-sig" if new_file else "utf-8", newline="")
+        if new_file:
+            pd.DataFrame(columns=columns).to_csv(self._file, index=False)
+
+    def write(self, df: pd.DataFrame):
+        df.reindex(columns=self.columns).to_csv(self._file, header=False, index=False)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """每次写入一个新的 part 文件，编号接着目录中已有的文件"""
+
+    def __init__(self, path: str, columns: list):
+        self.path = path
+        self.columns = columns
+        os.makedirs(path, exist_ok=True)
+        parts = _parts(path)
+        self._next = int(_PART_PATTERN.match(parts[-1]).group(1)) + 1 if parts else 0
+
+    def write(self, df: pd.DataFrame):
+        target = os.path.join(self.path, f"part-{self._next:05d}.parquet")
+        df.reindex(columns=self.columns).to_parquet(target + ".tmp", index=False)
+        os.replace(target + ".tmp", target)
+        self._next += 1
+
+    def close(self):
+        pass
+
+
+# ===================== 批量执行 =====================
+def _stored_rows(kind: str, codes: list) -> dict:
+    """预计算结果库中当前交易日的结果，展开为结果行：{代码: 行}"""
+    if not PRECOMPUTE_CONFIG['read_store']:
+        return {}
+    from precompute_store import get_many
+    stored = get_many(kind, codes)
+    if kind == "stock":
+        return stored
+    from advisor_fund import fund_result_row
+    return {code: fund_result_row(code, result) for code, result in stored.items()}
+
+
+def _analyze_chunk(kind: str, codes: list) -> pd.DataFrame:
+    """在工作进程中分析一块代码；预计算结果库中已有的代码直接读取"""
+    stored = _stored_rows(kind, codes)
+    frames = [pd.DataFrame(list(stored.values()), columns=_result_columns(kind))] if stored else []
+    rest = [code for code in codes if code not in stored]
+    if rest and kind == "stock":
+        from advisor_stock import analyze_stocks
+        frames.append(analyze_stocks(rest))
+    elif rest:
+        from advisor_fund import analyze_funds
+        frames.append(analyze_funds(rest))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def _result_columns(kind: str) -> list:
+    if kind == "stock":
+        from advisor_stock import STOCK_RESULT_COLUMNS
+        return STOCK_RESULT_COLUMNS
+    from advisor_fund import FUND_RESULT_COLUMNS
+    return FUND_RESULT_COLUMNS
+
+
+def run_batch(codes: list, kind: str, output: str, processes: int = None, chunk_size: int = None,
+              fmt: str = None, resume: bool = True) -> dict:
+    """
+    批量分析并流式写入结果
+    :param kind: stock / fund
+    :param processes: 进程数，默认 BATCH_CONFIG['processes']（None 为 CPU 核数）；1 时在当前进程执行
+    :param chunk_size: 每个任务（也是每次写入）的代码数，默认 BATCH_CONFIG['chunk_size']
+    :param fmt: csv / parquet，默认按输出路径判断
+    :param resume: 跳过结果中已成功的代码，出错的行删除后重新分析；False 时要求输出不存在
+    :return: 运行统计
+    """
+    if kind not in CODE_COLUMNS:
+        raise ValueError(f"未知的分析类型: {kind}")
+    if processes is None:
+        processes = BATCH_CONFIG['processes'] or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = BATCH_CONFIG['chunk_size']
+    fmt = output_format(output, fmt)
+    if not resume and os.path.exists(output):
+        raise FileExistsError(f"输出已存在: {output}（续跑请去掉 --no-resume）")
+
+    retried = drop_error_rows(output, kind, fmt) if resume else 0
+    done = completed_codes(output, kind, fmt) if resume else set()
+    todo = [code for code in codes if code not in done]
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+    writer_cls = ParquetResultWriter if fmt == "parquet" else CsvResultWriter
+    writer = writer_cls(output, _result_columns(kind))
+    stats = {"总数": len(codes), "跳过": len(codes) - len(todo), "重试": retried, "完成": 0, "出错": 0,
+             "输出": output}
+    start = time.perf_counter()
+
+    def record(df: pd.DataFrame):
+        writer.write(df)
+        stats["完成"] += len(df)
+        stats["出错"] += int(df[ERROR_COLUMNS[kind]].fillna("").astype(str).str.len().gt(0).sum())
+        elapsed = time.perf_counter() - start
+        print(f"  已完成 {stats['完成']}/{len(todo)}（出错 {stats['出错']}，{elapsed:.1f} 秒）", flush=True)
+
+    try:
+        if processes <= 1:
+            for chunk in chunks:
+                record(_analyze_chunk(kind, chunk))
+        else:
+            # 同时在途的块数有上限，结果按完成顺序写入
+            from fetch_orchestrator import split_rate_limit
+            processes = min(processes, len(chunks)) or 1
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                     initializer=split_rate_limit, initargs=(processes,)) as executor:
+                pending = set()
+                for chunk in chunks:
+                    pending.add(executor.submit(_analyze_chunk, kind, chunk))
+                    if len(pending) >= processes * 2:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            record(future.result())
+                for future in as_completed(pending):
+                    record(future.result())
+    finally:
+        writer.close()
+    stats["耗时(秒)"] = round(time.perf_counter() - start, 2)
+    return stats
@@ -0,0 +1,103 @@
+"""
+进程级共享的基准指数数据
+同一进程内所有分析调用共用一份指数日线，每个交易时段最多加载一次；
+多个线程同时请求同一指数时只有一个线程真正加载，其余线程等待同一份结果（single_flight）
+"""
+
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from data_cache import get_daily_bars
+from data_provider import get_provider
+from trading_calendar import current_session
+from single_flight import SingleFlight
+
+# 日线缓存候选键：(数据源, 复权类型)
+INDEX_DAILY_SOURCES = [("sina_index", ""), ("em_index", "")]
+# 一次加载的最少年限，覆盖股票（3年）和基金（3~5年）的最新分析；基金全历史需要更长时按需加载
+BENCHMARK_YEARS = 5
+
+_lock = threading.Lock()
+_store = {}      # symbol -> (交易时段, 覆盖年限, 日线)
+_flight = SingleFlight("benchmark_index")
+_stats = {"loads": 0, "hits": 0, "failures": 0}
+
+
+def _download_index_daily(index_symbol: str, start_date: str) -> tuple:
+    """由当前数据源下载指数日线，返回 (日线, 数据源, 复权类型)"""
+    return get_provider().index_daily(index_symbol, start_date)
+
+
+def _load_index_daily(index_symbol: str, years: int) -> pd.DataFrame:
+    start_date = (datetime.now() - timedelta(days=365 * years)).strftime("%Y%m%d")
+    # 磁盘缓存按交易日历判断新鲜度：只有在本交易时段收盘之后抓取的才算新鲜
+    return get_daily_bars(
+        index_symbol, INDEX_DAILY_SOURCES,
+        lambda start: _download_index_daily(index_symbol, start or start_date),
+        start_date, None, get_provider().use_cache,
+    )
+
+
+def _load_into_store(index_symbol: str, session: str, years: int) -> pd.DataFrame:
+    with _lock:
+        entry = _store.get(index_symbol)
+        if entry is not None and entry[0] == session and entry[1] >= years:
+            # 等待加载期间已由其他线程写入
+            return entry[2]
+    daily = pd.DataFrame()
+    try:
+        daily = _load_index_daily(index_symbol, years)
+    finally:
+        with _lock:
+            _stats["loads"] += 1
+            if len(daily) > 0:
+                _store[index_symbol] = (session, years, daily)
+            else:
+                _stats["failures"] += 1
+    return daily
+
+
+def get_index_daily(index_symbol: str = "sh000300", years: int = BENCHMARK_YEARS) -> pd.DataFrame:
+    """
+    获取共享的指数日线（只读，调用方不要原地修改）
+    同一交易时段内只加载一次，需要的年限超过已加载的范围时才重新加载；加载失败返回空表，下一次调用会重新尝试
+    :param years: 至少覆盖最近多少年，不足 BENCHMARK_YEARS 时按 BENCHMARK_YEARS 加载
+    """
+    years = max(years, BENCHMARK_YEARS)
+    session = current_session()
+    with _lock:
+        entry = _store.get(index_symbol)
+        if entry is not None and entry[0] == session and entry[1] >= years:
+            _stats["hits"] += 1
+            return entry[2]
+    return _flight.do((index_symbol, session, years), lambda: _load_into_store(index_symbol, session, years))
+
+
+def get_index_weekly(index_symbol: str = "sh000300", years: int = 3, with_log_ret: bool = False) -> pd.DataFrame:
+    """由共享日线截取最近 years 年并生成周线（close/ret，可选 log_ret）"""
+    daily = get_index_daily(index_symbol, years)
+    if len(daily) == 0:
+        return pd.DataFrame()
+    end_date = pd.to_datetime(datetime.now().strftime("%Y%m%d"))
+    start_date = pd.to_datetime((datetime.now() - timedelta(days=365 * years)).strftime("%Y%m%d"))
+    daily = daily[(daily.index >= start_date) & (daily.index <= end_date)]
+    weekly = daily[["close"]].resample("W-FRI").last().dropna()
+    weekly["ret"] = weekly["close"].pct_change()
+    if with_log_ret:
+        weekly["log_ret"] = np.log(weekly["close"] / weekly["close"].shift(1))
+    return weekly.dropna()
+
+
+def get_benchmark_stats() -> dict:
+    """返回加载/命中/等待次数"""
+    with _lock:
+        stats = dict(_stats)
+    stats["waits"] = _flight.stats()["coalesced"]
+    return stats
+
+
+def reset_benchmarks():
+    """清空进程内的共享指数数据（磁盘缓存不受影响）"""
+    with _lock:
+        _store.clear()
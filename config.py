@@ -22,7 +22,12 @@ STREAMLIT_CONFIG = {
 SERVER_CONFIG = {
     'host': 'localhost',
     'port': 8881,
-    'headless': True
+    'headless': True,
+    'api_port': 8882,                    # JSON 接口端口（run_app.py api，或开启 api_with_ui 后随 Web 界面启动）
+    'api_with_ui': False,                # 在 Web 界面进程内同时启动 JSON 接口（与界面共用结果缓存），默认只由 run_app.py api 启动
+    'api_keep_alive': 15,                # 长连接空闲超时（秒）
+    'api_max_batch': 1000,               # 批量接口单次最多的代码数
+    'api_max_body': 1 << 20,             # 请求体上限（字节）
 }
 
 # 分析参数配置
@@ -30,7 +35,9 @@ ANALYSIS_CONFIG = {
     # 股票分析参数
     'stock': {
         'relative_strength_period': 12,  # 相对强弱计算周期（周）
-        'breakout_period': 12,          # 突破检测周期（周）
+        'rs_threshold': 0.005,           # 相对强度临界值（微弱正/负的区分）
+        'breakout_period': 12,          # 突破检测周期（周），量能均值取同一周期
+        'breakout_threshold': 0.01,      # 突破幅度阈值（高于前高的比例）
         'volume_threshold': 1.5,          # 量能阈值倍数
         'min_data_points': 50,           # 最小数据点要求
     },
@@ -65,14 +72,65 @@ STAGE_DEFINITIONS = {
 DATA_CONFIG = {
     'retry_times': 3,                    # 重试次数
     'timeout': 30,                       # 超时时间（秒）
-    'cache_hours': 6,                    # 缓存时间（小时）
+    'endpoint_concurrency': 4,           # 每个上游接口的最大并发请求数
+    'hedging': True,                     # 主数据源响应慢时是否同时请求备用数据源
+    'hedge_quantile': 0.9,               # 主数据源超过其最近耗时的该分位数仍未返回时启动备用数据源
+    'hedge_min_samples': 20,             # 耗时样本少于此数时改用固定延迟 hedge_delay
+    'hedge_delay': 3.0,                  # 固定对冲延迟（秒）
+    'rate_limit': 5.0,                   # 每个上游接口的平均请求速率（次/秒），0 或 None 不限速
+    'rate_burst': 5,                     # 令牌桶容量（允许的突发请求数）
+    'breaker_failures': 5,               # 连续多少次调用失败后熔断（重试只计一次，确定性错误不计）
+    'breaker_cooldown': 60,              # 熔断持续时间（秒），之后放行一个探测请求
+    'endpoint_limits': {},               # 按接口名覆盖上面四项，如 {'stock_zh_a_spot_em': {'rate_limit': 0.2}}
+    'cache_hours': 6,                    # 缓存时间（小时），仅 freshness 为 hours 时使用
+    'freshness': 'calendar',             # 缓存过期策略：calendar（按交易日历，收盘/净值公布后才过期）/ hours
+    'max_workers': 8,                    # 批量分析并发获取线程数
+    'snapshot_seconds': 300,             # 全市场行情快照的刷新间隔（秒）
+    'metadata_days': 7,                  # 股票/基金基本信息的有效期（天），与行情缓存分开
+    'provider': 'akshare',               # 数据源：akshare（在线）/ replay（回放 REPLAY_DIR 中录制的数据）
+}
+
+# 交易日历配置
+CALENDAR_CONFIG = {
+    'holiday_file': 'trading_holidays.txt',  # 节假日文件（相对 BASE_DIR），每行一个 YYYY-MM-DD
+    'market_close': '15:00',             # A股收盘时间，日线/周线此后才更新
+    'fund_nav_time': '21:00',            # 基金净值公布时间
+    'lag_retry_minutes': 30,             # 已过发布时间但数据源尚未更新时的重试间隔（分钟）
+    'lag_window_hours': 6,               # 发布后多长时间内重试，之后视为当天没有新数据（停牌等）
+}
+
+# 分析任务队列（进程池）配置
+JOB_CONFIG = {
+    'max_workers': None,                 # 工作进程数，None 为 CPU 核数
+    'keep_finished': 500,                # 保留的已结束任务数（供查询状态）
+    'poll_interval': 0.2,                # Web 界面轮询任务状态的间隔（秒）
+}
+
+# 自选清单批量分析配置（run_app.py analyze）
+BATCH_CONFIG = {
+    'processes': None,                   # 进程数，None 为 CPU 核数
+    'chunk_size': 50,                    # 每个任务（每次写入结果）的代码数
+}
+
+# 夜间预计算配置（run_app.py precompute）
+PRECOMPUTE_CONFIG = {
+    'universe': {                        # 各类型的代码清单文件（相对 BASE_DIR），格式同 analyze 子命令
+        'stock': 'universe_stock.txt',
+        'fund': 'universe_fund.txt',
+    },
+    'processes': None,                   # 进程数，None 为 CPU 核数
+    'chunk_size': 20,                    # 每个任务的代码数
+    'keep_sessions': 5,                  # 每个类型保留最近几个交易日的结果
+    'read_store': True,                  # 结果缓存和批量命令行是否优先读取预计算结果
+    'preload_listings': True,            # 预计算前先由全市场代码列表批量写入基本信息库（metadata_store）
 }
 
 # 日志配置
 LOGGING_CONFIG = {
     'level': 'INFO',
     'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    'file': 'investment_analysis.log'
+    'file': 'investment_analysis.log',
+    'timing': False,                     # 是否记录分析各阶段耗时（结果中的「耗时统计」）
 }
 
 # 错误消息
@@ -88,6 +146,7 @@ ERROR_MESSAGES = {
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CACHE_DIR = os.path.join(BASE_DIR, 'cache')
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
+REPLAY_DIR = os.path.join(CACHE_DIR, 'replay')
 
 # 创建必要的目录
 for directory in [CACHE_DIR, LOG_DIR]:
@@ -0,0 +1,247 @@
+"""
+日线数据本地缓存
+以 Parquet 列式格式保存标准化后的原始日线（date 索引 + close/volume 列），
+按 数据源/代码/复权类型 分文件存放，按交易日历判断过期（收盘或净值公布之后才过期，
+DATA_CONFIG['freshness'] 为 hours 时改用 DATA_CONFIG['cache_hours']）；
+过期后只同步最近的尾部数据并合并
+"""
+
+import os
+import json
+import re
+import threading
+from datetime import datetime, time, timedelta
+from typing import Optional
+import numpy as np
+import pandas as pd
+from config import CACHE_DIR, DATA_CONFIG
+from trading_calendar import is_fresh_since
+
+BARS_DIR = os.path.join(CACHE_DIR, 'bars')
+os.makedirs(BARS_DIR, exist_ok=True)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'expired': 0, 'writes': 0, 'errors': 0,
+          'incremental': 0, 'full': 0, 'rows_fetched': 0}
+
+
+# ===================== 标准化 =====================
+def normalize_daily_bars(df: pd.DataFrame, with_volume: bool = True) -> pd.DataFrame:
+    """
+    把 akshare 各接口返回的日线统一为 date 索引 + close(+volume) 列
+    无法识别日期或价格列时返回空表
+    """
+    if df is None or len(df) == 0:
+        return pd.DataFrame()
+    date_col = next((c for c in ("日期", "净值日期", "date") if c in df.columns), None)
+    price_col = next((c for c in ("收盘", "单位净值", "close") if c in df.columns), None)
+    if date_col is None or price_col is None:
+        return pd.DataFrame()
+    out = pd.DataFrame({
+        "date": pd.to_datetime(df[date_col]),
+        "close": pd.to_numeric(df[price_col], errors="coerce"),
+    })
+    if with_volume:
+        vol_col = next((c for c in ("成交量", "volume") if c in df.columns), None)
+        if vol_col:
+            out["volume"] = pd.to_numeric(df[vol_col], errors="coerce").to_numpy()
+    out = out.dropna(subset=["date"]).sort_values("date")
+    out = out.drop_duplicates(subset="date", keep="last").set_index("date")
+    return out
+
+
+# ===================== 文件与元数据 =====================
+def _cache_key(source: str, code: str, adjust: str) -> str:
+    raw = f"{source}_{code}_{adjust or 'none'}"
+    return re.sub(r"[^0-9A-Za-z_\-]", "_", raw)
+
+
+def _paths(source: str, code: str, adjust: str) -> tuple[str, str]:
+    key = _cache_key(source, code, adjust)
+    return os.path.join(BARS_DIR, f"{key}.parquet"), os.path.join(BARS_DIR, f"{key}.meta.json")
+
+
+def _bump(name: str, n: int = 1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def read_meta(source: str, code: str, adjust: str = "") -> dict:
+    """读取缓存元数据（fetched_at / start / last_date / rows），不存在时返回空字典"""
+    _, meta_path = _paths(source, code, adjust)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def read_bars(source: str, code: str, adjust: str = "") -> Optional[pd.DataFrame]:
+    """不做过期检查，直接读取已缓存的日线；文件缺失或损坏时返回None"""
+    data_path, _ = _paths(source, code, adjust)
+    if not os.path.exists(data_path):
+        return None
+    try:
+        return pd.read_parquet(data_path)
+    except Exception:
+        _bump('errors')
+        return None
+
+
+def save_bars(source: str, code: str, adjust: str, df: pd.DataFrame, start_date: Optional[str] = None):
+    """
+    写入日线缓存（先写临时文件再替换，避免并发读到半截文件）
+    :param start_date: 本次数据覆盖的起始日期（YYYYMMDD），None 表示完整历史
+    """
+    if df is None or len(df) == 0:
+        return
+    data_path, meta_path = _paths(source, code, adjust)
+    tmp_suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    meta = {
+        "source": source,
+        "code": code,
+        "adjust": adjust,
+        "fetched_at": datetime.now().isoformat(timespec="seconds"),
+        "start": start_date,
+        "last_date": df.index[-1].strftime("%Y-%m-%d"),
+        "rows": int(len(df)),
+    }
+    try:
+        df.to_parquet(data_path + tmp_suffix)
+        os.replace(data_path + tmp_suffix, data_path)
+        with open(meta_path + tmp_suffix, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + tmp_suffix, meta_path)
+        _bump('writes')
+    except Exception:
+        # 缺少 pyarrow 或磁盘不可写时仅放弃缓存，不影响分析
+        _bump('errors')
+        for path in (data_path + tmp_suffix, meta_path + tmp_suffix):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def is_fresh(meta: dict, max_age_hours: Optional[float] = None, publish_time: Optional[time] = None) -> bool:
+    """
+    判断缓存是否新鲜
+    :param max_age_hours: 给出时按抓取时间判断（0 表示一律过期）；否则按交易日历，抓取之后没有新的数据发布即为新鲜
+    :param publish_time: 数据发布时间，默认收盘时间（基金净值用 trading_calendar.FUND_NAV_TIME）
+    """
+    if not meta.get("fetched_at"):
+        return False
+    fetched_at = datetime.fromisoformat(meta["fetched_at"])
+    if max_age_hours is None and DATA_CONFIG.get('freshness', 'calendar') == 'calendar':
+        return is_fresh_since(fetched_at, meta.get("last_date"), publish_time=publish_time)
+    if max_age_hours is None:
+        max_age_hours = DATA_CONFIG['cache_hours']
+    return datetime.now() - fetched_at < timedelta(hours=max_age_hours)
+
+
+def _covers(meta: dict, start_date: Optional[str]) -> bool:
+    """缓存是否覆盖所需的起始日期（start 为 None 表示完整历史）"""
+    if meta.get("start") is None:
+        return True
+    if start_date is None:
+        return False
+    return meta["start"] <= start_date
+
+
+# ===================== 增量同步 =====================
+def _sync_tail(code: str, source: str, adjust: str, meta: dict, download) -> tuple:
+    """
+    只下载倒数第二个存储日期（含）之后的数据并合并：最后一根可能是盘中抓取的未收盘日线，
+    收盘后价格必然变化，用它判断复权因子会把每次盘中抓取都当成除权；倒数第二根一定已收盘
+    :return: (合并后的日线, 下载结果 (日线, 数据源, 复权类型))；合并结果为 None 表示无法增量合并
+             （数据源切换、复权因子变化等），需要全量下载
+    """
+    stored = read_bars(source, code, adjust)
+    if stored is None or len(stored) == 0:
+        return None, None
+    anchor = stored.index[-2] if len(stored) > 1 else stored.index[-1]
+    fetched = download(anchor.strftime("%Y%m%d"))
+    tail, tail_source, tail_adjust = fetched
+    if tail is None or len(tail) == 0:
+        # 上游暂不可用：先返回已有数据，元数据不更新，下次继续尝试同步
+        return stored, fetched
+    if (tail_source, tail_adjust) != (source, adjust):
+        return None, fetched
+    tail = tail[tail.index >= anchor]
+    # 没有重叠日无法确认复权因子；重叠日收盘价不一致说明前复权因子已变化，旧数据需要整体重下
+    if anchor not in tail.index or not np.isclose(tail.loc[anchor, "close"], stored.loc[anchor, "close"], rtol=1e-6):
+        return None, fetched
+    merged = pd.concat([stored[stored.index < anchor], tail])
+    save_bars(source, code, adjust, merged, meta.get("start"))
+    _bump('incremental')
+    _bump('rows_fetched', len(tail))
+    return merged, fetched
+
+
+# ===================== 对外接口 =====================
+def get_daily_bars(code: str, candidates: list, download, start_date: Optional[str] = None,
+                   max_age_hours: Optional[float] = None, use_cache: bool = True,
+                   publish_time: Optional[time] = None, ranged: bool = True) -> pd.DataFrame:
+    """
+    带缓存的日线获取：新鲜缓存直接返回，过期缓存只同步尾部，缺失时全量下载
+    :param candidates: 按优先级排列的 (数据源, 复权类型) 列表，命中任意一个新鲜缓存即返回
+    :param download: download(start) 返回 (标准化日线, 实际数据源, 实际复权类型)，
+                     start 为 YYYYMMDD 或 None（完整历史）；不支持日期区间的接口可以忽略 start
+    :param start_date: 所需的起始日期（YYYYMMDD），None 表示需要完整历史
+    :param max_age_hours: 覆盖默认有效期，0 表示强制同步
+    :param use_cache: False 时直接调用 download（数据源本身就在本地，如回放数据）
+    :param publish_time: 数据每天的发布时间，用于按交易日历判断过期，默认收盘时间
+    :param ranged: download 是否支持起始日期；False 时（如基金净值）尾部同步下载的就是完整走势，
+                   无法增量合并时直接使用，不再重复下载
+    """
+    if not use_cache:
+        df, _, _ = download(start_date)
+        return df if df is not None else pd.DataFrame()
+    stale = None
+    for source, adjust in candidates:
+        meta = read_meta(source, code, adjust)
+        if not meta or not _covers(meta, start_date):
+            continue
+        if not is_fresh(meta, max_age_hours, publish_time):
+            stale = stale or (source, adjust, meta)
+            continue
+        df = read_bars(source, code, adjust)
+        if df is not None and len(df) > 0:
+            _bump('hits')
+            return df
+
+    fetched = None
+    if stale is not None:
+        _bump('expired')
+        df, fetched = _sync_tail(code, *stale, download)
+        if df is not None:
+            return df
+    else:
+        _bump('misses')
+
+    if ranged or fetched is None:
+        fetched = download(start_date)
+    df, source, adjust = fetched
+    if df is not None and len(df) > 0:
+        save_bars(source, code, adjust, df, start_date)
+        _bump('full')
+        _bump('rows_fetched', len(df))
+        return df
+    return pd.DataFrame()
+
+
+def get_cache_stats() -> dict:
+    """返回缓存命中统计（含命中率）"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses'] + stats['expired']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def clear_cache():
+    """删除所有日线缓存文件并重置统计"""
+    for name in os.listdir(BARS_DIR):
+        if name.endswith((".parquet", ".meta.json")):
+            os.remove(os.path.join(BARS_DIR, name))
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
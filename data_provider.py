@@ -0,0 +1,417 @@
+"""
+数据源抽象
+分析代码只通过 get_provider() 取数，具体实现可以替换：
+- AkshareProvider：在线数据（akshare），内含各接口的备用数据源链
+- ReplayProvider：从本地文件回放已录制的数据，可注入延迟和失败，用于离线、可重复的性能测试
+- RecordingProvider：包装任意数据源，把返回的数据按回放格式写入目录
+
+日线类接口统一返回 (标准化日线, 实际数据源, 复权类型)，与 data_cache.get_daily_bars 的 download 约定一致；
+所有数据源都失败时返回空表，信息类接口失败时返回空字典；
+ReplayProvider 注入的失败例外，直接抛出 ProviderError，由 analyze_stock / analyze_fund_enhanced 转换为错误结果
+"""
+
+import os
+import json
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+import pandas as pd
+from config import DATA_CONFIG, REPLAY_DIR
+from data_cache import normalize_daily_bars
+from lazy_imports import timed_import
+from fetch_orchestrator import fetch, fetch_first
+
+_ak = None
+_ak_lock = threading.Lock()
+
+
+class ProviderError(Exception):
+    """数据源请求失败（ReplayProvider 注入的失败也抛出此异常）"""
+
+
+# ===================== 接口 =====================
+class DataProvider(ABC):
+    """数据源接口：子类必须实现下列全部方法"""
+
+    name = "base"
+    # False 表示数据本身就在本地，不需要再经过日线缓存
+    use_cache = True
+
+    @abstractmethod
+    def stock_info(self, stock_code: str) -> dict:
+        ...
+
+    @abstractmethod
+    def stock_daily(self, stock_code: str, start_date: str, end_date: str) -> tuple:
+        """股票日线（start_date/end_date 为 YYYYMMDD）"""
+
+    @abstractmethod
+    def index_daily(self, index_symbol: str, start_date: str = None) -> tuple:
+        """指数日线，index_symbol 形如 sh000300，start_date 为 None 表示完整历史"""
+
+    @abstractmethod
+    def fund_info(self, fund_code: str) -> dict:
+        ...
+
+    @abstractmethod
+    def fund_nav(self, fund_code: str) -> tuple:
+        """基金完整单位净值走势（close 列为单位净值）"""
+
+    @abstractmethod
+    def market_snapshot(self) -> pd.DataFrame:
+        """全市场A股行情快照（含 代码/名称/最新价/涨跌幅 列），失败时返回空表"""
+
+    @abstractmethod
+    def stock_list(self) -> pd.DataFrame:
+        """全部A股代码和名称（code/name 列），失败时返回空表"""
+
+    @abstractmethod
+    def fund_list(self) -> pd.DataFrame:
+        """全部公募基金代码、简称和类型（基金代码/基金简称/基金类型 列），失败时返回空表"""
+
+
+# ===================== akshare =====================
+def _item_value_dict(df: pd.DataFrame) -> dict:
+    info = {}
+    if df is None:
+        return info
+    for _, row in df.iterrows():
+        k = str(row.get("item", "")).strip()
+        v = str(row.get("value", "")).strip()
+        if k:
+            info[k] = v
+    return info
+
+
+def _akshare():
+    """首次请求在线数据时才导入 akshare（导入需要数秒）；未安装时返回 None"""
+    global _ak
+    with _ak_lock:
+        if _ak is None:
+            try:
+                _ak = timed_import("akshare")
+            except ImportError:
+                _ak = False
+    return _ak or None
+
+
+class AkshareProvider(DataProvider):
+    """在线数据（akshare）；每次请求经 fetch_orchestrator 调度（超时、重试、每个接口的并发上限、备用数据源对冲）"""
+
+    name = "akshare"
+
+    def stock_info(self, stock_code: str) -> dict:
+        ak = _akshare()
+        if ak is None:
+            return {}
+        # 失败时由调用方改从共享的全市场快照（market_snapshot）中查找
+        try:
+            return _item_value_dict(fetch("stock_individual_info_em", lambda: ak.stock_individual_info_em(symbol=stock_code)))
+        except Exception:
+            return {}
+
+    def stock_daily(self, stock_code: str, start_date: str, end_date: str) -> tuple:
+        """按 东财前复权 → 新浪前复权 → 新浪不复权 的优先级下载（东财慢时对冲新浪前复权，见 fetch_first）"""
+        ak = _akshare()
+        if ak is None:
+            return pd.DataFrame(), "sina_daily", ""
+        pref = "sh" if stock_code.startswith("6") else "sz"
+        candidates = [
+            ("stock_zh_a_hist", "em_hist", "qfq",
+             lambda: ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")),
+            ("stock_zh_a_daily", "sina_daily", "qfq",
+             lambda: ak.stock_zh_a_daily(symbol=f"{pref}{stock_code}", start_date=start_date, end_date=end_date, adjust="qfq")),
+            ("stock_zh_a_daily", "sina_daily", "",
+             lambda: ak.stock_zh_a_daily(symbol=f"{pref}{stock_code}", start_date=start_date, end_date=end_date)),
+        ]
+        # 复权类型不同的数据不能互相替代：只在前复权数据源之间对冲，都失败后才改用不复权数据
+        for group in (candidates[:2], candidates[2:]):
+            try:
+                i, df = fetch_first([(name, call) for name, _, _, call in group])
+            except Exception:
+                continue
+            return normalize_daily_bars(df), group[i][1], group[i][2]
+        return pd.DataFrame(), "sina_daily", ""
+
+    def index_daily(self, index_symbol: str, start_date: str = None) -> tuple:
+        """按 新浪 → 东财 的优先级下载（主数据源慢时对冲）"""
+        ak = _akshare()
+        if ak is None:
+            return pd.DataFrame(), "em_index", ""
+        code = index_symbol.replace("sh", "").replace("sz", "")
+        end_date = datetime.now().strftime("%Y%m%d")
+        candidates = [
+            # 新浪接口不支持日期区间，一次返回完整历史
+            ("stock_zh_index_daily", "sina_index", lambda: ak.stock_zh_index_daily(symbol=index_symbol)),
+            ("index_zh_a_hist", "em_index",
+             lambda: ak.index_zh_a_hist(symbol=code, period="daily", start_date=start_date or "19700101", end_date=end_date)),
+        ]
+        try:
+            i, df = fetch_first([(name, call) for name, _, call in candidates])
+        except Exception as e:
+            print(f"获取指数{index_symbol}数据失败: {str(e)}")
+            return pd.DataFrame(), "em_index", ""
+        df = normalize_daily_bars(df, with_volume=False)
+        if start_date and len(df) > 0:
+            df = df.loc[pd.to_datetime(start_date):]
+        return df, candidates[i][1], ""
+
+    def fund_info(self, fund_code: str) -> dict:
+        ak = _akshare()
+        if ak is None:
+            return {}
+        try:
+            return _item_value_dict(fetch("fund_individual_basic_info_xq", lambda: ak.fund_individual_basic_info_xq(symbol=fund_code)))
+        except Exception as e:
+            print(f"获取基金{fund_code}信息失败: {str(e)}")
+            return {}
+
+    def fund_nav(self, fund_code: str) -> tuple:
+        """按 东财 → 东财旧接口 的优先级下载（主数据源慢时对冲）"""
+        ak = _akshare()
+        if ak is None:
+            return pd.DataFrame(), "em_fund_nav_legacy", ""
+        candidates = [
+            ("fund_open_fund_info_em", "em_fund_nav",
+             lambda: ak.fund_open_fund_info_em(symbol=fund_code, indicator="单位净值走势")),
+            ("fund_em_open_fund_info", "em_fund_nav_legacy",
+             lambda: ak.fund_em_open_fund_info(fund=fund_code, indicator="单位净值走势")),
+        ]
+        try:
+            i, df = fetch_first([(name, call) for name, _, call in candidates])
+        except Exception:
+            return pd.DataFrame(), "em_fund_nav_legacy", ""
+        return normalize_daily_bars(df, with_volume=False), candidates[i][1], ""
+
+    def market_snapshot(self) -> pd.DataFrame:
+        ak = _akshare()
+        if ak is None:
+            return pd.DataFrame()
+        try:
+            return fetch("stock_zh_a_spot_em", ak.stock_zh_a_spot_em)
+        except Exception as e:
+            print(f"获取全市场行情快照失败: {str(e)}")
+            return pd.DataFrame()
+
+    def stock_list(self) -> pd.DataFrame:
+        ak = _akshare()
+        if ak is None:
+            return pd.DataFrame()
+        try:
+            return fetch("stock_info_a_code_name", ak.stock_info_a_code_name)
+        except Exception as e:
+            print(f"获取A股代码列表失败: {str(e)}")
+            return pd.DataFrame()
+
+    def fund_list(self) -> pd.DataFrame:
+        ak = _akshare()
+        if ak is None:
+            return pd.DataFrame()
+        try:
+            return fetch("fund_name_em", ak.fund_name_em)
+        except Exception as e:
+            print(f"获取基金代码列表失败: {str(e)}")
+            return pd.DataFrame()
+
+
+# ===================== 本地回放 =====================
+def _replay_paths(root: str, kind: str, code: str) -> tuple:
+    folder = os.path.join(root, kind)
+    return os.path.join(folder, f"{code}.parquet"), os.path.join(folder, f"{code}.json")
+
+
+def save_replay_bars(root: str, kind: str, code: str, df: pd.DataFrame, source: str, adjust: str = ""):
+    """按回放格式保存一份日线：{root}/{kind}/{code}.parquet + 同名 .json（数据源、复权类型）"""
+    data_path, meta_path = _replay_paths(root, kind, code)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    df.to_parquet(data_path)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"source": source, "adjust": adjust}, f, ensure_ascii=False)
+
+
+def save_replay_info(root: str, kind: str, code: str, info: dict):
+    """按回放格式保存一份信息字典：{root}/{kind}/{code}.json"""
+    _, meta_path = _replay_paths(root, kind, code)
+    os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False)
+
+
+class ReplayProvider(DataProvider):
+    """
+    从本地目录回放录制的数据（目录格式见 save_replay_bars / save_replay_info）
+    :param root: 回放目录
+    :param latency: 每次请求的模拟延迟（秒），可为固定值或 (最小, 最大) 区间
+    :param failure_rate: 每次请求失败（抛出 ProviderError）的概率
+    :param seed: 随机种子，相同种子下延迟和失败序列可重复
+    :param use_cache: 是否仍经过日线缓存（默认否，回放数据本身就在本地）
+    """
+
+    name = "replay"
+
+    def __init__(self, root: str = None, latency=0.0, failure_rate: float = 0.0, seed: int = None,
+                 use_cache: bool = False):
+        self.root = root or REPLAY_DIR
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.use_cache = use_cache
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "failures": 0, "missing": 0}
+
+    def __getstate__(self):
+        # 可传给工作进程（job_queue、precompute_store）；锁不可序列化，统计在各进程中分别累计
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _simulate(self, what: str):
+        with self._lock:
+            self.stats["requests"] += 1
+            if isinstance(self.latency, (tuple, list)):
+                delay = self._rng.uniform(*self.latency)
+            else:
+                delay = self.latency
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+            if fail:
+                self.stats["failures"] += 1
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise ProviderError(f"回放数据源注入失败: {what}")
+
+    def _bars(self, kind: str, code: str, default_source: str) -> tuple:
+        self._simulate(f"{kind}/{code}")
+        data_path, meta_path = _replay_paths(self.root, kind, code)
+        if not os.path.exists(data_path):
+            with self._lock:
+                self.stats["missing"] += 1
+            return pd.DataFrame(), default_source, ""
+        df = pd.read_parquet(data_path)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        return df, meta.get("source", default_source), meta.get("adjust", "")
+
+    def _info(self, kind: str, code: str) -> dict:
+        self._simulate(f"{kind}/{code}")
+        _, meta_path = _replay_paths(self.root, kind, code)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats["missing"] += 1
+            return {}
+
+    def stock_info(self, stock_code: str) -> dict:
+        return self._info("stock_info", stock_code)
+
+    def stock_daily(self, stock_code: str, start_date: str, end_date: str) -> tuple:
+        df, source, adjust = self._bars("stock_daily", stock_code, "replay")
+        if len(df) > 0:
+            df = df.loc[pd.to_datetime(start_date):pd.to_datetime(end_date)]
+        return df, source, adjust
+
+    def index_daily(self, index_symbol: str, start_date: str = None) -> tuple:
+        df, source, adjust = self._bars("index_daily", index_symbol, "replay")
+        if len(df) > 0 and start_date:
+            df = df.loc[pd.to_datetime(start_date):]
+        return df, source, adjust
+
+    def fund_info(self, fund_code: str) -> dict:
+        return self._info("fund_info", fund_code)
+
+    def fund_nav(self, fund_code: str) -> tuple:
+        return self._bars("fund_nav", fund_code, "replay")
+
+    def market_snapshot(self) -> pd.DataFrame:
+        return self._bars("market_snapshot", "spot", "replay")[0]
+
+    def stock_list(self) -> pd.DataFrame:
+        return self._bars("listing", "stock", "replay")[0]
+
+    def fund_list(self) -> pd.DataFrame:
+        return self._bars("listing", "fund", "replay")[0]
+
+
+class RecordingProvider(DataProvider):
+    """包装另一个数据源，把每次返回的非空结果写入回放目录（录制一次，之后用 ReplayProvider 离线回放）"""
+
+    name = "recording"
+
+    def __init__(self, inner: DataProvider, root: str = None):
+        self.inner = inner
+        self.root = root or REPLAY_DIR
+        self.use_cache = inner.use_cache
+
+    def _record_bars(self, kind: str, code: str, result: tuple) -> tuple:
+        df, source, adjust = result
+        if df is not None and len(df) > 0:
+            save_replay_bars(self.root, kind, code, df, source, adjust)
+        return result
+
+    def _record_info(self, kind: str, code: str, info: dict) -> dict:
+        if info:
+            save_replay_info(self.root, kind, code, info)
+        return info
+
+    def stock_info(self, stock_code: str) -> dict:
+        return self._record_info("stock_info", stock_code, self.inner.stock_info(stock_code))
+
+    def stock_daily(self, stock_code: str, start_date: str, end_date: str) -> tuple:
+        return self._record_bars("stock_daily", stock_code, self.inner.stock_daily(stock_code, start_date, end_date))
+
+    def index_daily(self, index_symbol: str, start_date: str = None) -> tuple:
+        return self._record_bars("index_daily", index_symbol, self.inner.index_daily(index_symbol, start_date))
+
+    def fund_info(self, fund_code: str) -> dict:
+        return self._record_info("fund_info", fund_code, self.inner.fund_info(fund_code))
+
+    def fund_nav(self, fund_code: str) -> tuple:
+        return self._record_bars("fund_nav", fund_code, self.inner.fund_nav(fund_code))
+
+    def market_snapshot(self) -> pd.DataFrame:
+        return self._record_bars("market_snapshot", "spot", (self.inner.market_snapshot(), "em_spot", ""))[0]
+
+    def stock_list(self) -> pd.DataFrame:
+        return self._record_bars("listing", "stock", (self.inner.stock_list(), "stock_code_name", ""))[0]
+
+    def fund_list(self) -> pd.DataFrame:
+        return self._record_bars("listing", "fund", (self.inner.fund_list(), "fund_name_em", ""))[0]
+
+
+# ===================== 当前数据源 =====================
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> DataProvider:
+    """当前数据源：未设置时按 DATA_CONFIG['provider']（akshare / replay）创建"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            kind = DATA_CONFIG.get('provider', 'akshare')
+            if kind == 'akshare':
+                _provider = AkshareProvider()
+            elif kind == 'replay':
+                _provider = ReplayProvider(REPLAY_DIR)
+            else:
+                raise ValueError(f"未知的数据源: {kind}")
+        return _provider
+
+
+def set_provider(provider: DataProvider) -> DataProvider:
+    """替换当前数据源（None 表示恢复为配置中的默认数据源），返回之前的数据源"""
+    global _provider
+    with _provider_lock:
+        previous, _provider = _provider, provider
+    return previous
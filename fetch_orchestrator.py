@@ -0,0 +1,391 @@
+"""
+异步取数调度
+akshare 的接口都是阻塞调用，这里统一放到线程池中执行，由一个后台事件循环调度：
+- 每次调用有超时（DATA_CONFIG['timeout']），超时后调用方立即得到失败，不会被挂起的上游一直阻塞
+- 失败或超时后按带抖动的指数退避重试，最多尝试 DATA_CONFIG['retry_times'] 次；
+  确定性错误（返回数据格式不符等，见 DETERMINISTIC_ERRORS）重试也不会成功，直接失败
+- 每个接口（endpoint）有独立的并发上限（DATA_CONFIG['endpoint_concurrency']）
+- 同时提供异步（afetch）和同步（fetch）入口，两者共用同一个事件循环和并发限制
+- 对冲请求（fetch_first）：主数据源超过其历史耗时分位数仍未返回时，同时启动备用数据源，
+  取最先返回的有效结果，不再等待其余请求（已在线程中执行的阻塞调用无法中断，见 _fetch_first）
+- 每个接口一个令牌桶限速（DATA_CONFIG['rate_limit'] 次/秒，0 或 None 不限速）和熔断器：连续
+  breaker_failures 次调用（一次调用的多次重试只计一次，确定性错误不计）失败后熔断 breaker_cooldown 秒，期间请求立即失败，fetch_first 直接改用备用数据源；
+  冷却结束后放行一个探测请求，成功则恢复
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import DATA_CONFIG
+
+# 执行阻塞调用的线程数；超时的调用仍会占用线程直到上游返回，因此比并发上限宽裕
+FETCH_THREADS = 32
+# 退避基数（秒）：第 n 次重试前等待 RETRY_BACKOFF * 2**(n-1) * [0.5, 1.5) 秒
+RETRY_BACKOFF = 0.5
+# 每个接口保留的最近成功耗时个数
+LATENCY_WINDOW = 200
+# 确定性错误：上游已正常响应但数据无法解析，重试不会成功，也不代表接口故障，不重试、不计入熔断器
+# （requests 的 JSONDecodeError 同时是 OSError，按网络错误处理）
+DETERMINISTIC_ERRORS = (KeyError, IndexError, ValueError, TypeError, AttributeError)
+
+
+class FetchError(Exception):
+    """所有尝试都失败或超时"""
+
+
+class CircuitOpenError(FetchError):
+    """接口处于熔断状态，请求未发出"""
+
+
+def _limits(name: str) -> dict:
+    """接口的限速和熔断参数：DATA_CONFIG 中的默认值，可由 endpoint_limits[接口名] 覆盖"""
+    limits = {k: DATA_CONFIG[k] for k in ("rate_limit", "rate_burst", "breaker_failures", "breaker_cooldown")}
+    limits.update(DATA_CONFIG.get('endpoint_limits', {}).get(name, {}))
+    return limits
+
+
+class _TokenBucket:
+    """令牌桶：平均 rate 次/秒（0 或 None 不限速），允许 burst 次突发；只在调度循环中使用，无需加锁"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> float:
+        """取得一个令牌，返回等待的秒数"""
+        if not self.rate:
+            return 0.0
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return waited
+            delay = (1 - self.tokens) / self.rate
+            waited += delay
+            await asyncio.sleep(delay)
+
+
+class _CircuitBreaker:
+    """熔断器：closed（正常）→ open（熔断）→ half_open（冷却结束，放行一个探测请求）"""
+
+    def __init__(self, failures: int, cooldown: float):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allow(self) -> tuple:
+        """返回 (是否放行, 是否为占用探测名额的请求)"""
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+        if self.state == "closed":
+            return True, False
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return True, True
+        return False, False
+
+    def release(self, probe: bool):
+        """探测请求结束（或被取消）时释放探测名额；其他请求不影响正在进行的探测"""
+        if probe:
+            self.probing = False
+
+    def record(self, success: bool, probe: bool = False) -> bool:
+        """记录一次请求结果，返回本次是否触发熔断"""
+        self.release(probe)
+        if success:
+            self.state, self.failures = "closed", 0
+            return False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.max_failures:
+            tripped = self.state != "open"
+            self.state, self.opened_at = "open", time.monotonic()
+            return tripped
+        return False
+
+
+class _Endpoint:
+    def __init__(self, name: str):
+        self.name = name
+        self.semaphore = None   # 在调度循环中首次使用时创建
+        limits = _limits(name)
+        self.bucket = _TokenBucket(limits["rate_limit"], limits["rate_burst"])
+        self.breaker = _CircuitBreaker(limits["breaker_failures"], limits["breaker_cooldown"])
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {"calls": 0, "attempts": 0, "successes": 0, "failures": 0, "timeouts": 0, "retries": 0, "deterministic": 0,
+                      "hedge_started": 0, "hedge_wins": 0, "hedge_cancelled": 0, "invalid": 0,
+                      "throttled": 0, "throttle_wait_s": 0.0, "rejected": 0, "breaker_trips": 0}
+
+
+_lock = threading.Lock()
+_loop = None
+_executor = None
+_endpoints = {}
+_hedge_stats = {"requests": 0, "hedged": 0, "primary_wins": 0, "fallback_wins": 0, "all_failed": 0}
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """后台调度线程中的事件循环（首次使用时启动）"""
+    global _loop, _executor
+    with _lock:
+        if _loop is None:
+            _executor = ThreadPoolExecutor(max_workers=FETCH_THREADS, thread_name_prefix="fetch")
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="fetch-loop", daemon=True).start()
+        return _loop
+
+
+def _endpoint(name: str) -> _Endpoint:
+    with _lock:
+        endpoint = _endpoints.get(name)
+        if endpoint is None:
+            endpoint = _endpoints[name] = _Endpoint(name)
+        return endpoint
+
+
+def _bump(endpoint: _Endpoint, name: str):
+    with _lock:
+        endpoint.stats[name] += 1
+
+
+async def _attempt(endpoint: _Endpoint, call, timeout: float, probe: bool = False):
+    """
+    限速后在并发上限内执行一次阻塞调用；成功时计入熔断器（probe：本次占用了半开状态的探测名额），
+    失败由 _fetch 按整次调用计入
+    """
+    waited = await endpoint.bucket.acquire()
+    if waited > 0:
+        with _lock:
+            endpoint.stats["throttled"] += 1
+            endpoint.stats["throttle_wait_s"] = round(endpoint.stats["throttle_wait_s"] + waited, 3)
+    if endpoint.semaphore is None:
+        endpoint.semaphore = asyncio.Semaphore(DATA_CONFIG['endpoint_concurrency'])
+    async with endpoint.semaphore:
+        _bump(endpoint, "attempts")
+        start = time.perf_counter()
+        result = await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(_executor, call), timeout)
+        endpoint.breaker.record(True, probe)
+        with _lock:
+            endpoint.latencies.append(time.perf_counter() - start)
+            endpoint.stats["successes"] += 1
+        return result
+
+
+def _is_deterministic(error: Exception) -> bool:
+    return isinstance(error, DETERMINISTIC_ERRORS) and not isinstance(error, OSError)
+
+
+async def _fetch(name: str, call, timeout: float = None, retries: int = None):
+    """执行一次调用（含重试）；所有尝试都失败时只向熔断器记一次失败"""
+    endpoint = _endpoint(name)
+    timeout = DATA_CONFIG['timeout'] if timeout is None else timeout
+    attempts = max(1, DATA_CONFIG['retry_times'] if retries is None else retries)
+    _bump(endpoint, "calls")
+    error = None
+    probe = False
+    for attempt in range(attempts):
+        if attempt > 0:
+            _bump(endpoint, "retries")
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        allowed, probe = endpoint.breaker.allow()
+        if not allowed:
+            _bump(endpoint, "rejected")
+            raise CircuitOpenError(f"{name} 处于熔断状态，请求未发出")
+        try:
+            return await _attempt(endpoint, call, timeout, probe)
+        except asyncio.CancelledError:
+            # 对冲中被取消的请求不代表接口故障；只有本次占用了探测名额时才释放
+            endpoint.breaker.release(probe)
+            raise
+        except asyncio.TimeoutError:
+            _bump(endpoint, "timeouts")
+            error = f"超时（{timeout}秒）"
+        except Exception as e:
+            _bump(endpoint, "failures")
+            if _is_deterministic(e):
+                _bump(endpoint, "deterministic")
+                endpoint.breaker.release(probe)
+                raise FetchError(f"{name} 请求失败（{type(e).__name__}，不重试）: {e}") from e
+            error = str(e)
+        if probe:
+            # 探测请求失败：立即重新熔断，不再占用探测名额重试
+            break
+    if endpoint.breaker.record(False, probe):
+        _bump(endpoint, "breaker_trips")
+    raise FetchError(f"{name} 请求失败（{attempt + 1}次）: {error}")
+
+
+def _hedge_delay(name: str) -> float:
+    """备用数据源的启动延迟：主数据源最近耗时的 hedge_quantile 分位数，样本不足时取 hedge_delay"""
+    value = latency_quantile(name, DATA_CONFIG['hedge_quantile'], DATA_CONFIG['hedge_min_samples'])
+    return DATA_CONFIG['hedge_delay'] if value is None else value
+
+
+async def _fetch_first(candidates: list, valid, hedge: bool) -> tuple:
+    """
+    按顺序尝试候选数据源：前一个失败或返回无效结果时立即启动下一个；
+    hedge 为 True 时，前一个超过其耗时分位数仍未返回也启动下一个（与前面的请求同时进行）
+    有结果后取消其余请求的任务，调用方不再等待它们；但已在线程中执行的阻塞调用无法中断，
+    会继续运行到上游返回（占用 FETCH_THREADS 中的线程，已取得的令牌不退还），结果被丢弃
+    """
+    with _lock:
+        _hedge_stats["requests"] += 1
+    pending = {}   # task -> 候选序号
+    next_index = 0
+    hedged = False
+    errors = []
+
+    def start_next():
+        nonlocal next_index
+        name, call = candidates[next_index]
+        pending[asyncio.ensure_future(_fetch(name, call))] = next_index
+        next_index += 1
+
+    start_next()
+    try:
+        while pending:
+            timeout = None
+            if hedge and next_index < len(candidates):
+                timeout = _hedge_delay(candidates[next_index - 1][0])
+            done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # 超过分位数耗时仍未返回：对冲，启动下一个候选
+                _bump(_endpoint(candidates[next_index][0]), "hedge_started")
+                if not hedged:
+                    hedged = True
+                    with _lock:
+                        _hedge_stats["hedged"] += 1
+                start_next()
+                continue
+            for task in done:
+                index = pending.pop(task)
+                name = candidates[index][0]
+                if task.exception() is not None:
+                    errors.append(str(task.exception()))
+                elif not valid(task.result()):
+                    _bump(_endpoint(name), "invalid")
+                    errors.append(f"{name} 返回无效数据")
+                else:
+                    with _lock:
+                        _hedge_stats["primary_wins" if index == 0 else "fallback_wins"] += 1
+                    if hedged:
+                        _bump(_endpoint(name), "hedge_wins")
+                    return index, task.result()
+            if not pending and next_index < len(candidates):
+                start_next()
+    finally:
+        for task, index in pending.items():
+            task.cancel()
+            _bump(_endpoint(candidates[index][0]), "hedge_cancelled")
+    with _lock:
+        _hedge_stats["all_failed"] += 1
+    raise FetchError("所有数据源均失败: " + "; ".join(errors))
+
+
+# ===================== 对外接口 =====================
+async def afetch(name: str, call, timeout: float = None, retries: int = None):
+    """
+    异步入口：在调度循环中执行 call()，可在任意事件循环中 await
+    :param name: 接口名（并发限制和统计按接口名区分），如 stock_zh_a_hist
+    :param call: 无参的阻塞函数，如 lambda: ak.stock_zh_a_hist(symbol=code)
+    :param timeout: 单次调用超时（秒），默认 DATA_CONFIG['timeout']
+    :param retries: 最多尝试次数，默认 DATA_CONFIG['retry_times']
+    """
+    future = asyncio.run_coroutine_threadsafe(_fetch(name, call, timeout, retries), _get_loop())
+    return await asyncio.wrap_future(future)
+
+
+def fetch(name: str, call, timeout: float = None, retries: int = None):
+    """同步入口（参数同 afetch），全部尝试失败时抛出 FetchError"""
+    return asyncio.run_coroutine_threadsafe(_fetch(name, call, timeout, retries), _get_loop()).result()
+
+
+def _non_empty(result) -> bool:
+    return result is not None and len(result) > 0
+
+
+async def afetch_first(candidates: list, valid=None, hedge: bool = None) -> tuple:
+    """
+    从多个备用数据源中取第一个有效结果（异步入口）
+    :param candidates: [(接口名, 无参阻塞函数)]，按优先级排列
+    :param valid: 判断结果是否有效的函数，默认非 None 且非空
+    :param hedge: 是否对冲（默认 DATA_CONFIG['hedging']）；False 时严格按顺序逐个尝试
+    :return: (胜出的候选序号, 结果)；全部失败时抛出 FetchError
+    """
+    coro = _fetch_first(candidates, valid or _non_empty, DATA_CONFIG['hedging'] if hedge is None else hedge)
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _get_loop()))
+
+
+def fetch_first(candidates: list, valid=None, hedge: bool = None) -> tuple:
+    """同步入口（参数同 afetch_first）"""
+    coro = _fetch_first(candidates, valid or _non_empty, DATA_CONFIG['hedging'] if hedge is None else hedge)
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def latency_quantile(name: str, q: float, min_samples: int = 1):
+    """接口最近成功调用耗时的分位数（秒），样本数不足 min_samples 时返回 None"""
+    endpoint = _endpoint(name)
+    with _lock:
+        samples = sorted(endpoint.latencies)
+    if not samples or len(samples) < min_samples:
+        return None
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+def split_rate_limit(processes: int):
+    """
+    多进程任务（batch_analysis、precompute_store）工作进程的初始化函数：
+    各进程的令牌桶相互独立，把限速和突发量（含 endpoint_limits 中的覆盖值）除以进程数，
+    使所有进程合计不超过配置的速率；不限速（0 或 None）的接口保持不限速
+    """
+    if processes <= 1:
+        return
+
+    def scaled(limits: dict) -> dict:
+        limits = dict(limits)
+        if limits.get("rate_limit"):
+            limits["rate_limit"] = limits["rate_limit"] / processes
+        if "rate_burst" in limits:
+            limits["rate_burst"] = max(1, limits["rate_burst"] / processes)
+        return limits
+
+    DATA_CONFIG.update(scaled({k: DATA_CONFIG[k] for k in ("rate_limit", "rate_burst")}))
+    DATA_CONFIG['endpoint_limits'] = {name: scaled(v) for name, v in DATA_CONFIG.get('endpoint_limits', {}).items()}
+    with _lock:
+        endpoints = list(_endpoints.values())
+    for endpoint in endpoints:
+        limits = _limits(endpoint.name)
+        endpoint.bucket = _TokenBucket(limits["rate_limit"], limits["rate_burst"])
+
+
+def get_fetch_stats() -> dict:
+    """各接口的调用/尝试/成功/失败/超时/重试/限速/熔断次数、熔断器状态及耗时中位数、P90（毫秒）"""
+    with _lock:
+        names = list(_endpoints)
+    stats = {}
+    for name in names:
+        endpoint = _endpoint(name)
+        with _lock:
+            row = dict(endpoint.stats)
+            row["state"] = endpoint.breaker.state
+        for label, q in (("p50_ms", 0.5), ("p90_ms", 0.9)):
+            value = latency_quantile(name, q)
+            row[label] = round(value * 1000, 1) if value is not None else None
+        stats[name] = row
+    return stats
+
+
+def get_hedge_stats() -> dict:
+    """对冲请求的总次数、触发对冲次数、主/备用数据源胜出次数和全部失败次数"""
+    with _lock:
+        return dict(_hedge_stats)
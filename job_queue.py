@@ -0,0 +1,306 @@
+"""
+分析任务队列（进程池）
+分析在独立的工作进程中执行，Web 界面只负责提交任务和轮询状态，慢请求不再占用界面的脚本线程：
+- submit：提交任务，返回任务 ID；同一 (类型, 代码, 参数) 已有未完成任务时直接返回该任务
+- status：任务状态（queued / running / done / failed / cancelled）、进度和当前阶段
+- result：等待并返回结果
+- cancel：排队中的任务直接取消；运行中的任务无法中断工作进程，标记为已取消并丢弃其结果
+工作进程通过 timing.set_stage_listener 上报分析阶段，进度按各类型的阶段列表估算；
+进程数取 JOB_CONFIG['max_workers']（None 为 CPU 核数）
+"""
+
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from config import JOB_CONFIG
+from single_flight import _freeze
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# 分析类型别名：Web 界面的单选项和英文类型名都可以使用
+KIND_ALIASES = {"股票分析": "stock", "基金分析": "fund", "stock": "stock", "fund": "fund"}
+# 各类型最新分析的阶段顺序（与 advisor_* 中的 timer.span 一致），用于估算进度
+STAGES = {
+    "stock": ["基本信息", "日线获取", "周线重采样", "基准指数", "指标计算", "投资建议"],
+    "fund": ["基本信息", "净值获取", "周线重采样", "基准指数", "阶段判断", "相对强度", "风险评估", "投资建议"],
+}
+_START = "__start__"
+
+_worker_queue = None   # 工作进程中的进度队列
+
+
+# ===================== 工作进程 =====================
+def _init_worker(progress_queue, provider=None):
+    global _worker_queue
+    _worker_queue = progress_queue
+    if provider is not None:
+        from data_provider import set_provider
+        set_provider(provider)
+
+
+def _run_job(job_id: str, kind: str, code: str, kwargs: dict) -> dict:
+    """在工作进程中执行一次分析；分析模块在第一次执行时才导入"""
+    from lazy_imports import timed_import
+    from timing import set_stage_listener
+    _worker_queue.put((job_id, _START))
+    previous = set_stage_listener(lambda stage: _worker_queue.put((job_id, stage)))
+    try:
+        if kind == "stock":
+            return timed_import("advisor_stock").analyze_stock(code, **kwargs)
+        return timed_import("advisor_fund").analyze_fund_enhanced(code, **kwargs)
+    finally:
+        set_stage_listener(previous)
+
+
+# ===================== 任务 =====================
+class Job:
+    def __init__(self, kind: str, code: str, kwargs: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.code = code
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.stage = ""
+        self.progress = 0.0
+        self.error = ""
+        self.submitted_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.submitted = threading.Event()   # future 已创建（并发的同键 submit 可能在此之前拿到任务 ID）
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or datetime.now()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "code": self.code,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "stage": self.stage,
+            "error": self.error,
+            "submitted_at": self.submitted_at.isoformat(timespec="seconds"),
+            "started_at": self.started_at.isoformat(timespec="seconds") if self.started_at else None,
+            "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+            "elapsed_s": round((end - (self.started_at or self.submitted_at)).total_seconds(), 2),
+        }
+
+
+class JobQueue:
+    """
+    :param max_workers: 工作进程数，默认 JOB_CONFIG['max_workers']（None 为 CPU 核数）
+    :param keep_finished: 保留的已结束任务数，超出时丢弃最早的
+    :param provider: 工作进程使用的数据源（需可序列化，如 ReplayProvider），默认按 DATA_CONFIG['provider'] 创建
+    """
+
+    def __init__(self, max_workers: int = None, keep_finished: int = None, provider=None):
+        # spawn 启动的工作进程不继承父进程中的线程（取数调度循环、Web 服务等）
+        self._context = multiprocessing.get_context("spawn")
+        self._progress = self._context.Queue()
+        self.max_workers = max_workers or JOB_CONFIG['max_workers']
+        self.provider = provider
+        self._executor_lock = threading.Lock()
+        self._executor = self._new_executor()
+        self.keep_finished = keep_finished or JOB_CONFIG['keep_finished']
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()   # 任务 ID -> Job
+        self._active = {}            # (类型, 代码, 参数) -> 未结束的任务 ID
+        self._stats = {"submitted": 0, "deduplicated": 0, "done": 0, "failed": 0, "cancelled": 0, "pool_rebuilds": 0}
+        threading.Thread(target=self._listen, name="job-progress", daemon=True).start()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._context,
+                                   initializer=_init_worker, initargs=(self._progress, self.provider))
+
+    def _rebuild(self, broken: ProcessPoolExecutor):
+        """工作进程异常退出（内存不足、崩溃）后进程池不再可用，换一个新的进程池；已换过时不重复"""
+        with self._executor_lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+        with self._lock:
+            self._stats["pool_rebuilds"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit_future(self, job: "Job"):
+        """提交到当前进程池；进程池已损坏时重建后重试一次"""
+        for attempt in range(2):
+            executor = self._executor
+            try:
+                future = executor.submit(_run_job, job.id, job.kind, job.code, job.kwargs)
+            except BrokenProcessPool:
+                self._rebuild(executor)
+                if attempt:
+                    raise
+                continue
+            future.add_done_callback(lambda f: self._finish(job, f, executor))
+            return future
+
+    def _listen(self):
+        """接收工作进程上报的阶段，更新任务进度"""
+        while True:
+            message = self._progress.get()
+            if message is None:
+                return
+            job_id, stage = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.status in FINISHED:
+                    continue
+                if stage == _START:
+                    job.status, job.started_at = RUNNING, datetime.now()
+                    continue
+                job.stage = stage
+                stages = STAGES[job.kind]
+                if stage in stages:
+                    job.progress = max(job.progress, stages.index(stage) / len(stages))
+
+    def _finish(self, job: Job, future, executor: ProcessPoolExecutor = None):
+        if executor is not None and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._rebuild(executor)
+        with self._lock:
+            self._active.pop((job.kind, job.code, _freeze(job.kwargs)), None)
+            if job.status == CANCELLED:
+                return
+            job.finished_at = datetime.now()
+            try:
+                future.result()
+                job.status, job.progress = DONE, 1.0
+            except CancelledError:
+                job.status = CANCELLED
+            except Exception as e:
+                job.status, job.error = FAILED, str(e)
+            self._stats[job.status] += 1
+            self._trim()
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def _get(self, job_id: str) -> Job:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"任务不存在: {job_id}")
+        return job
+
+    # ===================== 对外接口 =====================
+    def submit(self, kind: str, code: str, **kwargs) -> str:
+        """
+        提交分析任务
+        :param kind: stock / fund（或 股票分析 / 基金分析）
+        :param kwargs: 传给 analyze_stock / analyze_fund_enhanced 的其他参数（如 timing、as_of）
+        :return: 任务 ID
+        """
+        if kind not in KIND_ALIASES:
+            raise ValueError(f"未知的分析类型: {kind}")
+        kind = KIND_ALIASES[kind]
+        code = str(code).strip()
+        key = (kind, code, _freeze(kwargs))
+        with self._lock:
+            job_id = self._active.get(key)
+            if job_id is not None:
+                self._stats["deduplicated"] += 1
+                return job_id
+            job = Job(kind, code, kwargs)
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+            self._stats["submitted"] += 1
+        # 在锁外提交（完成回调 _finish 需要同一把锁）；其他线程通过 job.submitted 等待 future 就绪
+        try:
+            job.future = self._submit_future(job)
+        except Exception as e:
+            with self._lock:
+                self._active.pop(key, None)
+                job.status, job.error, job.finished_at = FAILED, str(e), datetime.now()
+                self._stats["failed"] += 1
+            raise
+        finally:
+            job.submitted.set()
+        return job.id
+
+    def status(self, job_id: str) -> dict:
+        job = self._get(job_id)
+        with self._lock:
+            return job.to_dict()
+
+    def result(self, job_id: str, timeout: float = None):
+        """等待任务结束并返回分析结果；失败时抛出原异常，已取消时抛出 CancelledError"""
+        job = self._get(job_id)
+        job.submitted.wait()
+        if job.status == CANCELLED:
+            raise CancelledError(f"任务已取消: {job_id}")
+        if job.future is None:
+            raise RuntimeError(f"任务提交失败: {job.error}")
+        result = job.future.result(timeout)
+        if job.status == CANCELLED:
+            raise CancelledError(f"任务已取消: {job_id}")
+        return result
+
+    def cancel(self, job_id: str) -> bool:
+        """取消任务；返回 False 表示任务已经结束"""
+        job = self._get(job_id)
+        with self._lock:
+            if job.status in FINISHED:
+                return False
+            job.status, job.finished_at = CANCELLED, datetime.now()
+            self._active.pop((job.kind, job.code, _freeze(job.kwargs)), None)
+            self._stats["cancelled"] += 1
+            self._trim()
+        # 还在排队时不再执行；已交给工作进程的任务会继续运行，结果在 _finish 中丢弃
+        job.submitted.wait()
+        if job.future is not None:
+            job.future.cancel()
+        return True
+
+    def wait(self, job_id: str, poll_interval: float = None, on_progress=None) -> dict:
+        """
+        轮询直到任务结束，每次轮询调用 on_progress(状态字典)
+        :return: 最终的状态字典
+        """
+        poll_interval = poll_interval or JOB_CONFIG['poll_interval']
+        while True:
+            status = self.status(job_id)
+            if on_progress is not None:
+                on_progress(status)
+            if status["status"] in FINISHED:
+                return status
+            time.sleep(poll_interval)
+
+    def jobs(self) -> list:
+        """所有保留的任务状态，最新提交的在前"""
+        with self._lock:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queued"] = sum(job.status == QUEUED for job in self._jobs.values())
+            stats["running"] = sum(job.status == RUNNING for job in self._jobs.values())
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        with self._executor_lock:
+            executor = self._executor
+        executor.shutdown(wait=wait, cancel_futures=True)
+        self._progress.put(None)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """进程内共享的任务队列（Streamlit 的所有会话共用同一个进程池）"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,86 @@
+"""
+延迟导入与导入耗时统计
+akshare、pandas 等包导入一次就要数百毫秒到数秒，启动阶段只检查包的元数据（不导入），
+真正用到时再通过 timed_import 导入，并记录每个模块的导入耗时：
+- check_packages：通过 importlib.metadata 查询已安装的版本
+- timed_import：导入模块并记录本进程内的导入耗时（写入日志，import_report 汇总）
+- measure_import_costs：在全新的解释器中用 -X importtime 测量各模块的冷启动导入耗时
+"""
+
+import re
+import subprocess
+import sys
+import threading
+import time
+import importlib
+from importlib import metadata
+from config import BASE_DIR
+from app_logging import get_logger
+
+_logger = get_logger("imports")
+_import_times = {}   # 模块名 -> 本进程内首次导入耗时（秒）
+_lock = threading.Lock()
+
+
+def check_packages(packages: list) -> dict:
+    """
+    只读取包的元数据，不导入包本身
+    :param packages: 发行包名列表（pip 安装时使用的名称）
+    :return: {包名: 版本号，未安装为 None}
+    """
+    versions = {}
+    for name in packages:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def timed_import(name: str):
+    """
+    导入模块并记录耗时；模块已导入时直接返回，不重复记录
+    导入失败时抛出 ImportError，由调用方决定如何处理
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _import_times.setdefault(name, elapsed)
+    _logger.info(f"导入 {name} 耗时 {elapsed * 1000:.1f} ms")
+    return module
+
+
+def import_report() -> list:
+    """本进程内通过 timed_import 导入的模块及耗时，按耗时降序"""
+    with _lock:
+        items = list(_import_times.items())
+    return [{"模块": name, "导入耗时(ms)": round(seconds * 1000, 1)}
+            for name, seconds in sorted(items, key=lambda kv: kv[1], reverse=True)]
+
+
+def measure_import_costs(modules: list, python: str = None) -> list:
+    """
+    在全新的解释器中逐个测量模块的冷启动导入耗时（含其依赖，python -X importtime）
+    :return: [{"模块", "导入耗时(ms)"}]，导入失败的模块耗时为 None 并附带「错误」
+    """
+    python = python or sys.executable
+    report = []
+    for name in modules:
+        proc = subprocess.run([python, "-X", "importtime", "-c", f"import {name}"],
+                              capture_output=True, text=True, cwd=BASE_DIR)
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "导入失败"
+            report.append({"模块": name, "导入耗时(ms)": None, "错误": error})
+            continue
+        # 每行格式为 "import time: self [us] | cumulative | 模块名"，取目标模块的累计耗时
+        cumulative = None
+        for line in proc.stderr.splitlines():
+            m = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)\s*$", line)
+            if m and m.group(2) == name:
+                cumulative = int(m.group(1))
+        report.append({"模块": name, "导入耗时(ms)": round(cumulative / 1000, 1) if cumulative is not None else 0.0})
+    return report
@@ -0,0 +1,115 @@
+"""
+进程级共享的全市场行情快照
+全市场快照（stock_zh_a_spot_em）每个周期（DATA_CONFIG['snapshot_seconds']）最多下载一次，
+按股票代码建立索引，单只股票的查询为 O(1)；批量分析和 Web 界面的所有会话共用同一份快照。
+多个线程同时需要刷新时只有一个线程真正下载，其余线程等待同一份结果；
+下载失败后 SNAPSHOT_RETRY_SECONDS 秒内不再重试，避免上游故障时每只股票都重新下载一次
+"""
+
+import threading
+import time
+import pandas as pd
+from config import DATA_CONFIG
+from data_provider import get_provider
+
+# 下载失败后的重试间隔（秒）
+SNAPSHOT_RETRY_SECONDS = 30
+
+_lock = threading.Lock()
+_snapshot = {"loaded_at": None, "retry_at": 0.0, "index": {}}   # index: 代码 -> 行情字典
+_loading = None   # threading.Event，正在下载快照
+_stats = {"loads": 0, "hits": 0, "waits": 0, "failures": 0}
+
+
+def _build_index(spot: pd.DataFrame) -> dict:
+    """{代码: 行情字典}；代码统一为 6 位字符串"""
+    if spot is None or len(spot) == 0 or "代码" not in spot.columns:
+        return {}
+    spot = spot.assign(代码=spot["代码"].astype(str).str.zfill(6)).drop_duplicates("代码")
+    return spot.set_index("代码", drop=False).to_dict("index")
+
+
+def get_snapshot(max_age_seconds: float = None) -> dict:
+    """
+    获取共享快照索引 {代码: 行情字典}（只读，调用方不要原地修改）
+    :param max_age_seconds: 快照有效期，默认 DATA_CONFIG['snapshot_seconds']
+    下载失败时返回上一份快照（没有时为空字典）
+    """
+    global _loading
+    if max_age_seconds is None:
+        max_age_seconds = DATA_CONFIG['snapshot_seconds']
+    now = time.monotonic()
+    with _lock:
+        loaded_at = _snapshot["loaded_at"]
+        if (loaded_at is not None and now - loaded_at < max_age_seconds) or now < _snapshot["retry_at"]:
+            _stats["hits"] += 1
+            return _snapshot["index"]
+        event = _loading
+        leader = event is None
+        if leader:
+            event = _loading = threading.Event()
+        else:
+            _stats["waits"] += 1
+
+    if not leader:
+        event.wait()
+        with _lock:
+            return _snapshot["index"]
+
+    index = {}
+    try:
+        index = _build_index(get_provider().market_snapshot())
+    except Exception as e:
+        print(f"加载全市场行情快照失败: {str(e)}")
+    finally:
+        with _lock:
+            _stats["loads"] += 1
+            if index:
+                _snapshot["index"] = index
+                _snapshot["loaded_at"] = time.monotonic()
+            else:
+                _stats["failures"] += 1
+                _snapshot["retry_at"] = time.monotonic() + SNAPSHOT_RETRY_SECONDS
+            _loading = None
+            event.set()
+    return _snapshot["index"]
+
+
+def lookup(stock_code: str) -> dict:
+    """单只股票的快照行情，不存在时返回空字典"""
+    return get_snapshot().get(str(stock_code).zfill(6), {})
+
+
+def lookup_many(stock_codes: list) -> dict:
+    """批量查询：{代码: 行情字典}，只包含快照中存在的代码"""
+    index = get_snapshot()
+    codes = (str(c).zfill(6) for c in stock_codes)
+    return {code: index[code] for code in codes if code in index}
+
+
+def snapshot_stock_info(stock_code: str) -> dict:
+    """由快照生成基本信息（股票简称/最新价/涨跌幅），快照中没有该代码时返回空字典"""
+    row = lookup(stock_code)
+    if not row:
+        return {}
+    return {
+        "股票代码": stock_code,
+        "股票简称": str(row.get("名称", "")),
+        "股票名称": str(row.get("名称", "")),
+        "最新价": str(row.get("最新价", "")),
+        "涨跌幅": str(row.get("涨跌幅", "")),
+    }
+
+
+def get_snapshot_stats() -> dict:
+    """返回下载/命中/等待次数及快照中的股票数"""
+    with _lock:
+        stats = dict(_stats)
+        stats["codes"] = len(_snapshot["index"])
+    return stats
+
+
+def reset_snapshot():
+    """清空进程内的快照，下一次查询重新下载"""
+    with _lock:
+        _snapshot.update(loaded_at=None, retry_at=0.0, index={})
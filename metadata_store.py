@@ -0,0 +1,178 @@
+"""
+股票/基金基本信息的本地存储（SQLite）
+名称、基金经理、基金类型等信息很少变化，与行情数据分开缓存，有效期取 DATA_CONFIG['metadata_days']：
+- 完整信息（full）：个股/单只基金信息接口的返回结果，分析时优先读取
+- 列表信息（listing）：由全市场代码列表批量预加载（preload_listings），只含代码、名称（基金另有类型），
+  在信息接口失败时作为兜底，不会覆盖已有的完整信息
+支持批量查询（get_many），多线程、多进程并发读写安全
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+import pandas as pd
+from config import CACHE_DIR, DATA_CONFIG
+from data_provider import get_provider
+
+METADATA_DB = os.path.join(CACHE_DIR, 'metadata.sqlite')
+LEVEL_FULL = "full"
+LEVEL_LISTING = "listing"
+# SQLite 单条语句的参数个数有限，批量查询按此分块
+_BATCH = 500
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'writes': 0, 'preloaded': 0}
+
+
+def _bump(name: str, n: int = 1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def _connect() -> sqlite3.Connection:
+    """每个线程一个连接（sqlite3 连接不能跨线程共享）"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(METADATA_DB, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            " kind TEXT NOT NULL, code TEXT NOT NULL, level TEXT NOT NULL,"
+            " data TEXT NOT NULL, fetched_at TEXT NOT NULL,"
+            " PRIMARY KEY (kind, code))"
+        )
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def _min_fetched_at(max_age_days: Optional[float]) -> str:
+    if max_age_days is None:
+        max_age_days = DATA_CONFIG['metadata_days']
+    return (datetime.now() - timedelta(days=max_age_days)).isoformat(timespec="seconds")
+
+
+# ===================== 查询 =====================
+def get_many(kind: str, codes: list, max_age_days: Optional[float] = None, full: bool = True) -> dict:
+    """
+    批量查询未过期的信息
+    :param kind: stock / fund
+    :param full: True 只返回完整信息；False 时列表信息也算命中
+    :return: {代码: 信息字典}，只包含命中的代码
+    """
+    codes = list(dict.fromkeys(str(c) for c in codes))
+    levels = (LEVEL_FULL,) if full else (LEVEL_FULL, LEVEL_LISTING)
+    min_fetched_at = _min_fetched_at(max_age_days)
+    conn = _connect()
+    found = {}
+    for i in range(0, len(codes), _BATCH):
+        chunk = codes[i:i + _BATCH]
+        rows = conn.execute(
+            f"SELECT code, data FROM metadata WHERE kind = ? AND fetched_at >= ?"
+            f" AND level IN ({','.join('?' * len(levels))}) AND code IN ({','.join('?' * len(chunk))})",
+            (kind, min_fetched_at, *levels, *chunk),
+        ).fetchall()
+        found.update((code, json.loads(data)) for code, data in rows)
+    _bump('hits', len(found))
+    _bump('misses', len(codes) - len(found))
+    return found
+
+
+def get_info(kind: str, code: str, max_age_days: Optional[float] = None, full: bool = True) -> Optional[dict]:
+    """单个代码的信息，未命中或已过期时返回 None"""
+    return get_many(kind, [code], max_age_days, full).get(str(code))
+
+
+# ===================== 写入 =====================
+def put_many(kind: str, infos: dict, level: str = LEVEL_FULL):
+    """
+    批量写入 {代码: 信息字典}
+    列表信息只写入还没有完整信息（或完整信息已过期）的代码
+    """
+    if not infos:
+        return
+    now = datetime.now().isoformat(timespec="seconds")
+    rows = [(kind, str(code), level, json.dumps(info, ensure_ascii=False, default=str), now)
+            for code, info in infos.items()]
+    sql = ("INSERT INTO metadata (kind, code, level, data, fetched_at) VALUES (?, ?, ?, ?, ?)"
+           " ON CONFLICT (kind, code) DO UPDATE SET level = excluded.level, data = excluded.data,"
+           " fetched_at = excluded.fetched_at")
+    params = ()
+    if level == LEVEL_LISTING:
+        sql += " WHERE metadata.level = ? OR metadata.fetched_at < ?"
+        params = (LEVEL_LISTING, _min_fetched_at(None))
+    conn = _connect()
+    with conn:
+        conn.executemany(sql, [row + params for row in rows])
+    _bump('writes', len(rows))
+
+
+def put_info(kind: str, code: str, info: dict, level: str = LEVEL_FULL):
+    put_many(kind, {code: info}, level)
+
+
+# ===================== 批量预加载 =====================
+def _stock_listing(df: pd.DataFrame) -> dict:
+    """stock_info_a_code_name：code / name"""
+    if df is None or len(df) == 0:
+        return {}
+    codes = df["code"].astype(str).str.zfill(6)
+    names = df["name"].astype(str)
+    return {c: {"股票代码": c, "股票简称": n, "股票名称": n} for c, n in zip(codes, names)}
+
+
+def _fund_listing(df: pd.DataFrame) -> dict:
+    """fund_name_em：基金代码 / 基金简称 / 基金类型"""
+    if df is None or len(df) == 0:
+        return {}
+    codes = df["基金代码"].astype(str).str.zfill(6)
+    names = df["基金简称"].astype(str)
+    types = df["基金类型"].astype(str) if "基金类型" in df.columns else [""] * len(df)
+    return {c: {"基金代码": c, "基金名称": n, "基金类型": t} for c, n, t in zip(codes, names, types)}
+
+
+def preload_listings(kinds: tuple = ("stock", "fund")) -> dict:
+    """
+    由全市场代码列表批量写入列表信息（适合在夜间任务或启动时调用）
+    :return: {类型: 写入条数}
+    """
+    provider = get_provider()
+    loaders = {"stock": (provider.stock_list, _stock_listing), "fund": (provider.fund_list, _fund_listing)}
+    counts = {}
+    for kind in kinds:
+        fetch, parse = loaders[kind]
+        try:
+            infos = parse(fetch())
+        except Exception as e:
+            print(f"预加载{kind}代码列表失败: {str(e)}")
+            infos = {}
+        put_many(kind, infos, LEVEL_LISTING)
+        _bump('preloaded', len(infos))
+        counts[kind] = len(infos)
+    return counts
+
+
+# ===================== 统计 =====================
+def get_metadata_stats() -> dict:
+    """命中统计及各类型、各级别的条数"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    rows = _connect().execute("SELECT kind, level, COUNT(*) FROM metadata GROUP BY kind, level").fetchall()
+    stats['rows'] = {f"{kind}/{level}": n for kind, level, n in rows}
+    return stats
+
+
+def clear_metadata():
+    """删除所有信息并重置统计"""
+    conn = _connect()
+    with conn:
+        conn.execute("DELETE FROM metadata")
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
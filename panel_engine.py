@@ -0,0 +1,262 @@
+"""
+横截面指标引擎
+对 (周 × 代码) 的二维收盘价/成交量面板一次性计算阶段、相对强度、突破和量能确认，
+结果与 advisor_stock 中逐只股票的 judge_stage / relative_strength / detect_breakout 一致
+
+面板约定：
+- 行为对齐后的周（W-FRI），列为代码；停牌、未上市的周为 NaN
+- 逐只股票的周线会丢弃缺失的周，因此这里先把每列的有效行「压缩」到底部（右对齐）再做滚动计算，
+  这样每列最后一行就是该代码的最新一周，滚动窗口与单只股票的 DataFrame 完全对应
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from regression_kernels import rolling_linregress
+
+MA_WINDOW = 30        # 30周均线
+SR_WINDOW = 20        # 20周支撑/阻力
+SLOPE_WINDOW = 10     # 均线斜率回看周数
+
+
+# ===================== 面板构建 =====================
+def build_weekly_panel(daily_bars: dict) -> tuple:
+    """
+    把 {代码: 标准化日线} 合并为周线面板
+    :return: (周日期索引, 代码列表, close[T×N], volume[T×N] 或 None)
+    """
+    codes = list(daily_bars.keys())
+    close = pd.concat({c: daily_bars[c]["close"] for c in codes}, axis=1).resample("W-FRI").last()
+    has_volume = all("volume" in daily_bars[c].columns for c in codes)
+    volume = None
+    if has_volume:
+        volume = pd.concat({c: daily_bars[c]["volume"] for c in codes}, axis=1).resample("W-FRI").last()
+        volume = volume.reindex(close.index).to_numpy(dtype=float)
+    return close.index, codes, close.to_numpy(dtype=float), volume
+
+
+def align_index_returns(index_weekly: pd.DataFrame, dates: pd.DatetimeIndex) -> np.ndarray:
+    """把指数周收益（fetch_index_weekly_close 的 ret 列）对齐到面板的周日期，缺失周为 NaN"""
+    if index_weekly is None or len(index_weekly) == 0:
+        return np.full(len(dates), np.nan)
+    return index_weekly["ret"].reindex(dates).to_numpy(dtype=float)
+
+
+# ===================== 压缩 / 还原 =====================
+def _right_align(valid: np.ndarray) -> np.ndarray:
+    """返回行重排索引：每列无效行在上、有效行在下，有效行保持原有先后顺序"""
+    return np.argsort(valid, axis=0, kind="stable")
+
+
+def _compress(a: np.ndarray, order: np.ndarray, valid_count: np.ndarray) -> np.ndarray:
+    out = np.take_along_axis(a, order, axis=0).astype(float)
+    out[np.arange(a.shape[0])[:, None] < a.shape[0] - valid_count] = np.nan
+    return out
+
+
+def _expand(a: np.ndarray, order: np.ndarray, fill=np.nan) -> np.ndarray:
+    """把压缩后的数组还原到原始的周日期行"""
+    out = np.full(a.shape, fill, dtype=a.dtype)
+    np.put_along_axis(out, order, a, axis=0)
+    return out
+
+
+# ===================== 滚动计算 =====================
+def _pad_top(a: np.ndarray, n: int) -> np.ndarray:
+    pad = np.full((n,) + a.shape[1:], np.nan)
+    return np.concatenate([pad, a], axis=0)
+
+
+def rolling_mean(a: np.ndarray, window: int) -> np.ndarray:
+    """逐列滚动均值，窗口内含 NaN 时为 NaN；直接使用 pandas 的滚动算法，结果与单只股票的 rolling().mean() 逐位一致"""
+    return pd.DataFrame(a).rolling(window).mean().to_numpy()
+
+
+def window_mean(a: np.ndarray, window: int) -> np.ndarray:
+    """每个位置最近 window 个值的算术平均（对应单只股票对切片调用 .mean()），数据不足或含 NaN 为 NaN"""
+    if a.shape[0] < window:
+        return np.full(a.shape, np.nan)
+    return _pad_top(sliding_window_view(a, window, axis=0).mean(axis=-1), window - 1)
+
+
+def rolling_min(a: np.ndarray, window: int) -> np.ndarray:
+    if a.shape[0] < window:
+        return np.full(a.shape, np.nan)
+    return _pad_top(sliding_window_view(a, window, axis=0).min(axis=-1), window - 1)
+
+
+def rolling_max(a: np.ndarray, window: int) -> np.ndarray:
+    if a.shape[0] < window:
+        return np.full(a.shape, np.nan)
+    return _pad_top(sliding_window_view(a, window, axis=0).max(axis=-1), window - 1)
+
+
+def _shift_down(a: np.ndarray, n: int = 1) -> np.ndarray:
+    return _pad_top(a[:-n], n)
+
+
+# ===================== 指标 =====================
+def _stage(close, ma30, slope):
+    """与 judge_stage 相同的分类规则"""
+    ma_ok = np.isfinite(ma30) & (ma30 != 0)
+    diff = np.where(ma_ok, close / np.where(ma_ok, ma30, 1.0) - 1, 0.0)
+    stage = np.ones(close.shape, dtype=np.int8)
+    stage = np.where((close > ma30) & (slope <= 0), 3, stage)
+    stage = np.where((close > ma30) & (slope > 0), 2, stage)
+    stage = np.where((close < ma30) & (slope < 0) & (diff < -0.03), 4, stage)
+    return stage.astype(np.int8)
+
+
+def _trailing_mean_over_mask(values: np.ndarray, mask: np.ndarray, lookback: int) -> tuple:
+    """
+    对每一行，取截至该行（含）mask 为真的最近 lookback 个值求均值
+    :return: (均值[T×N]，截至该行的有效个数[T×N])
+    """
+    T = values.shape[0]
+    order = _right_align(mask)
+    n = mask.sum(axis=0)
+    packed = _compress(values, order, n)
+    means = window_mean(packed, lookback)
+    count = np.cumsum(mask, axis=0)
+    # 截至第 r 行的第 count 个有效值位于压缩数组的 T - n + count - 1 行
+    pos = np.clip(T - n[None, :] + count - 1, 0, T - 1)
+    return np.take_along_axis(means, pos, axis=0), count
+
+
+def prepare_panel(close: np.ndarray, volume: np.ndarray = None, index_ret: np.ndarray = None) -> dict:
+    """
+    计算与信号参数无关的部分（压缩、均线、支撑/阻力、阶段），参数扫描时每个面板只需计算一次
+    :param close: 周收盘价 [T×N]
+    :param volume: 周成交量 [T×N]，None 表示无量能数据（量能确认恒为 True，与 analyze_stock 一致）
+    :param index_ret: 同一周日期上的指数周收益 [T]（见 align_index_returns），None 表示无基准（相对强度恒为 0）
+    :return: 字典，数组均为压缩坐标 [T×N]；order 用于还原到原始周日期，weekly_len 为截至每行的周线长度
+    """
+    close = np.asarray(close, dtype=float)
+    T, N = close.shape
+    valid = np.isfinite(close)
+    if volume is not None:
+        volume = np.asarray(volume, dtype=float)
+        valid &= np.isfinite(volume)
+    order = _right_align(valid)
+    n = valid.sum(axis=0)
+    c = _compress(close, order, n)
+    v = _compress(volume, order, n) if volume is not None else None
+
+    ma30 = rolling_mean(c, MA_WINDOW)
+    support = rolling_min(c, SR_WINDOW)
+    resistance = rolling_max(c, SR_WINDOW)
+    ret = np.full_like(c, np.nan)
+    ret[1:] = c[1:] / c[:-1] - 1
+
+    # 周线行：dropna 之后仍保留的行；weekly_len 为截至该行的周线长度
+    in_weekly = np.isfinite(ma30)
+    weekly_len = np.cumsum(in_weekly, axis=0)
+
+    # 阶段：斜率取周线内最近 SLOPE_WINDOW 个 ma30，不足时斜率为 0
+    slope = rolling_linregress(ma30, SLOPE_WINDOW)[0]
+    slope = np.where(weekly_len >= SLOPE_WINDOW, slope, 0.0)
+    stage = np.where(in_weekly, _stage(c, ma30, slope), 0).astype(np.int8)
+
+    # 指数周收益放到每列的压缩坐标下
+    idx_ret_c = None
+    if index_ret is not None and np.isfinite(index_ret).any():
+        index_ret = np.asarray(index_ret, dtype=float)
+        idx_ret_c = np.where(np.arange(T)[:, None] >= T - n, index_ret[order], np.nan)
+
+    return {
+        "order": order,
+        "weekly_len": weekly_len,
+        "in_weekly": in_weekly,
+        "close": c,
+        "volume": v,
+        "index_ret": idx_ret_c,
+        "ma30": ma30,
+        "ret": ret,
+        "support": support,
+        "resistance": resistance,
+        "slope": slope,
+        "stage": stage,
+    }
+
+
+def signal_panel(base: dict, rs_lookback: int = 12, breakout_lookback: int = 12, breakout_threshold: float = 0.01,
+                 volume_multiplier: float = 1.5) -> dict:
+    """在 prepare_panel 的结果上计算依赖参数的信号，返回 base 的副本并加入 rs / breakout / volume_ok"""
+    c, v, ret = base["close"], base["volume"], base["ret"]
+    in_weekly, weekly_len = base["in_weekly"], base["weekly_len"]
+
+    # 相对强度：周线与指数周收益按日期内连接后，最近 rs_lookback 周的均值差
+    if base["index_ret"] is not None:
+        idx_ret_c = base["index_ret"]
+        joined = in_weekly & np.isfinite(idx_ret_c)
+        s_mean, joined_len = _trailing_mean_over_mask(ret, joined, rs_lookback)
+        i_mean, _ = _trailing_mean_over_mask(idx_ret_c, joined, rs_lookback)
+        rs = np.where(joined_len >= rs_lookback, s_mean - i_mean, 0.0)
+    else:
+        rs = np.zeros_like(c)
+    rs = np.where(in_weekly, rs, np.nan)
+
+    # 突破：最新收盘 > 前 breakout_lookback 周最高收盘 × (1 + 阈值)
+    prior_high = _shift_down(rolling_max(c, breakout_lookback))
+    breakout = in_weekly & (weekly_len >= breakout_lookback + 1) & (c > prior_high * (1 + breakout_threshold))
+
+    # 量能确认：仅在突破时检查，最新成交量 > 前 breakout_lookback 周均量 × 倍数
+    if v is not None:
+        prior_vol = _shift_down(window_mean(v, breakout_lookback))
+        volume_ok = ~breakout | (v > prior_vol * volume_multiplier)
+    else:
+        volume_ok = np.ones(c.shape, dtype=bool)
+
+    out = dict(base)
+    out.update({"rs": rs, "breakout": breakout, "volume_ok": volume_ok & in_weekly})
+    return out
+
+
+def compute_panel(close: np.ndarray, volume: np.ndarray = None, index_ret: np.ndarray = None,
+                  rs_lookback: int = 12, breakout_lookback: int = 12, breakout_threshold: float = 0.01,
+                  volume_multiplier: float = 1.5) -> dict:
+    """
+    在压缩（右对齐）坐标下计算全部指标（prepare_panel + signal_panel）
+    :return: 字典，数组均为压缩坐标 [T×N]；order 用于还原到原始周日期，weekly_len 为截至每行的周线长度
+    """
+    return signal_panel(prepare_panel(close, volume, index_ret), rs_lookback, breakout_lookback,
+                        breakout_threshold, volume_multiplier)
+
+
+def latest_indicators(panel: dict) -> dict:
+    """取每个代码最新一周（压缩坐标的最后一行）的指标；valid 为 False 表示周线为空"""
+    keys = ("close", "ma30", "support", "resistance", "stage", "rs", "breakout", "volume_ok")
+    out = {k: panel[k][-1] for k in keys}
+    out["valid"] = panel["weekly_len"][-1] > 0
+    return out
+
+
+def history_indicators(panel: dict) -> dict:
+    """把压缩坐标的指标还原到原始周日期 [T×N]；不在周线内的行为 NaN / 0 / False"""
+    order = panel["order"]
+    out = {}
+    for k in ("close", "ma30", "ret", "support", "resistance", "slope", "rs"):
+        out[k] = _expand(panel[k], order)
+    out["stage"] = _expand(panel["stage"], order, fill=0)
+    out["breakout"] = _expand(panel["breakout"], order, fill=False)
+    out["volume_ok"] = _expand(panel["volume_ok"], order, fill=False)
+    out["valid"] = _expand(np.isfinite(panel["ma30"]), order, fill=False)
+    return out
+
+
+def screen_panel(codes: list, close: np.ndarray, volume: np.ndarray = None,
+                 index_ret: np.ndarray = None, **params) -> pd.DataFrame:
+    """全市场筛选：返回每个代码最新一周的指标表（周线为空的代码不在结果中）"""
+    latest = latest_indicators(compute_panel(close, volume, index_ret, **params))
+    df = pd.DataFrame({
+        "代码": codes,
+        "最新收盘": latest["close"],
+        "30周均值": latest["ma30"],
+        "阶段": latest["stage"],
+        "相对强度": latest["rs"],
+        "是否突破": latest["breakout"],
+        "量能是否放大": latest["volume_ok"],
+        "支撑位": latest["support"],
+        "阻力位": latest["resistance"],
+    })
+    return df[latest["valid"]].reset_index(drop=True)
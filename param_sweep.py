@@ -0,0 +1,139 @@
+"""
+股票信号参数扫描
+每只股票的数据只获取一次，与参数无关的指标（均线、阶段、支撑/阻力）只计算一次，
+再在进程池中对参数网格的每个组合计算相对强度/突破/量能 → 建议 → 回测，汇总每个组合的表现
+"""
+
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from config import DATA_CONFIG
+from advisor_stock import (fetch_stock_daily, fetch_index_weekly_close, generate_advice_vectorized,
+                           stop_loss_price, stock_params)
+from panel_engine import build_weekly_panel, align_index_returns, prepare_panel, signal_panel, history_indicators
+from backtest import stock_positions, run_backtest, WEEKS_PER_YEAR, DEFAULT_FEE_RATE
+
+_worker_base = None   # 进程池中每个工作进程持有的一份预计算面板
+
+
+# ===================== 预计算 =====================
+def prepare_sweep(daily_bars: dict, index_weekly: pd.DataFrame) -> dict:
+    """
+    由 {代码: 标准化日线} 构建周线面板并完成与参数无关的计算（不做网络请求）
+    :return: prepare_panel 的结果，附加 dates / codes
+    """
+    daily_bars = {c: d for c, d in daily_bars.items() if d is not None and len(d) > 0}
+    if not daily_bars:
+        raise ValueError("没有可用的日线数据")
+    dates, codes, close, volume = build_weekly_panel(daily_bars)
+    base = prepare_panel(close, volume, align_index_returns(index_weekly, dates))
+    base["dates"] = dates
+    base["codes"] = codes
+    return base
+
+
+def load_sweep_inputs(stock_codes: list, max_workers: int = None) -> dict:
+    """并发获取日线（走本地缓存）和基准指数，返回 prepare_sweep 的结果"""
+    codes = list(dict.fromkeys(str(c).strip() for c in stock_codes if str(c).strip()))
+    if max_workers is None:
+        max_workers = DATA_CONFIG['max_workers']
+
+    def load(code):
+        try:
+            return fetch_stock_daily(code)
+        except Exception as e:
+            print(f"获取{code}日线失败: {str(e)}")
+            return pd.DataFrame()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        daily_bars = dict(zip(codes, executor.map(load, codes)))
+    return prepare_sweep(daily_bars, fetch_index_weekly_close("sh000300", years=5))
+
+
+def parameter_grid(grid: dict) -> list:
+    """
+    展开参数网格：{参数名: 取值列表} → 每个组合一个完整参数字典（未给出的参数取 ANALYSIS_CONFIG 默认值）
+    """
+    keys = list(grid.keys())
+    return [stock_params(dict(zip(keys, values))) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+# ===================== 单个组合 =====================
+def evaluate_params(base: dict, params: dict, fee_rate: float = DEFAULT_FEE_RATE, use_stop: bool = True) -> dict:
+    """在预计算面板上评估一个参数组合：生成逐周建议并做等权组合回测"""
+    p = stock_params(params)
+    panel = signal_panel(base, p["rs_lookback"], p["breakout_lookback"], p["breakout_threshold"], p["volume_multiplier"])
+    hist = history_indicators(panel)
+    valid = hist["valid"]
+    actions, _ = generate_advice_vectorized(hist["stage"], hist["rs"], hist["breakout"], hist["volume_ok"],
+                                            p["rs_threshold"])
+    actions = np.where(valid, actions, "")
+    stop = np.where(valid, stop_loss_price(hist["support"]), np.nan)
+    close = np.where(valid, hist["close"], np.nan)
+    ret = np.where(valid, hist["ret"], np.nan)
+
+    # 只保留至少有一只股票有信号的周
+    rows = valid.any(axis=1)
+    weights = stock_positions(actions[rows], close[rows], stop[rows], use_stop)
+    result = run_backtest(weights, ret[rows], fee_rate)
+
+    weeks = int(rows.sum())
+    portfolio_ret = result["strategy_ret"].mean(axis=1)
+    equity = np.cumprod(1 + portfolio_ret)
+    annual_vol = portfolio_ret.std(ddof=1) * np.sqrt(WEEKS_PER_YEAR) if weeks > 1 else 0.0
+    annual_ret = equity[-1] ** (WEEKS_PER_YEAR / weeks) - 1 if weeks else 0.0
+    code_ret = np.cumprod(1 + result["strategy_ret"], axis=0)[-1] - 1 if weeks else np.zeros(0)
+    return {
+        **p,
+        "组合累计收益(%)": round(float((equity[-1] - 1) * 100), 2) if weeks else 0.0,
+        "组合年化收益(%)": round(float(annual_ret * 100), 2),
+        "组合年化波动(%)": round(float(annual_vol * 100), 2),
+        "组合夏普": round(float(annual_ret / annual_vol), 3) if annual_vol > 0 else 0.0,
+        "组合最大回撤(%)": round(float((equity / np.maximum.accumulate(equity) - 1).min() * 100), 2) if weeks else 0.0,
+        "年均换手": round(float(result["turnover"].mean(axis=1).sum() * WEEKS_PER_YEAR / weeks), 2) if weeks else 0.0,
+        "买入信号数": int((actions == "买入").sum()),
+        "盈利股票占比(%)": round(float((code_ret > 0).mean() * 100), 1) if len(code_ret) else 0.0,
+    }
+
+
+def _init_worker(base: dict):
+    global _worker_base
+    _worker_base = base
+
+
+def _evaluate_in_worker(args: tuple) -> dict:
+    params, fee_rate, use_stop = args
+    return evaluate_params(_worker_base, params, fee_rate, use_stop)
+
+
+# ===================== 对外接口 =====================
+def sweep_panel(base: dict, grid: dict, fee_rate: float = DEFAULT_FEE_RATE, use_stop: bool = True,
+                max_workers: int = None) -> pd.DataFrame:
+    """
+    在预计算面板上扫描参数网格，每个工作进程只接收一次面板数据
+    :param grid: {参数名: 取值列表}，参数名见 advisor_stock.stock_params
+    :param max_workers: 进程数，1 表示在当前进程内顺序执行，None 为 CPU 核数
+    :return: 每个组合一行，按组合夏普降序
+    """
+    combos = parameter_grid(grid)
+    tasks = [(p, fee_rate, use_stop) for p in combos]
+    if max_workers == 1 or len(combos) == 1:
+        rows = [evaluate_params(base, *task) for task in tasks]
+    else:
+        # spawn 启动的工作进程不继承父进程中的线程（取数调度循环、线程池），避免 fork 后继承已持有的锁
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(base,)) as executor:
+            rows = list(executor.map(_evaluate_in_worker, tasks))
+    return pd.DataFrame(rows).sort_values("组合夏普", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def run_sweep(stock_codes: list, grid: dict, fee_rate: float = DEFAULT_FEE_RATE, use_stop: bool = True,
+              max_workers: int = None) -> pd.DataFrame:
+    """
+    参数扫描入口：获取数据 → 预计算 → 进程池评估每个组合
+    示例：run_sweep(codes, {"rs_threshold": [0, 0.005, 0.01], "volume_multiplier": [1.2, 1.5, 2.0]})
+    """
+    return sweep_panel(load_sweep_inputs(stock_codes), grid, fee_rate, use_stop, max_workers)
@@ -0,0 +1,290 @@
+"""
+分析热点路径的基准测试
+使用 synthetic_data 生成可复现的合成行情，在 1 ~ 5000 个代码的规模上测量各环节的耗时和峰值内存，
+结果保存为 JSON，可与历史结果对比发现性能回退
+
+用法：
+    python perf_benchmark.py                                  # 默认规模 1,10,100,1000,5000
+    python perf_benchmark.py --scales 1,100 --repeat 5
+    python perf_benchmark.py --baseline logs/benchmarks/bench_20240101_000000.json   # 对比，回退时退出码为 1
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from config import LOG_DIR
+import data_provider
+from synthetic_data import generate_universe, generate_fund_universe, generate_index_bars, write_replay_universe
+from advisor_stock import build_stock_weekly, analyze_stock, analyze_stocks
+from advisor_fund import (build_fund_weekly, judge_stage_enhanced, relative_strength_enhanced, risk_assessment,
+                          analyze_fund_enhanced)
+from panel_engine import build_weekly_panel, align_index_returns, screen_panel
+
+BENCHMARK_DIR = os.path.join(LOG_DIR, 'benchmarks')
+DEFAULT_SCALES = [1, 10, 100, 1000, 5000]
+DEFAULT_DAYS = 1250           # 约5年交易日
+DEFAULT_MAX_FULL_SCALE = 1000 # analyze_* 完整调用默认只测到 1000 个代码（全市场用 --max-full-scale 5000）
+REGRESSION_TOLERANCE = 0.25   # 耗时超过基线 25% 视为回退
+MIN_REGRESSION_SECONDS = 0.005  # 且绝对增幅超过 5ms，避免小规模用例的计时抖动误报
+
+
+# ===================== 测试数据 =====================
+def _index_weekly(index_daily: pd.DataFrame) -> pd.DataFrame:
+    """与 benchmark_store.get_index_weekly(with_log_ret=True) 相同的周线处理"""
+    weekly = index_daily[["close"]].resample("W-FRI").last().dropna()
+    weekly["ret"] = weekly["close"].pct_change()
+    weekly["log_ret"] = np.log(weekly["close"] / weekly["close"].shift(1))
+    return weekly.dropna()
+
+
+class BenchData:
+    """按最大规模一次性生成的测试数据，小规模取前 n 个代码"""
+
+    def __init__(self, max_scale: int, n_days: int, seed: int, replay_root: str, full_scale: int):
+        self.stock_daily = generate_universe(max_scale, n_days, seed)
+        self.fund_daily = generate_fund_universe(max_scale, n_days, seed)
+        self.index_weekly = _index_weekly(generate_index_bars(n_days, seed))
+        self._fund_weekly = None
+        self.codes = list(self.stock_daily)
+        self.funds = list(self.fund_daily)
+        if full_scale > 0:
+            # 完整分析调用经由回放数据源读取，只需写入其用到的规模
+            write_replay_universe(replay_root, full_scale, full_scale, n_days, seed,
+                                  stocks=self.stock_daily, funds=self.fund_daily)
+
+    @property
+    def fund_weekly(self) -> dict:
+        """基金周线只在运行基金用例时生成（全市场规模下耗时较长）"""
+        if self._fund_weekly is None:
+            self._fund_weekly = {c: build_fund_weekly(d) for c, d in self.fund_daily.items()}
+        return self._fund_weekly
+
+    def stocks(self, n: int) -> list:
+        return self.codes[:n]
+
+    def fund_list(self, n: int) -> list:
+        return self.funds[:n]
+
+
+# ===================== 测试用例 =====================
+def case_stock_weekly(data: BenchData, n: int):
+    for code in data.stocks(n):
+        build_stock_weekly(data.stock_daily[code])
+
+
+def case_judge_stage_enhanced(data: BenchData, n: int):
+    for code in data.fund_list(n):
+        judge_stage_enhanced(data.fund_weekly[code])
+
+
+def case_relative_strength_enhanced(data: BenchData, n: int):
+    for code in data.fund_list(n):
+        relative_strength_enhanced(data.fund_weekly[code], data.index_weekly)
+
+
+def case_risk_assessment(data: BenchData, n: int):
+    for code in data.fund_list(n):
+        risk_assessment(data.fund_weekly[code])
+
+
+def case_screen_panel(data: BenchData, n: int):
+    daily = {c: data.stock_daily[c] for c in data.stocks(n)}
+    dates, codes, close, volume = build_weekly_panel(daily)
+    screen_panel(codes, close, volume, align_index_returns(data.index_weekly, dates))
+
+
+def case_analyze_stock(data: BenchData, n: int):
+    for code in data.stocks(n):
+        analyze_stock(code)
+
+
+def case_analyze_stocks(data: BenchData, n: int):
+    analyze_stocks(data.stocks(n))
+
+
+def case_analyze_fund_enhanced(data: BenchData, n: int):
+    for code in data.fund_list(n):
+        analyze_fund_enhanced(code)
+
+
+# (名称, 函数, 是否为完整分析调用：经由回放数据源，包含数据读取)
+CASES = [
+    ("stock_weekly", case_stock_weekly, False),
+    ("judge_stage_enhanced", case_judge_stage_enhanced, False),
+    ("relative_strength_enhanced", case_relative_strength_enhanced, False),
+    ("risk_assessment", case_risk_assessment, False),
+    ("screen_panel", case_screen_panel, False),
+    ("analyze_stock", case_analyze_stock, True),
+    ("analyze_stocks", case_analyze_stocks, True),
+    ("analyze_fund_enhanced", case_analyze_fund_enhanced, True),
+]
+
+
+# ===================== 测量 =====================
+def measure(func, data: BenchData, n: int, repeat: int) -> dict:
+    """耗时取 repeat 次的最小值和中位数；峰值内存（tracemalloc）单独运行一次测量，避免影响计时"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data, n)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func(data, n)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": round(min(times), 6),
+        "median_seconds": round(float(np.median(times)), 6),
+        "per_code_ms": round(min(times) / n * 1000, 4),
+        "peak_mb": round(peak / 1024 / 1024, 3),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip()
+    except Exception:
+        return ""
+
+
+def run_benchmarks(scales: list = None, repeat: int = 3, n_days: int = DEFAULT_DAYS, seed: int = 0,
+                   cases: list = None, max_full_scale: int = DEFAULT_MAX_FULL_SCALE, verbose: bool = True) -> dict:
+    """
+    运行基准测试
+    :param scales: 代码数量列表
+    :param repeat: 每个用例重复次数（大规模时自动降为 1）
+    :param cases: 只运行指定名称的用例，None 为全部
+    :param max_full_scale: 完整分析调用（analyze_*）的最大规模，None 表示不限制
+    :return: {"meta": 运行环境, "results": [每个 用例×规模 一条记录]}
+    """
+    scales = sorted(scales or DEFAULT_SCALES)
+    selected = [c for c in CASES if cases is None or c[0] in cases]
+    with_full = any(full for _, _, full in selected)
+    full_scales = [n for n in scales if max_full_scale is None or n <= max_full_scale]
+    full_scale = full_scales[-1] if with_full and full_scales else 0
+    replay_root = tempfile.mkdtemp(prefix="bench_replay_")
+    previous = None
+    results = []
+    try:
+        start = time.perf_counter()
+        data = BenchData(scales[-1], n_days, seed, replay_root, full_scale)
+        if any(c[1] in (case_judge_stage_enhanced, case_relative_strength_enhanced, case_risk_assessment)
+               for c in selected):
+            data.fund_weekly  # 在计时之前生成基金周线
+        if verbose:
+            print(f"生成测试数据: {scales[-1]} 个代码 × {n_days} 个交易日，耗时 {time.perf_counter() - start:.1f}s")
+        if with_full:
+            previous = data_provider.set_provider(data_provider.ReplayProvider(replay_root))
+        for name, func, full in selected:
+            for n in scales:
+                if full and n > full_scale:
+                    continue
+                record = {"name": name, "scale": n, **measure(func, data, n, repeat if n <= 100 else 1)}
+                results.append(record)
+                if verbose:
+                    print(f"{name:<28}{n:>6} 个代码  {record['seconds']:>10.4f}s  "
+                          f"{record['per_code_ms']:>9.3f} ms/个  峰值 {record['peak_mb']:>9.2f} MB")
+    finally:
+        if with_full:
+            data_provider.set_provider(previous)
+        shutil.rmtree(replay_root, ignore_errors=True)
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "n_days": n_days,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def save_results(report: dict, path: str = None) -> str:
+    """保存为 JSON，默认 logs/benchmarks/bench_<时间>.json"""
+    if path is None:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        path = os.path.join(BENCHMARK_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare_results(baseline: dict, current: dict, tolerance: float = REGRESSION_TOLERANCE) -> pd.DataFrame:
+    """
+    按 (用例, 规模) 对比两次结果
+    :return: 对比表，「回退」列为 True 表示耗时超过基线的 (1 + tolerance) 倍且绝对增幅超过 MIN_REGRESSION_SECONDS
+    """
+    key = lambda r: (r["name"], r["scale"])
+    base = {key(r): r for r in baseline.get("results", [])}
+    rows = []
+    for r in current.get("results", []):
+        b = base.get(key(r))
+        if b is None:
+            continue
+        ratio = r["seconds"] / b["seconds"] if b["seconds"] > 0 else np.nan
+        rows.append({
+            "用例": r["name"],
+            "规模": r["scale"],
+            "基线耗时(s)": b["seconds"],
+            "本次耗时(s)": r["seconds"],
+            "耗时比": round(ratio, 3),
+            "基线峰值(MB)": b["peak_mb"],
+            "本次峰值(MB)": r["peak_mb"],
+            "回退": bool(ratio > 1 + tolerance and r["seconds"] - b["seconds"] > MIN_REGRESSION_SECONDS),
+        })
+    return pd.DataFrame(rows)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="分析热点路径基准测试")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)), help="代码数量，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的重复次数（规模>100时只运行1次）")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="每个代码的交易日数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--cases", default=None, help="只运行指定用例，逗号分隔")
+    parser.add_argument("--max-full-scale", type=int, default=DEFAULT_MAX_FULL_SCALE,
+                        help="analyze_* 完整调用的最大规模")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径")
+    parser.add_argument("--baseline", default=None, help="对比的基线 JSON")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="允许的耗时增幅")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        [int(s) for s in args.scales.split(",") if s.strip()], args.repeat, args.days, args.seed,
+        [c.strip() for c in args.cases.split(",")] if args.cases else None, args.max_full_scale,
+    )
+    print(f"结果已保存: {save_results(report, args.output)}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            diff = compare_results(json.load(f), report, args.tolerance)
+        if len(diff) > 0:
+            print(diff.to_string(index=False))
+        if len(diff) > 0 and diff["回退"].any():
+            print(f"⚠️ 发现 {int(diff['回退'].sum())} 项性能回退")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+预计算结果库（SQLite）
+收盘后（基金在净值公布后）到下一个交易日之前，同一代码的分析结果不会变化。
+夜间任务（run_app.py precompute）对配置的代码清单运行完整分析，按 (类型, 代码, 交易日, 参数版本) 写入本库；
+结果缓存（result_cache）未命中时先查本库，Web 界面、JSON 接口和批量命令行都能以毫秒级直接读取。
+参数版本由 ANALYSIS_CONFIG 中对应类型的参数和 ANALYSIS_VERSION 计算，参数或算法变化后旧结果自动失效
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Optional
+from config import CACHE_DIR, BASE_DIR, ANALYSIS_CONFIG, DATA_CONFIG, PRECOMPUTE_CONFIG
+from trading_calendar import current_session, FUND_NAV_TIME
+
+PRECOMPUTE_DB = os.path.join(CACHE_DIR, 'precomputed.sqlite')
+# 分析逻辑版本：修改 advisor_* 的算法或结果结构时递增，使旧的预计算结果失效
+ANALYSIS_VERSION = 1
+# 结果缓存等处使用的类型名 -> 本库的类型
+KINDS = {"股票分析": "stock", "基金分析": "fund", "stock": "stock", "fund": "fund"}
+_BATCH = 500
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'writes': 0}
+
+
+def _bump(name: str, n: int = 1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def _connect() -> sqlite3.Connection:
+    """每个线程一个连接；夜间任务的多个进程同时写入时由 WAL 和忙等待超时保证安全"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(PRECOMPUTE_DB, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " kind TEXT NOT NULL, code TEXT NOT NULL, session TEXT NOT NULL, version TEXT NOT NULL,"
+            " data TEXT NOT NULL, computed_at TEXT NOT NULL,"
+            " PRIMARY KEY (kind, code, session, version))"
+        )
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def param_version(kind: str) -> str:
+    """分析参数（ANALYSIS_CONFIG[类型]）和 ANALYSIS_VERSION 的摘要"""
+    kind = KINDS[kind]
+    payload = json.dumps({"version": ANALYSIS_VERSION, "params": ANALYSIS_CONFIG[kind]}, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def session_for(kind: str) -> str:
+    """结果所属的交易日：股票以收盘、基金以净值公布时间为界（与 result_cache.default_session 一致）"""
+    return current_session(publish_time=FUND_NAV_TIME if KINDS[kind] == "fund" else None)
+
+
+def _encode(result: dict) -> str:
+    # numpy 标量转为 Python 类型；NaN 按原样保存（json 模块可以往返）
+    return json.dumps(result, ensure_ascii=False, default=lambda v: v.item() if hasattr(v, "item") else str(v))
+
+
+# ===================== 查询 =====================
+def get_many(kind: str, codes: list, session: str = None, version: str = None) -> dict:
+    """
+    批量查询预计算结果
+    :param session: 交易日，默认当前交易日（session_for）
+    :param version: 参数版本，默认当前参数（param_version）
+    :return: {代码: 结果}，只包含命中的代码
+    """
+    if kind not in KINDS:
+        return {}
+    session = session or session_for(kind)
+    version = version or param_version(kind)
+    codes = list(dict.fromkeys(str(c) for c in codes))
+    conn = _connect()
+    found = {}
+    for i in range(0, len(codes), _BATCH):
+        chunk = codes[i:i + _BATCH]
+        rows = conn.execute(
+            f"SELECT code, data FROM results WHERE kind = ? AND session = ? AND version = ?"
+            f" AND code IN ({','.join('?' * len(chunk))})",
+            (KINDS[kind], session, version, *chunk),
+        ).fetchall()
+        found.update((code, json.loads(data)) for code, data in rows)
+    _bump('hits', len(found))
+    _bump('misses', len(codes) - len(found))
+    return found
+
+
+def get_result(kind: str, code: str, session: str = None, version: str = None) -> Optional[dict]:
+    """单个代码的预计算结果，没有时返回 None（可直接作为 ResultCache 的 store_func）"""
+    return get_many(kind, [code], session, version).get(str(code))
+
+
+def stored_codes(kind: str, session: str = None, version: str = None) -> set:
+    """当前交易日、当前参数版本已有结果的代码（夜间任务重跑时跳过）"""
+    session = session or session_for(kind)
+    version = version or param_version(kind)
+    rows = _connect().execute("SELECT code FROM results WHERE kind = ? AND session = ? AND version = ?",
+                              (KINDS[kind], session, version)).fetchall()
+    return {code for (code,) in rows}
+
+
+# ===================== 写入 =====================
+def put_many(kind: str, results: dict, session: str = None, version: str = None):
+    """批量写入 {代码: 结果}（同一键已存在时覆盖）"""
+    if not results:
+        return
+    session = session or session_for(kind)
+    version = version or param_version(kind)
+    now = datetime.now().isoformat(timespec="seconds")
+    rows = [(KINDS[kind], str(code), session, version, _encode(result), now) for code, result in results.items()]
+    conn = _connect()
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO results (kind, code, session, version, data, computed_at)"
+                         " VALUES (?, ?, ?, ?, ?, ?)", rows)
+    _bump('writes', len(rows))
+
+
+def prune(keep_sessions: int = None) -> int:
+    """每个类型只保留最近 keep_sessions 个交易日的结果，返回删除的条数"""
+    if keep_sessions is None:
+        keep_sessions = PRECOMPUTE_CONFIG['keep_sessions']
+    conn = _connect()
+    deleted = 0
+    with conn:
+        for (kind,) in conn.execute("SELECT DISTINCT kind FROM results").fetchall():
+            sessions = conn.execute("SELECT DISTINCT session FROM results WHERE kind = ? ORDER BY session DESC"
+                                    " LIMIT 1 OFFSET ?", (kind, keep_sessions - 1)).fetchall()
+            if sessions:
+                deleted += conn.execute("DELETE FROM results WHERE kind = ? AND session < ?",
+                                        (kind, sessions[0][0])).rowcount
+    return deleted
+
+
+# ===================== 夜间任务 =====================
+def _analyze_one(kind: str, code: str) -> dict:
+    if kind == "stock":
+        from advisor_stock import analyze_stock
+        return analyze_stock(code, timing=False)
+    from advisor_fund import analyze_fund_enhanced
+    return analyze_fund_enhanced(code, timing=False)
+
+
+def _data_date(kind: str, code: str) -> Optional[str]:
+    """
+    分析所用日线/净值的最后日期（YYYY-MM-DD）；分析刚取过数，这里读的是进程内或本地缓存
+    基金结果中的净值日期是周线（W-FRI）标签，可能晚于实际净值日期，因此以日线为准
+    """
+    if kind == "stock":
+        from advisor_stock import fetch_stock_daily
+        daily = fetch_stock_daily(code)
+    else:
+        from advisor_fund import fetch_fund_daily_nav
+        daily = fetch_fund_daily_nav(code)
+    if daily is None or len(daily) == 0:
+        return None
+    return daily.index[-1].date().isoformat()
+
+
+def _precompute_chunk(kind: str, codes: list, session: str) -> tuple:
+    """
+    在工作进程中分析一块代码并直接写入本库（进程内按 DATA_CONFIG['max_workers'] 并发取数）
+    数据还没有更新到该交易日的结果（数据源延迟发布、停牌等）不写入，之后重跑时再补
+    :return: (写入数, 出错数, 未更新数)
+    """
+    from result_cache import is_error_result
+    results = {}
+    errors = stale = 0
+    with ThreadPoolExecutor(max_workers=DATA_CONFIG['max_workers']) as executor:
+        futures = {executor.submit(_analyze_one, kind, code): code for code in codes}
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                result = future.result()
+                last_date = None if result is None or is_error_result(result) else _data_date(kind, code)
+            except Exception as e:
+                print(f"预计算 {kind} {code} 失败: {str(e)}")
+                result = None
+            if result is None or is_error_result(result):
+                errors += 1
+            elif last_date is None or last_date < session:
+                stale += 1
+            else:
+                results[code] = result
+    put_many(kind, results, session)
+    return len(results), errors, stale
+
+
+def load_universe(kind: str) -> list:
+    """读取 PRECOMPUTE_CONFIG 中配置的代码清单（相对 BASE_DIR），文件不存在时为空（并打印提示）"""
+    from batch_analysis import read_watchlist
+    path = PRECOMPUTE_CONFIG['universe'].get(kind)
+    if not path:
+        return []
+    path = path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+    if not os.path.exists(path):
+        print(f"代码清单不存在: {path}")
+        return []
+    return read_watchlist(path)
+
+
+def precompute(kind: str, codes: list = None, processes: int = None, chunk_size: int = None,
+               force: bool = False) -> dict:
+    """
+    对代码清单运行完整分析并写入本库（适合在收盘后/净值公布后由定时任务调用）
+    :param codes: 代码列表，默认 load_universe(kind)
+    :param processes: 进程数，默认 PRECOMPUTE_CONFIG['processes']（None 为 CPU 核数）；1 时在当前进程执行，
+                      多进程时各进程分摊 DATA_CONFIG['rate_limit']（fetch_orchestrator.split_rate_limit）
+    :param force: True 时重新计算当前交易日已有结果的代码
+    :return: 运行统计
+    """
+    kind = KINDS[kind]
+    if codes is None:
+        codes = load_universe(kind)
+    if processes is None:
+        processes = PRECOMPUTE_CONFIG['processes'] or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = PRECOMPUTE_CONFIG['chunk_size']
+    # 整个任务使用开始时的交易日，跨越发布时间运行时结果也归入同一交易日
+    session = session_for(kind)
+    done = set() if force else stored_codes(kind, session)
+    todo = [code for code in codes if code not in done]
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+    stats = {"类型": kind, "交易日": session, "参数版本": param_version(kind), "总数": len(codes),
+             "跳过": len(codes) - len(todo), "写入": 0, "出错": 0, "未更新": 0}
+    start = time.perf_counter()
+
+    def record(written: int, errors: int, stale: int):
+        stats["写入"] += written
+        stats["出错"] += errors
+        stats["未更新"] += stale
+        print(f"  {kind}: 已完成 {stats['写入'] + stats['出错'] + stats['未更新']}/{len(todo)}"
+              f"（出错 {stats['出错']}，未更新 {stats['未更新']}，{time.perf_counter() - start:.1f} 秒）", flush=True)
+
+    if processes <= 1:
+        for chunk in chunks:
+            record(*_precompute_chunk(kind, chunk, session))
+    elif chunks:
+        from fetch_orchestrator import split_rate_limit
+        processes = min(processes, len(chunks))
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                 initializer=split_rate_limit, initargs=(processes,)) as executor:
+            for future in as_completed([executor.submit(_precompute_chunk, kind, chunk, session) for chunk in chunks]):
+                record(*future.result())
+    stats["清理"] = prune()
+    stats["耗时(秒)"] = round(time.perf_counter() - start, 2)
+    return stats
+
+
+# ===================== 统计 =====================
+def get_store_stats() -> dict:
+    """命中统计及各类型、各交易日的条数"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    rows = _connect().execute("SELECT kind, session, COUNT(*) FROM results GROUP BY kind, session").fetchall()
+    stats['rows'] = {f"{kind}/{session}": n for kind, session, n in rows}
+    return stats
@@ -0,0 +1,92 @@
+"""
+滚动线性回归核
+基于累加和一次性算出序列（或二维数组的每一列）每个窗口位置的斜率、标准化斜率和 R²，
+复杂度 O(n)，替代逐窗口调用 np.polyfit / scipy.stats.linregress
+
+斜率由一阶差分的累加和得到：窗口内 Σ(x-x̄)y = Σ d_u·u(w-u)/2（d 为一阶差分，u 为窗口内位置），
+水平窗口的差分全为 0，斜率严格为 0；相对毛变动量低于 FLAT_TOLERANCE 的斜率视为 0，
+这样不同长度、不同起点的序列对同一窗口给出一致的方向判断
+"""
+
+import numpy as np
+
+FLAT_TOLERANCE = 1e-9
+
+
+def _window_diff(cum: np.ndarray, window: int) -> np.ndarray:
+    """由累加和得到长度为 window 的窗口和：位置 e 的值 = cum[e] - cum[e-window]（e-window < 0 时取 0）"""
+    out = cum.copy()
+    out[window:] -= cum[:-window]
+    return out
+
+
+def rolling_linregress(values, window: int) -> tuple:
+    """
+    对每个窗口位置（窗口末端对齐）做 y = a + b·x 回归，x = 0..window-1
+    :param values: 一维序列或二维数组（按列计算，行为时间）
+    :return: (斜率, 标准化斜率(%/期), R²)，形状与输入相同；前 window-1 个位置及含 NaN 的窗口为 NaN
+             R² 与 linregress 的 r_value**2 一致，水平窗口的 R² 为 0
+    """
+    y = np.asarray(values, dtype=float)
+    squeeze = y.ndim == 1
+    if squeeze:
+        y = y[:, None]
+    T = y.shape[0]
+    slope = np.full(y.shape, np.nan)
+    slope_norm = np.full(y.shape, np.nan)
+    r2 = np.full(y.shape, np.nan)
+    if window < 2 or T < window:
+        return (slope[:, 0], slope_norm[:, 0], r2[:, 0]) if squeeze else (slope, slope_norm, r2)
+
+    finite = np.isfinite(y)
+    has_nan = _window_diff(np.cumsum(~finite, axis=0), window) > 0
+
+    # 一阶差分及其位置加权累加和
+    d = np.zeros_like(y)
+    d[1:] = np.where(finite[1:] & finite[:-1], y[1:] - y[:-1], 0.0)
+    i = np.arange(T, dtype=float)[:, None]
+    ad = np.abs(d)
+    # 窗口 [s, e] 内用到的差分下标为 (s, e]，即长度 window-1 的窗口和
+    k_sum = _window_diff(np.cumsum(d, axis=0), window - 1)
+    l_sum = _window_diff(np.cumsum(i * d, axis=0), window - 1)
+    q_sum = _window_diff(np.cumsum(i * i * d, axis=0), window - 1)
+    k_abs = _window_diff(np.cumsum(ad, axis=0), window - 1)
+    l_abs = _window_diff(np.cumsum(i * ad, axis=0), window - 1)
+    q_abs = _window_diff(np.cumsum(i * i * ad, axis=0), window - 1)
+    s = i - (window - 1)
+    sxy = 0.5 * (-q_sum + (window + 2 * s) * l_sum - s * (window + s) * k_sum)
+    gross = 0.5 * (-q_abs + (window + 2 * s) * l_abs - s * (window + s) * k_abs)
+    sxy = np.where(np.abs(sxy) <= FLAT_TOLERANCE * np.abs(gross), 0.0, sxy)
+    sxx = window * (window ** 2 - 1) / 12.0
+
+    # 均值和离差平方和：以列均值为锚点降低累加误差
+    with np.errstate(all="ignore"):
+        anchor = np.where(finite.any(axis=0), np.nanmean(np.where(finite, y, np.nan), axis=0), 0.0)
+    yc = np.where(finite, y - anchor, 0.0)
+    s1 = _window_diff(np.cumsum(yc, axis=0), window)
+    s2 = _window_diff(np.cumsum(yc * yc, axis=0), window)
+    mean = anchor + s1 / window
+    syy = np.maximum(s2 - s1 * s1 / window, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        b = sxy / sxx
+        b_norm = b / mean * 100
+        r_sq = np.where((syy > 0) & (sxy != 0), np.minimum(sxy * sxy / (sxx * syy), 1.0), 0.0)
+
+    ok = ~has_nan
+    ok[:window - 1] = False
+    slope[ok] = b[ok]
+    slope_norm[ok] = b_norm[ok]
+    r2[ok] = r_sq[ok]
+    if squeeze:
+        return slope[:, 0], slope_norm[:, 0], r2[:, 0]
+    return slope, slope_norm, r2
+
+
+def last_window_linregress(values, window: int) -> tuple:
+    """只取最后一个窗口：返回 (斜率, 标准化斜率, R²) 三个浮点数，数据不足时为 NaN"""
+    y = np.asarray(values, dtype=float)[-window:]
+    slope, slope_norm, r2 = rolling_linregress(y, window)
+    if len(y) < window:
+        return np.nan, np.nan, np.nan
+    return float(slope[-1]), float(slope_norm[-1]), float(r2[-1])
@@ -0,0 +1,237 @@
+"""
+分析结果缓存（进程内共享）
+以 (分析类型, 代码, 交易日) 为键缓存 analyze_* 的结果，同一进程内的所有会话共用：
+- 命中：当前交易日已有结果（内存中，或夜间任务写入的预计算结果库中），直接返回
+- 过期：只有之前交易日的结果时立即返回旧结果，同时在后台刷新（stale-while-revalidate）
+- 未命中：计算后返回
+同一个键同时只计算一次，热门代码被多人同时查询时其余请求等待同一份结果
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from config import DATA_CONFIG, PRECOMPUTE_CONFIG
+from trading_calendar import current_session, FUND_NAV_TIME
+from app_logging import get_logger
+
+RESULT_CACHE_SIZE = 512   # 最多缓存的 (类型, 代码) 数
+# 依赖基金净值的分析类型：净值在当晚公布，交易日按净值公布时间切换
+FUND_KINDS = ("基金分析", "fund")
+
+_logger = get_logger("result_cache")
+
+
+def is_error_result(result) -> bool:
+    """出错的结果不缓存：基金分析返回「错误」，股票分析的「错误信息」非空"""
+    if not isinstance(result, dict):
+        return True
+    return bool(result.get("错误")) or bool(result.get("错误信息"))
+
+
+def _precomputed_result(kind: str, code: str, session: str):
+    """预计算结果库中当前参数版本的结果（预计算库在第一次查询时才导入）"""
+    from precompute_store import get_result
+    return get_result(kind, code, session)
+
+
+def default_session(kind: str) -> str:
+    """分析结果所属的交易日：股票在收盘后、基金在净值公布后切换到新的交易日"""
+    return current_session(publish_time=FUND_NAV_TIME if kind in FUND_KINDS else None)
+
+
+class ResultCache:
+    """
+    :param max_entries: 最多缓存的 (类型, 代码) 数，超出时淘汰最久未使用的
+    :param max_workers: 计算结果的线程数
+    :param session_func: session_func(分析类型) 返回当前交易日，交易日变化后旧结果视为过期；
+                         默认按交易日历（股票以收盘、基金以净值公布时间为界）
+    :param store_func: store_func(分析类型, 代码, 交易日) 返回持久化的结果（没有时为 None），
+                       内存中没有当前交易日的结果时先查询它再计算；
+                       默认按 PRECOMPUTE_CONFIG['read_store'] 读取预计算结果库
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, max_workers: int = None, session_func=None,
+                 store_func=None):
+        if session_func is None:
+            session_func = default_session
+        if store_func is None and PRECOMPUTE_CONFIG['read_store']:
+            store_func = _precomputed_result
+        self.max_entries = max_entries
+        self.session_func = session_func
+        self.store_func = store_func
+        self._entries = OrderedDict()   # (类型, 代码) -> {"session", "result", "computed_at"}
+        self._inflight = {}             # (类型, 代码, 交易日) -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or DATA_CONFIG['max_workers'],
+                                            thread_name_prefix="result-cache")
+        self._stats = {"hits": 0, "stale": 0, "misses": 0, "waits": 0, "refreshes": 0, "errors": 0, "store_hits": 0}
+
+    def _run(self, kind: str, code: str, session: str, compute):
+        try:
+            result = compute()
+        except Exception:
+            with self._lock:
+                self._inflight.pop((kind, code, session), None)
+                self._stats["errors"] += 1
+            raise
+        with self._lock:
+            # 写入结果和移除进行中标记在同一把锁内完成，避免其间的查询重复计算
+            self._inflight.pop((kind, code, session), None)
+            if is_error_result(result):
+                self._stats["errors"] += 1
+                return result
+            self._store(kind, code, session, result)
+        return result
+
+    def _store(self, kind: str, code: str, session: str, result):
+        """写入条目并按 LRU 淘汰；调用时必须持有锁"""
+        self._entries[(kind, code)] = {
+            "session": session,
+            "result": result,
+            "computed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self._entries.move_to_end((kind, code))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _from_store(self, kind: str, code: str, session: str):
+        """查询持久化的结果，命中时写入内存并计为命中，返回该结果（之后可能被淘汰，调用方直接使用返回值）；不持有锁调用"""
+        if self.store_func is None:
+            return None
+        try:
+            result = self.store_func(kind, code, session)
+        except Exception as e:
+            _logger.warning(f"读取 {kind} {code} 的预计算结果失败: {e}")
+            return None
+        if result is None or is_error_result(result):
+            return None
+        with self._lock:
+            self._stats["store_hits"] += 1
+            self._stats["hits"] += 1
+            self._store(kind, code, session, result)
+        return result
+
+    def _current(self, kind: str, code: str, session: str):
+        """内存中当前交易日的结果，没有时为 None；调用时必须持有锁"""
+        entry = self._entries.get((kind, code))
+        return entry["result"] if entry is not None and entry["session"] == session else None
+
+    def _submit(self, kind: str, code: str, session: str, compute) -> tuple:
+        """返回 (Future, 是否为新提交)；调用时必须持有锁"""
+        future = self._inflight.get((kind, code, session))
+        if future is not None:
+            return future, False
+        future = self._executor.submit(self._run, kind, code, session, compute)
+        self._inflight[(kind, code, session)] = future
+        return future, True
+
+    def lookup(self, kind: str, code: str, compute) -> tuple:
+        """
+        查询结果（不阻塞）
+        :param compute: 无参函数，返回新的分析结果
+        :return: (结果或 None, 状态, Future 或 None)
+                 状态为 hit（当前交易日的结果）/ stale（旧结果，Future 为后台刷新）/ miss（无结果，等待 Future）
+        """
+        session = self.session_func(kind)
+        with self._lock:
+            current = self._current(kind, code, session)
+        if current is None:
+            stored = self._from_store(kind, code, session)
+            if stored is not None:
+                return stored, "hit", None
+        with self._lock:
+            entry = self._entries.get((kind, code))
+            if entry is not None:
+                self._entries.move_to_end((kind, code))
+                if entry["session"] == session:
+                    self._stats["hits"] += 1
+                    return entry["result"], "hit", None
+                self._stats["stale"] += 1
+                future, new = self._submit(kind, code, session, compute)
+                if new:
+                    self._stats["refreshes"] += 1
+                    future.add_done_callback(lambda f: self._log_refresh(kind, code, f))
+                return entry["result"], "stale", future
+            future, new = self._submit(kind, code, session, compute)
+            self._stats["misses" if new else "waits"] += 1
+            return None, "miss", future
+
+    def get(self, kind: str, code: str, compute, timeout: float = None) -> tuple:
+        """
+        查询结果，未命中时等待计算完成
+        :return: (结果, 状态, 后台刷新的 Future 或 None)
+        """
+        result, status, future = self.lookup(kind, code, compute)
+        if status == "miss":
+            return future.result(timeout), status, None
+        return result, status, future
+
+    def peek(self, kind: str, code: str) -> tuple:
+        """
+        只查询、不触发计算（由外部执行计算，如任务队列，完成后调用 put 写入）
+        :return: (结果或 None, 状态)，状态为 hit / stale / miss
+        """
+        session = self.session_func(kind)
+        with self._lock:
+            current = self._current(kind, code, session)
+        if current is None:
+            stored = self._from_store(kind, code, session)
+            if stored is not None:
+                return stored, "hit"
+        with self._lock:
+            entry = self._entries.get((kind, code))
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, "miss"
+            self._entries.move_to_end((kind, code))
+            status = "hit" if entry["session"] == session else "stale"
+            self._stats["hits" if status == "hit" else "stale"] += 1
+            return entry["result"], status
+
+    def put(self, kind: str, code: str, result) -> bool:
+        """写入外部计算的结果（归入当前交易日）；出错的结果不写入，返回是否写入"""
+        session = self.session_func(kind)
+        with self._lock:
+            if is_error_result(result):
+                self._stats["errors"] += 1
+                return False
+            self._store(kind, code, session, result)
+        return True
+
+    def entry_info(self, kind: str, code: str) -> dict:
+        """缓存条目的元数据（交易日、计算时间），不存在时返回空字典"""
+        with self._lock:
+            entry = self._entries.get((kind, code))
+            return {"session": entry["session"], "computed_at": entry["computed_at"]} if entry else {}
+
+    def _log_refresh(self, kind: str, code: str, future: Future):
+        error = future.exception()
+        if error is not None:
+            _logger.warning(f"后台刷新 {kind} {code} 失败: {error}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["inflight"] = len(self._inflight)
+        lookups = stats["hits"] + stats["stale"] + stats["misses"] + stats["waits"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """进程内共享的结果缓存（Streamlit 的所有会话共用同一个实例）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
@@ -8,7 +8,12 @@ import subprocess
 import sys
 import os
 import argparse
-from config import SERVER_CONFIG
+from config import SERVER_CONFIG, PRECOMPUTE_CONFIG
+from lazy_imports import check_packages, measure_import_costs
+
+# 启动时只检查元数据的依赖包，以及 --import-report 测量导入耗时的模块
+REQUIRED_PACKAGES = ['streamlit', 'pandas', 'numpy', 'pyarrow', 'akshare', 'plotly']
+PROFILED_MODULES = REQUIRED_PACKAGES + ['advisor_stock', 'advisor_fund', 'streamlit_app']
 
 def check_python_version():
     """检查Python版本"""
@@ -19,29 +24,25 @@ def check_python_version():
     print(f"✅ Python版本检查通过: {sys.version}")
 
 def check_dependencies():
-    """检查必需的依赖包"""
-    required_packages = [
-        'streamlit',
-        'pandas', 
-        'numpy',
-        'akshare',
-        'plotly',
-        'scipy'
-    ]
-    
-    missing_packages = []
-    for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
-            missing_packages.append(package)
+    """检查必需的依赖包（只读取包的元数据，不导入，避免启动时加载 akshare 等大包）"""
+    versions = check_packages(REQUIRED_PACKAGES)
+    missing_packages = [name for name, version in versions.items() if version is None]
     
     if missing_packages:
         print(f"❌ 缺少依赖包: {', '.join(missing_packages)}")
-        print("请运行: pip install streamlit plotly")
+        print("请运行: pip install -r requirements.txt")
         sys.exit(1)
     
-    print("✅ 依赖包检查通过")
+    print("✅ 依赖包检查通过: " + ", ".join(f"{name} {version}" for name, version in versions.items()))
+
+def print_import_report():
+    """在全新的解释器中逐个测量模块的冷启动导入耗时"""
+    print("📦 模块导入耗时（冷启动，含依赖）:")
+    for row in measure_import_costs(PROFILED_MODULES):
+        if row["导入耗时(ms)"] is None:
+            print(f"  {row['模块']:<16} 导入失败: {row['错误']}")
+        else:
+            print(f"  {row['模块']:<16} {row['导入耗时(ms)']:>10.1f} ms")
 
 def start_streamlit(port=SERVER_CONFIG['port'], host=SERVER_CONFIG['host'], debug=False):
     """启动Streamlit应用"""
@@ -64,6 +65,65 @@ def start_streamlit(port=SERVER_CONFIG['port'], host=SERVER_CONFIG['host'], debu
         print("\n👋 应用已停止")
         sys.exit(0)
 
+def run_batch_analysis(args):
+    """analyze 子命令：批量分析自选清单，结果流式写入 CSV/Parquet"""
+    from batch_analysis import read_watchlist, run_batch
+    codes = read_watchlist(args.watchlist)
+    print(f"📋 {args.watchlist}: {len(codes)} 个代码 -> {args.output}")
+    try:
+        stats = run_batch(codes, args.type, args.output, processes=args.processes,
+                          chunk_size=args.chunk_size, fmt=args.format, resume=not args.no_resume)
+    except KeyboardInterrupt:
+        print("\n⏸️ 已中断，重新运行同一命令可从断点继续")
+        sys.exit(130)
+    except Exception as e:
+        print(f"❌ 批量分析失败: {e}")
+        sys.exit(1)
+    print(f"✅ 完成 {stats['完成']} 个（跳过已有 {stats['跳过']} 个，重试上次出错 {stats['重试']} 个，出错 {stats['出错']} 个），"
+          f"耗时 {stats['耗时(秒)']} 秒")
+
+def run_api_server(args):
+    """api 子命令：只启动 JSON 接口（不启动 Web 界面）"""
+    from api_server import run
+    print(f"🔌 JSON 接口: http://{args.api_host}:{args.api_port}")
+    try:
+        run(args.api_host, args.api_port)
+    except OSError as e:
+        print(f"❌ 启动失败: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n👋 接口已停止")
+
+def run_precompute(args):
+    """precompute 子命令：对配置的代码清单预计算当前交易日的结果（适合收盘后/净值公布后定时运行）"""
+    from precompute_store import precompute, load_universe
+    if args.watchlist and args.type == 'all':
+        print("❌ 指定 --watchlist 时需要用 --type 指明 stock 或 fund")
+        sys.exit(1)
+    kinds = ['stock', 'fund'] if args.type == 'all' else [args.type]
+    for kind in kinds:
+        if args.watchlist:
+            from batch_analysis import read_watchlist
+            codes = read_watchlist(args.watchlist)
+        else:
+            codes = load_universe(kind)
+        if not codes:
+            # 定时任务据此报警，而不是每晚"成功"地什么也没做
+            print(f"❌ {kind} 代码清单为空，请检查 PRECOMPUTE_CONFIG['universe'] 或 --watchlist")
+            sys.exit(1)
+        if PRECOMPUTE_CONFIG['preload_listings']:
+            # 一次请求全市场代码列表写入基本信息库，工作进程分析时不必逐只请求信息接口
+            from metadata_store import preload_listings
+            print(f"📇 {kind} 代码列表预加载 {preload_listings((kind,))[kind]} 条")
+        try:
+            stats = precompute(kind, codes, processes=args.processes, force=args.force)
+        except KeyboardInterrupt:
+            print("\n⏸️ 已中断，重新运行同一命令会跳过已写入的代码")
+            sys.exit(130)
+        print(f"✅ {kind} {stats['交易日']}（参数版本 {stats['参数版本']}）: 写入 {stats['写入']} 个，"
+              f"跳过已有 {stats['跳过']} 个，数据未更新 {stats['未更新']} 个，出错 {stats['出错']} 个，"
+              f"耗时 {stats['耗时(秒)']} 秒")
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(
@@ -75,6 +135,11 @@ def main():
     python run_app.py --port 8080        # 自定义端口
     python run_app.py --host 0.0.0.0     # 允许外部访问
     python run_app.py --debug            # 调试模式
+    python run_app.py --import-report    # 测量各模块导入耗时后退出
+    python run_app.py analyze watchlist.txt -t stock -o result.csv -j 4
+                                         # 批量分析自选清单（中断后重跑同一命令可续跑）
+    python run_app.py api                # 只启动 JSON 接口（默认随 Web 界面一起启动）
+    python run_app.py precompute         # 预计算 PRECOMPUTE_CONFIG 代码清单的当日结果（夜间定时任务）
         """
     )
     
@@ -103,12 +168,58 @@ def main():
         help='跳过环境检查'
     )
     
+    parser.add_argument(
+        '--import-report',
+        action='store_true',
+        help='测量各模块的导入耗时后退出'
+    )
+    
+    subparsers = parser.add_subparsers(dest='command')
+    analyze = subparsers.add_parser('analyze', help='批量分析代码清单文件（无界面），结果写入 CSV/Parquet')
+    analyze.add_argument('watchlist', help='代码清单文件：每行一个或多个代码，# 之后为注释')
+    analyze.add_argument('--type', '-t', choices=['stock', 'fund'], default='stock', help='分析类型 (默认: stock)')
+    analyze.add_argument('--output', '-o', required=True,
+                         help='输出路径：CSV 文件，或 Parquet 目录（.parquet 结尾）')
+    analyze.add_argument('--format', '-f', choices=['csv', 'parquet'], help='输出格式 (默认按输出路径判断)')
+    analyze.add_argument('--processes', '-j', type=int, help='进程数 (默认: CPU 核数)')
+    analyze.add_argument('--chunk-size', type=int, help='每个任务/每次写入的代码数 (默认: 50)')
+    analyze.add_argument('--no-resume', action='store_true', help='不续跑：输出已存在时报错')
+    
+    api = subparsers.add_parser('api', help='只启动 JSON 接口（不启动 Web 界面）')
+    api.add_argument('--host', dest='api_host', default=SERVER_CONFIG['host'],
+                     help=f'接口地址 (默认: {SERVER_CONFIG["host"]})')
+    api.add_argument('--port', dest='api_port', type=int, default=SERVER_CONFIG['api_port'],
+                     help=f'接口端口 (默认: {SERVER_CONFIG["api_port"]})')
+    
+    precompute = subparsers.add_parser('precompute', help='预计算代码清单的当日结果，写入预计算结果库')
+    precompute.add_argument('--type', '-t', choices=['stock', 'fund', 'all'], default='all',
+                            help='分析类型 (默认: all)')
+    precompute.add_argument('--watchlist', '-w', help='代码清单文件 (默认: PRECOMPUTE_CONFIG 中配置的清单)')
+    precompute.add_argument('--processes', '-j', type=int, help='进程数 (默认: CPU 核数)')
+    precompute.add_argument('--force', action='store_true', help='重新计算当日已有结果的代码')
+    
     args = parser.parse_args()
     
     # 打印欢迎信息
     print("🎯 智能投资分析系统")
     print("=" * 50)
     
+    if args.import_report:
+        print_import_report()
+        return
+    
+    if args.command == 'analyze':
+        run_batch_analysis(args)
+        return
+    
+    if args.command == 'api':
+        run_api_server(args)
+        return
+    
+    if args.command == 'precompute':
+        run_precompute(args)
+        return
+    
     # 环境检查
     if not args.skip_checks:
         check_python_version()
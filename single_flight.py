@@ -0,0 +1,105 @@
+"""
+进程内请求合并（single-flight）
+同一个键同时只执行一次：第一个调用者真正执行，其余并发调用者等待并拿到同一个结果（或同一个异常）。
+Streamlit 的多个会话同时分析同一个代码时，分析和取数只执行一次。
+返回的结果由所有等待者共享，调用方不要原地修改
+"""
+
+import functools
+import threading
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    一组按键合并的调用
+    :param name: 分组名，统计（get_single_flight_stats）按分组汇总
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0}
+        with _groups_lock:
+            _groups[name] = self
+
+    def do(self, key, fn):
+        """执行 fn()；同一个 key 已有进行中的调用时等待其结果"""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["inflight"] = len(self._calls)
+        stats["coalesced_rate"] = round(stats["coalesced"] / stats["calls"], 4) if stats["calls"] else 0.0
+        return stats
+
+
+def _freeze(value):
+    """把参数转换为可哈希的键（字典、列表等按内容比较）"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def single_flight(name: str):
+    """装饰器：按 (位置参数, 关键字参数) 合并并发调用"""
+    def decorator(func):
+        group = SingleFlight(name)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (_freeze(args), _freeze(kwargs))
+            return group.do(key, lambda: func(*args, **kwargs))
+
+        wrapper.single_flight = group
+        return wrapper
+    return decorator
+
+
+def get_single_flight_stats() -> dict:
+    """各分组的调用次数、实际执行次数、被合并的调用次数和合并比例"""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
@@ -1,12 +1,21 @@
 import streamlit as st
 import sys
 import os
+from datetime import datetime
 
 # 添加当前目录到路径，确保可以导入 advisor
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from advisor_stock import analyze_stock
-from advisor_fund import analyze_fund_enhanced
+# 分析模块（及其依赖的 pandas / akshare）在每类分析第一次执行时才导入，见 run_analysis
+from config import LOGGING_CONFIG, SERVER_CONFIG
+from timing import TIMING_KEY
+from result_cache import get_result_cache
+from lazy_imports import timed_import, import_report
+from api_server import start_in_background
+
+# JSON 接口与界面运行在同一进程，共用结果缓存（每个进程只启动一次）
+if SERVER_CONFIG['api_with_ui']:
+    start_in_background()
 
 # 设置页面配置
 st.set_page_config(
@@ -74,6 +83,9 @@ with st.sidebar:
         code = st.text_input("请输入基金代码:", placeholder="例如: 000001")
         st.caption("支持开放式基金代码，如: 000001, 110011")
     
+    # 分阶段耗时（显示在「分析元数据」中）
+    timing_enabled = st.checkbox("⏱️ 记录分析耗时", value=LOGGING_CONFIG.get('timing', False))
+    
     # 分析按钮
     analyze_button = st.button("🔍 开始分析", type="primary", use_container_width=True)
     
@@ -163,6 +175,18 @@ def display_welcome():
         </div>
         """, unsafe_allow_html=True)
 
+def display_timing(result):
+    """在「分析元数据」中显示各阶段耗时（仅当结果包含耗时统计时）"""
+    timing = result.get(TIMING_KEY)
+    if not timing:
+        return
+    st.write(f"**分析耗时:** {timing.get('总耗时(ms)', 0):.1f} ms")
+    st.table([{"阶段": s["阶段"], "耗时(ms)": f"{s['耗时(ms)']:.1f}"} for s in timing.get("阶段", [])])
+    imports = import_report()
+    if imports:
+        st.write("**模块首次导入耗时（本进程）:**")
+        st.table(imports)
+
 def display_stock_analysis(result):
     """显示股票分析结果"""
     st.header(f"📊 {result.get('股票代码', 'Unknown')} {result.get('股票名称', '')} 股票分析报告")
@@ -254,6 +278,12 @@ def display_stock_analysis(result):
             st.write(f"- 阻力位: {resistance:.2f}")
             if result.get('止损建议'):
                 st.write(f"- 止损位: {result.get('止损建议'):.2f}")
+    
+    # 分析元数据
+    with st.expander("🔍 分析元数据"):
+        st.write(f"**分析日期:** {result.get('分析日期', '未知')}")
+        st.write(f"**数据完整性:** {'完整' if not result.get('错误信息') else '有缺失'}")
+        display_timing(result)
 
 def display_fund_analysis(result):
     """显示基金分析结果 - 基于新的数据结构"""
@@ -430,37 +460,100 @@ def display_fund_analysis(result):
         st.write(f"**最新数据日期:** {latest_data.get('净值日期', '未知')}")
         st.write(f"**业绩比较基准:** {fund_info.get('业绩比较基准', '暂无')}")
         st.write(f"**数据完整性:** {'完整' if not result.get('错误') else '有缺失'}")
+        display_timing(result)
+
+def render_result(analysis_type, result):
+    if analysis_type == "股票分析":
+        display_stock_analysis(result)
+    else:
+        display_fund_analysis(result)
+
+def wait_for_job(queue, job_id):
+    """轮询任务进度直到结束；期间点击「取消分析」会中断脚本，在下一次运行时取消任务"""
+    progress = st.progress(0.0, text="任务排队中...")
+    st.button("⏹️ 取消分析", key="cancel_job")
+    def on_progress(status):
+        text = f"正在执行: {status['stage']}" if status['stage'] else "任务排队中..."
+        progress.progress(min(status['progress'], 1.0), text=f"{text}（已用时 {status['elapsed_s']:.1f} 秒）")
+    status = queue.wait(job_id, on_progress=on_progress)
+    progress.empty()
+    return status
+
+def display_result(analysis_type, code, timing_enabled):
+    """
+    显示分析结果：先查共享结果缓存，命中时立即显示；
+    未命中时把分析提交到任务队列（独立进程执行）并轮询进度，
+    只有旧交易日的结果时先显示旧结果，刷新任务完成后重新渲染
+    """
+    cache = get_result_cache()
+    result, status = cache.peek(analysis_type, code)
+    if status == "hit":
+        info = cache.entry_info(analysis_type, code)
+        st.success(f"分析完成！（缓存结果，计算于 {info.get('computed_at', '未知')}）")
+        render_result(analysis_type, result)
+        return
+
+    queue = timed_import("job_queue").get_job_queue()
+    job_id = st.session_state.get('current_job')
+    if job_id is None:
+        job_id = st.session_state.current_job = queue.submit(analysis_type, code, timing=timing_enabled)
+
+    if status == "stale":
+        info = cache.entry_info(analysis_type, code)
+        st.info(f"当前显示的是 {info.get('session', '上一交易日')} 的分析结果，正在刷新最新数据...")
+        render_result(analysis_type, result)
+
+    job = wait_for_job(queue, job_id)
+    st.session_state.current_job = None
+    if job['status'] == "cancelled":
+        st.warning("分析已取消")
+        return
+    if job['status'] == "failed":
+        st.error(f"分析失败: {job['error']}")
+        return
+
+    new_result = queue.result(job_id)
+    if not cache.put(analysis_type, code, new_result) and "错误" in new_result:
+        if status == "stale":
+            st.warning(f"刷新失败，显示的仍是旧结果: {new_result['错误']}")
+        else:
+            st.error(f"分析失败: {new_result['错误']}")
+        return
+    if status == "stale":
+        # 旧结果已经渲染，重新运行脚本，此时会命中新结果
+        st.rerun()
+    st.success(f"分析完成！（耗时 {job['elapsed_s']:.1f} 秒）")
+    render_result(analysis_type, new_result)
 
 # 主内容区域
 if analyze_button and code:
     if not code.strip():
         st.error("请输入有效的代码！")
     else:
-        with st.spinner(f"正在分析 {code}，请稍候..."):
-            try:
-                if analysis_type == "股票分析":
-                    result = analyze_stock(code.strip())
-                else:
-                    result = analyze_fund_enhanced(code.strip())
-                print(result)
-                if "错误" in result:
-                    st.error(f"分析失败: {result['错误']}")
-                else:
-                    # 显示分析结果
-                    st.success("分析完成！")
-                    
-                    if analysis_type == "股票分析":
-                        display_stock_analysis(result)
-                    else:
-                        display_fund_analysis(result)
-                        
-            except Exception as e:
-                st.error(f"分析过程中出现错误: {str(e)}")
-                st.info("请检查代码是否正确，或稍后重试")
+        # 记录当前查询，重新运行（如刷新完成）时继续显示同一结果；新查询不复用上一查询的任务
+        st.session_state.current_query = (analysis_type, code.strip())
+        st.session_state.current_job = None
+        st.session_state.analysis_history.append(
+            (analysis_type, code.strip(), datetime.now().strftime("%H:%M:%S")))
 
-elif analyze_button and not code:
+if analyze_button and not code:
     st.warning("请先输入要分析的代码！")
 
+elif st.session_state.get('cancel_job') and st.session_state.get('current_job'):
+    # 轮询期间点击了「取消分析」
+    timed_import("job_queue").get_job_queue().cancel(st.session_state.current_job)
+    st.session_state.current_job = None
+    st.session_state.current_query = None
+    st.warning("分析已取消")
+
+elif st.session_state.get('current_query'):
+    query_type, query_code = st.session_state.current_query
+    try:
+        display_result(query_type, query_code, timing_enabled)
+    except Exception as e:
+        st.error(f"分析过程中出现错误: {str(e)}")
+        st.info("请检查代码是否正确，或稍后重试")
+
 else:
     # 显示欢迎页面
-    display_welcome()
\ No newline at end of file
+    display_welcome()
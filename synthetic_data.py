@@ -0,0 +1,140 @@
+"""
+可复现的合成行情数据
+生成与 data_cache.normalize_daily_bars 相同格式的日线（date 索引 + close/volume），用于基准测试和离线回放：
+- 价格为几何布朗运动（GBM），每个代码的漂移和波动率随机
+- 成交量为对数正态分布，并随当日涨跌幅放大
+- 跳空：少数交易日叠加较大的隔夜跳变
+- 停牌：随机的连续交易日没有数据；部分代码晚于起始日上市
+相同 seed 下结果完全一致
+"""
+
+from datetime import datetime
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from data_provider import save_replay_bars, save_replay_info
+
+TRADING_DAYS_PER_YEAR = 250
+
+
+def trading_days(n_days: int, end_date=None) -> pd.DatetimeIndex:
+    """截至 end_date（默认今天）的最近 n_days 个工作日"""
+    return _trading_days(n_days, pd.Timestamp(end_date or datetime.now().strftime("%Y-%m-%d")).strftime("%Y-%m-%d"))
+
+
+@lru_cache(maxsize=16)
+def _trading_days(n_days: int, end: str) -> pd.DatetimeIndex:
+    # 生成日期序列比生成行情本身还慢，同一组参数只生成一次
+    return pd.bdate_range(end=end, periods=n_days, name="date")
+
+
+def _gbm_path(rng: np.random.Generator, n: int, start_price: float, mu: float, sigma: float,
+              gap_prob: float, gap_scale: float) -> tuple:
+    """返回 (收盘价, 日收益)；mu/sigma 为年化参数"""
+    dt = 1.0 / TRADING_DAYS_PER_YEAR
+    shocks = rng.standard_normal(n)
+    log_ret = (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks
+    gaps = rng.random(n) < gap_prob
+    log_ret[gaps] += rng.normal(0.0, gap_scale, gaps.sum())
+    log_ret[0] = 0.0
+    return start_price * np.exp(np.cumsum(log_ret)), log_ret
+
+
+def _suspension_mask(rng: np.random.Generator, n: int, suspend_prob: float, max_len: int) -> np.ndarray:
+    """True 表示该交易日有数据"""
+    keep = np.ones(n, dtype=bool)
+    starts = np.flatnonzero(rng.random(n) < suspend_prob)
+    for s in starts:
+        keep[s:s + rng.integers(1, max_len + 1)] = False
+    return keep
+
+
+def generate_daily_bars(n_days: int = 1250, seed: int = 0, end_date=None, start_price: float = None,
+                        mu: float = None, sigma: float = None, with_volume: bool = True,
+                        gap_prob: float = 0.005, gap_scale: float = 0.06,
+                        suspend_prob: float = 0.002, max_suspend_days: int = 20,
+                        listing_prob: float = 0.1) -> pd.DataFrame:
+    """
+    生成一只标的的日线
+    :param mu/sigma: 年化漂移/波动率，None 时随机（mu∈[-0.15, 0.25]，sigma∈[0.15, 0.6]）
+    :param gap_prob: 每日出现跳空的概率，跳空幅度 ~ N(0, gap_scale)
+    :param suspend_prob: 每日开始停牌的概率，停牌长度 1~max_suspend_days 个交易日
+    :param listing_prob: 晚于起始日上市的概率（上市前没有数据）
+    """
+    rng = np.random.default_rng(seed)
+    days = trading_days(n_days, end_date)
+    mu = rng.uniform(-0.15, 0.25) if mu is None else mu
+    sigma = rng.uniform(0.15, 0.6) if sigma is None else sigma
+    start_price = rng.uniform(3.0, 80.0) if start_price is None else start_price
+    close, log_ret = _gbm_path(rng, n_days, start_price, mu, sigma, gap_prob, gap_scale)
+    data = {"close": np.round(close, 2)}
+    if with_volume:
+        base = rng.uniform(1e4, 1e6)
+        data["volume"] = np.round(base * rng.lognormal(0.0, 0.4, n_days) * (1 + 20 * np.abs(log_ret)))
+    df = pd.DataFrame(data, index=days)
+
+    keep = _suspension_mask(rng, n_days, suspend_prob, max_suspend_days)
+    if rng.random() < listing_prob:
+        keep[:rng.integers(1, n_days // 2)] = False
+    keep[-1] = True  # 最新一个交易日总有数据，便于「最新」分析
+    return df[keep]
+
+
+def generate_index_bars(n_days: int = 1250, seed: int = 0, end_date=None) -> pd.DataFrame:
+    """基准指数日线：低波动、无停牌、无成交量"""
+    return generate_daily_bars(n_days, seed, end_date, start_price=3500.0, mu=0.05, sigma=0.2,
+                               with_volume=False, gap_prob=0.001, gap_scale=0.03,
+                               suspend_prob=0.0, listing_prob=0.0)
+
+
+def generate_fund_nav(n_days: int = 1250, seed: int = 0, end_date=None) -> pd.DataFrame:
+    """基金净值日线：净值从 1 附近起步，波动低于个股，没有停牌"""
+    rng = np.random.default_rng(seed)
+    df = generate_daily_bars(n_days, seed, end_date, start_price=rng.uniform(0.8, 3.0),
+                             mu=rng.uniform(-0.05, 0.15), sigma=rng.uniform(0.05, 0.3),
+                             with_volume=False, gap_prob=0.0, suspend_prob=0.0, listing_prob=0.0)
+    df["close"] = df["close"].round(4)
+    return df
+
+
+def stock_codes(n_codes: int) -> list:
+    """生成 n_codes 个互不相同的 6 位股票代码（沪深交替）"""
+    return [f"{600000 + i // 2:06d}" if i % 2 == 0 else f"{i // 2 + 1:06d}" for i in range(n_codes)]
+
+
+def fund_codes(n_codes: int) -> list:
+    return [f"{100000 + i:06d}" for i in range(n_codes)]
+
+
+def generate_universe(n_codes: int, n_days: int = 1250, seed: int = 0, end_date=None) -> dict:
+    """生成 {股票代码: 日线}；第 i 只股票使用种子 seed * 1_000_003 + i，单只股票的数据不随 n_codes 变化"""
+    return {code: generate_daily_bars(n_days, seed * 1_000_003 + i, end_date)
+            for i, code in enumerate(stock_codes(n_codes))}
+
+
+def generate_fund_universe(n_codes: int, n_days: int = 1250, seed: int = 0, end_date=None) -> dict:
+    return {code: generate_fund_nav(n_days, seed * 1_000_003 + i, end_date)
+            for i, code in enumerate(fund_codes(n_codes))}
+
+
+def write_replay_universe(root: str, n_stocks: int = 0, n_funds: int = 0, n_days: int = 1250, seed: int = 0,
+                          index_symbol: str = "sh000300", end_date=None, stocks: dict = None, funds: dict = None) -> dict:
+    """
+    把合成数据写成 ReplayProvider 的回放目录（股票/基金日线、基本信息和基准指数）
+    :param stocks/funds: 已生成的 {代码: 日线}，给出时直接写入，只取前 n_stocks / n_funds 个
+    :return: {"stocks": 股票代码列表, "funds": 基金代码列表}
+    """
+    save_replay_bars(root, "index_daily", index_symbol, generate_index_bars(n_days, seed, end_date), "sina_index")
+    if stocks is None:
+        stocks = generate_universe(n_stocks, n_days, seed, end_date)
+    stocks = dict(list(stocks.items())[:n_stocks])
+    for code, df in stocks.items():
+        save_replay_bars(root, "stock_daily", code, df, "em_hist", "qfq")
+        save_replay_info(root, "stock_info", code, {"股票代码": code, "股票简称": f"合成{code}"})
+    if funds is None:
+        funds = generate_fund_universe(n_funds, n_days, seed, end_date)
+    funds = dict(list(funds.items())[:n_funds])
+    for code, df in funds.items():
+        save_replay_bars(root, "fund_nav", code, df, "em_fund_nav")
+        save_replay_info(root, "fund_info", code, {"基金代码": code, "基金名称": f"合成基金{code}"})
+    return {"stocks": list(stocks), "funds": list(funds)}
@@ -0,0 +1,62 @@
+"""
+测试公共设置：
+- 把仓库根目录加入模块搜索路径（各模块均为顶层模块）
+- 日线缓存、信息库和预计算结果库改写到临时目录，不影响本地的 cache/
+- 合成的基准指数周线和回放数据源（ReplayProvider）
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_cache  # noqa: E402
+import metadata_store  # noqa: E402
+import precompute_store  # noqa: E402
+from synthetic_data import generate_index_bars, write_replay_universe  # noqa: E402
+from data_provider import ReplayProvider, set_provider  # noqa: E402
+from benchmark_store import reset_benchmarks  # noqa: E402
+
+_TMP = tempfile.mkdtemp(prefix="investment-tests-")
+data_cache.BARS_DIR = os.path.join(_TMP, "bars")
+os.makedirs(data_cache.BARS_DIR, exist_ok=True)
+metadata_store.METADATA_DB = os.path.join(_TMP, "metadata.sqlite")
+precompute_store.PRECOMPUTE_DB = os.path.join(_TMP, "precomputed.sqlite")
+
+N_DAYS = 1400
+END_DATE = "2024-06-28"
+
+
+def index_weekly_from_daily(index_daily):
+    """与 benchmark_store.get_index_weekly(with_log_ret=True) 相同的周线处理"""
+    weekly = index_daily[["close"]].resample("W-FRI").last().dropna()
+    weekly["ret"] = weekly["close"].pct_change()
+    weekly["log_ret"] = np.log(weekly["close"] / weekly["close"].shift(1))
+    return weekly.dropna()
+
+
+@pytest.fixture(scope="session")
+def index_weekly():
+    return index_weekly_from_daily(generate_index_bars(N_DAYS, seed=0, end_date=END_DATE))
+
+
+@pytest.fixture(scope="session")
+def replay_root():
+    """截至今天的回放数据：股票、基金、沪深300 日线和基本信息"""
+    root = os.path.join(_TMP, "replay")
+    universe = write_replay_universe(root, n_stocks=6, n_funds=3, n_days=N_DAYS, seed=11)
+    return root, universe
+
+
+@pytest.fixture
+def replay(replay_root):
+    """当前数据源换成回放数据源，结束时恢复；进程内共享的基准指数也随之清空"""
+    provider = ReplayProvider(replay_root[0])
+    previous = set_provider(provider)
+    reset_benchmarks()
+    yield provider
+    set_provider(previous)
+    reset_benchmarks()
@@ -0,0 +1,28 @@
+import pandas as pd
+from advisor_stock import analyze_stock, analyze_stocks, STOCK_RESULT_COLUMNS
+
+
+def test_batch_matches_single(replay, replay_root):
+    codes = replay_root[1]["stocks"][:4]
+    batch = analyze_stocks(codes + [codes[0]], max_workers=3)
+    assert list(batch.columns) == STOCK_RESULT_COLUMNS
+    assert batch["股票代码"].tolist() == codes     # 去重，保持输入顺序
+    assert (batch["错误信息"] == "").all()
+    single = pd.DataFrame([analyze_stock(code, timing=False) for code in codes], columns=STOCK_RESULT_COLUMNS)
+    pd.testing.assert_frame_equal(batch, single)
+
+
+def test_benchmark_fetched_once(replay, replay_root):
+    codes = replay_root[1]["stocks"]
+    before = replay.stats["requests"]
+    analyze_stocks(codes)
+    # 每只股票基本信息和日线各一次，基准指数所有股票共用一次
+    assert replay.stats["requests"] - before == 2 * len(codes) + 1
+
+
+def test_bad_code_is_an_error_row(replay, replay_root):
+    code = replay_root[1]["stocks"][0]
+    result = analyze_stocks([code, "999999"])
+    assert result["股票代码"].tolist() == [code, "999999"]
+    assert result.loc[0, "错误信息"] == ""
+    assert result.loc[1, "错误信息"].startswith("分析出错")
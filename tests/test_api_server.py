@@ -0,0 +1,109 @@
+import asyncio
+import http.client
+import json
+import threading
+import pytest
+import api_server
+import job_queue
+from data_provider import ReplayProvider
+
+
+@pytest.fixture(scope="module")
+def server():
+    """在后台线程的事件循环中启动接口服务（随机端口），返回端口号"""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    holder = {}
+
+    async def start():
+        holder["server"] = await asyncio.start_server(api_server._handle_connection, "127.0.0.1", 0)
+        holder["port"] = holder["server"].sockets[0].getsockname()[1]
+        ready.set()
+
+    thread = threading.Thread(target=lambda: (loop.run_until_complete(start()), loop.run_forever()), daemon=True)
+    thread.start()
+    ready.wait(10)
+    yield holder["port"]
+    loop.call_soon_threadsafe(holder["server"].close)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+
+
+@pytest.fixture(scope="module")
+def replay_queue(replay_root):
+    """接口使用的任务队列换成回放数据源的工作进程"""
+    previous = job_queue._queue
+    job_queue._queue = job_queue.JobQueue(max_workers=2, provider=ReplayProvider(replay_root[0]))
+    yield job_queue._queue
+    job_queue._queue.shutdown()
+    job_queue._queue = previous
+
+
+def _request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.getheader("Content-Type"), response.read()
+    finally:
+        conn.close()
+
+
+def test_stats(server):
+    status, content_type, body = _request(server, "GET", "/api/stats")
+    assert status == 200 and content_type.startswith("application/json")
+    stats = json.loads(body)
+    assert {"result_cache", "jobs", "precomputed", "snapshot", "fetch", "hedge", "single_flight"} <= set(stats)
+    assert {"loads", "hits", "waits", "failures", "codes"} <= set(stats["snapshot"])
+    assert {"requests", "hedged", "primary_wins", "fallback_wins", "all_failed"} <= set(stats["hedge"])
+
+
+def test_single_analysis_is_cached(server, replay_queue, replay_root):
+    code = replay_root[1]["stocks"][3]
+    status, _, body = _request(server, "GET", f"/api/stock/{code}")
+    first = json.loads(body)
+    assert status == 200 and first["code"] == code and first["cache"] == "miss"
+    assert first["result"]["股票代码"] == code
+    second = json.loads(_request(server, "GET", f"/api/stock/{code}")[2])
+    assert second["cache"] == "hit" and second["result"] == first["result"]
+
+
+def test_batch_json(server, replay_queue, replay_root):
+    codes = replay_root[1]["stocks"][4:6]
+    payload = json.dumps({"type": "stock", "codes": codes + [codes[0], "999999"]})
+    status, content_type, body = _request(server, "POST", "/api/batch", payload, {"Content-Type": "application/json"})
+    assert status == 200 and content_type.startswith("application/json")
+    data = json.loads(body)
+    assert data["count"] == 3 and [item["code"] for item in data["results"]] == codes + ["999999"]   # 去重，保持顺序
+    assert all("error" not in item for item in data["results"][:2])
+    assert data["results"][2]["error"]
+
+
+def test_batch_ndjson_stream(server, replay_queue, replay_root):
+    codes = replay_root[1]["funds"][:2]
+    payload = json.dumps({"type": "fund", "codes": codes, "stream": True})
+    status, content_type, body = _request(server, "POST", "/api/batch", payload)
+    assert status == 200 and content_type.startswith(api_server.NDJSON)
+    items = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert sorted(item["code"] for item in items) == sorted(codes)
+    assert all(item["type"] == "fund" and "result" in item for item in items)
+
+
+def test_invalid_batch_requests(server):
+    assert _request(server, "POST", "/api/batch", b"{not json")[0] == 400
+    assert _request(server, "POST", "/api/batch", json.dumps({"type": "bond", "codes": ["1"]}))[0] == 400
+    assert _request(server, "POST", "/api/batch", json.dumps({"codes": []}))[0] == 400
+    assert _request(server, "GET", "/api/batch")[0] == 405
+    assert _request(server, "GET", "/api/unknown")[0] == 404
+
+
+def test_chunked_request_body_is_rejected(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server, timeout=10)
+    try:
+        conn.request("POST", "/api/batch", body=iter([b'{"codes": ', b'["600000"]}']), encode_chunked=True,
+                     headers={"Transfer-Encoding": "chunked"})
+        response = conn.getresponse()
+        assert response.status == 411 and response.getheader("Connection") == "close"
+        assert "Content-Length" in json.loads(response.read())["error"]
+    finally:
+        conn.close()
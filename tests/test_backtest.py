@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from backtest import (stock_positions, fund_positions, run_backtest, backtest_stocks, backtest_funds,
+                      backtest_stock_histories, DEFAULT_FEE_RATE)
+
+
+def _positions(actions, close=None, stop=None, use_stop=True):
+    actions = np.array(actions, dtype=object)[:, None]
+    close = np.full(actions.shape, 10.0) if close is None else np.array(close, dtype=float)[:, None]
+    stop = np.full(actions.shape, np.nan) if stop is None else np.array(stop, dtype=float)[:, None]
+    return stock_positions(actions, close, stop, use_stop)[:, 0].tolist()
+
+
+def test_stock_positions_follow_advice():
+    assert _positions(["观望", "买入", "观望", "减仓", "减仓", "清仓", "减仓", "买入"]) == \
+        [0.0, 1.0, 1.0, 0.5, 0.25, 0.0, 0.0, 1.0]
+
+
+def test_stop_loss_exits_on_previous_week_stop():
+    actions = ["买入", "观望", "观望", "观望"]
+    close = [10.0, 9.8, 9.4, 9.6]
+    stop = [9.5, 9.5, 9.5, 9.5]
+    assert _positions(actions, close, stop) == [1.0, 1.0, 0.0, 0.0]
+    assert _positions(actions, close, stop, use_stop=False) == [1.0, 1.0, 1.0, 1.0]
+
+
+def test_fund_positions_carry_forward():
+    pct = np.array([[np.nan], [50.0], [np.nan], [120.0], [0.0]])
+    assert fund_positions(pct)[:, 0].tolist() == [0.0, 0.5, 0.5, 1.0, 0.0]
+
+
+def test_run_backtest_matches_loop():
+    rng = np.random.default_rng(3)
+    weights = rng.choice([0.0, 0.5, 1.0], size=(40, 3))
+    returns = rng.normal(0, 0.03, size=(40, 3))
+    returns[5, 1] = np.nan
+    result = run_backtest(weights, returns, fee_rate=0.001)
+    for j in range(3):
+        equity, held, peak = 1.0, 0.0, -np.inf
+        for t in range(40):
+            r = 0.0 if np.isnan(returns[t, j]) else returns[t, j]
+            # 第 t 周收益由上一周收盘后的仓位获得，调仓成本在当周扣除
+            equity *= 1 + held * r - abs(weights[t, j] - held) * 0.001
+            peak = max(peak, equity)
+            held = weights[t, j]
+            assert np.isclose(result["equity"][t, j], equity)
+            assert np.isclose(result["drawdown"][t, j], equity / peak - 1)
+
+
+def test_misaligned_histories_are_stacked_by_date():
+    dates = pd.date_range("2024-01-05", periods=6, freq="W-FRI")
+    base = pd.DataFrame({"投资建议": "买入", "最新收盘": 10.0, "止损建议": np.nan, "周收益": 0.01}, index=dates)
+    result = backtest_stock_histories({"a": base, "b": base.iloc[2:], "c": pd.DataFrame()})
+    assert list(result["equity"].columns) == ["a", "b"]
+    assert len(result["equity"]) == 6
+    # b 在前两周没有数据：不持仓、不产生收益
+    assert result["positions"]["b"].tolist() == [0.0, 0.0, 1.0, 1.0, 1.0, 1.0]
+    assert result["equity"]["b"].iloc[1] == 1.0
+
+
+def test_backtest_replay_universe(replay, replay_root):
+    stocks = backtest_stocks(replay_root[1]["stocks"][:3] + ["999999"])
+    assert list(stocks["summary"]["代码"]) == replay_root[1]["stocks"][:3]
+    assert {"累计收益(%)", "最大回撤(%)", "交易次数", "买入持有收益(%)"} <= set(stocks["summary"].columns)
+    assert (stocks["drawdown"].to_numpy() <= 0).all()
+    portfolio = stocks["portfolio"]
+    # 等权组合：每周收益为各代码策略收益的平均
+    equity = stocks["equity"]
+    weekly = equity / equity.shift(1).fillna(1.0) - 1
+    assert np.allclose(portfolio["周收益"], weekly.mean(axis=1))
+
+    funds = backtest_funds(replay_root[1]["funds"], fee_rate=DEFAULT_FEE_RATE)
+    assert list(funds["summary"]["代码"]) == replay_root[1]["funds"]
+    assert ((funds["positions"] >= 0) & (funds["positions"] <= 1)).all().all()
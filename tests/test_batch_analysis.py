@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+import fetch_orchestrator
+from batch_analysis import read_watchlist, run_batch, completed_codes
+from config import DATA_CONFIG
+
+
+def _read(output, fmt):
+    if fmt == "parquet":
+        return pd.read_parquet(output)
+    return pd.read_csv(output, dtype=str, keep_default_na=False)
+
+
+def test_read_watchlist(tmp_path):
+    path = tmp_path / "watchlist.txt"
+    path.write_text("600000, 1  # 注释\n\n600000 000002\nsh000300\n", encoding="utf-8")
+    assert read_watchlist(str(path)) == ["600000", "000001", "000002", "sh000300"]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_resume_skips_done_and_retries_errors(replay, replay_root, tmp_path, fmt):
+    codes = replay_root[1]["stocks"][:3] + ["999999"]
+    output = str(tmp_path / ("result.csv" if fmt == "csv" else "result.parquet"))
+    first = run_batch(codes, "stock", output, processes=1, chunk_size=2, fmt=fmt)
+    assert (first["完成"], first["出错"], first["跳过"]) == (4, 1, 0)
+    assert completed_codes(output, "stock", fmt) == set(codes[:3])
+
+    # 续跑：已成功的代码跳过，出错的行删除后重新分析
+    before = replay.stats["requests"]
+    second = run_batch(codes, "stock", output, processes=1, chunk_size=2, fmt=fmt)
+    assert (second["跳过"], second["重试"], second["完成"]) == (3, 1, 1)
+    assert replay.stats["requests"] - before <= 3      # 只分析了出错的代码
+    df = _read(output, fmt)
+    assert sorted(df["股票代码"].astype(str)) == sorted(codes)
+
+
+def test_interrupted_csv_tail_is_repaired(replay, replay_root, tmp_path):
+    codes = replay_root[1]["stocks"][:2]
+    output = str(tmp_path / "result.csv")
+    run_batch(codes[:1], "stock", output, processes=1)
+    with open(output, "a", encoding="utf-8") as f:
+        f.write(f"{codes[1]},合成")                       # 写入中途被中断
+    stats = run_batch(codes, "stock", output, processes=1)
+    assert (stats["跳过"], stats["完成"]) == (1, 1)
+    df = _read(output, "csv")
+    assert df["股票代码"].tolist() == codes and (df["错误信息"] == "").all()
+
+
+def test_no_resume_refuses_existing_output(replay, replay_root, tmp_path):
+    output = tmp_path / "result.csv"
+    output.write_text("", encoding="utf-8")
+    with pytest.raises(FileExistsError):
+        run_batch(replay_root[1]["stocks"][:1], "stock", str(output), resume=False)
+
+
+def test_rate_limit_is_split_between_processes(monkeypatch):
+    monkeypatch.setitem(DATA_CONFIG, "rate_limit", 6.0)
+    monkeypatch.setitem(DATA_CONFIG, "rate_burst", 6)
+    monkeypatch.setitem(DATA_CONFIG, "endpoint_limits", {"slow": {"rate_limit": 0.3}, "free": {"rate_limit": 0}})
+    # 只替换本用例创建的接口，不影响其他用例已创建的接口
+    monkeypatch.setattr(fetch_orchestrator, "_endpoints", {})
+    existing = fetch_orchestrator._endpoint("existing")
+    fetch_orchestrator.split_rate_limit(3)
+    assert (DATA_CONFIG["rate_limit"], DATA_CONFIG["rate_burst"]) == (2.0, 2.0)
+    assert fetch_orchestrator._endpoint("slow").bucket.rate == pytest.approx(0.1)
+    assert fetch_orchestrator._endpoint("free").bucket.rate == 0
+    assert fetch_orchestrator._endpoints["existing"].bucket.rate == 2.0 and existing.bucket.burst == 2.0
@@ -0,0 +1,53 @@
+import threading
+import pytest
+import benchmark_store
+from benchmark_store import get_index_daily, get_index_weekly, get_benchmark_stats
+from data_provider import ReplayProvider, set_provider
+
+
+def test_loaded_once_per_session(replay):
+    before = get_benchmark_stats()
+    first = get_index_daily("sh000300")
+    second = get_index_daily("sh000300")
+    assert second is first and len(first) > 0
+    after = get_benchmark_stats()
+    assert after["loads"] - before["loads"] == 1
+    assert after["hits"] - before["hits"] == 1
+    assert replay.stats["requests"] == 1
+
+
+def test_concurrent_callers_share_one_load(replay):
+    replay.latency = 0.2
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_index_daily("sh000300"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert replay.stats["requests"] == 1
+    assert all(df is results[0] for df in results)
+
+
+def test_failed_load_is_retried(replay_root, tmp_path):
+    provider = ReplayProvider(str(tmp_path))   # 空目录：没有指数数据
+    previous = set_provider(provider)
+    benchmark_store.reset_benchmarks()
+    try:
+        before = get_benchmark_stats()
+        assert len(get_index_daily("sh000300")) == 0
+        assert get_benchmark_stats()["failures"] - before["failures"] == 1
+        provider.root = replay_root[0]
+        assert len(get_index_daily("sh000300")) > 0
+    finally:
+        set_provider(previous)
+        benchmark_store.reset_benchmarks()
+
+
+@pytest.mark.parametrize("with_log_ret", [False, True])
+def test_weekly_window(replay, with_log_ret):
+    weekly = get_index_weekly("sh000300", years=3, with_log_ret=with_log_ret)
+    assert list(weekly.columns) == ["close", "ret"] + (["log_ret"] if with_log_ret else [])
+    assert not weekly.isna().any().any()
+    assert (weekly.index.dayofweek == 4).all()
+    span_days = (weekly.index[-1] - weekly.index[0]).days
+    assert 3 * 365 - 14 <= span_days <= 3 * 365
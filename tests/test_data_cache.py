@@ -0,0 +1,169 @@
+import os
+import pandas as pd
+import pytest
+import data_cache
+from data_cache import (save_bars, read_bars, read_meta, get_daily_bars, get_cache_stats, normalize_daily_bars,
+                        _sync_tail)
+from config import DATA_CONFIG
+from synthetic_data import generate_daily_bars
+from conftest import END_DATE
+
+CODE = "600000"
+SOURCE, ADJUST = "em_hist", "qfq"
+
+
+@pytest.fixture(autouse=True)
+def bars_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_cache, "BARS_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def daily():
+    return generate_daily_bars(300, seed=7, end_date=END_DATE, suspend_prob=0.0, listing_prob=0.0)
+
+
+@pytest.fixture
+def hours_freshness(monkeypatch):
+    monkeypatch.setitem(DATA_CONFIG, "freshness", "hours")
+    monkeypatch.setitem(DATA_CONFIG, "cache_hours", 24)
+
+
+def _download(df, source=SOURCE, adjust=ADJUST, calls=None):
+    """模拟数据源：返回 start（含）之后的行"""
+    def download(start):
+        if calls is not None:
+            calls.append(start)
+        part = df if start is None else df[df.index >= pd.to_datetime(start)]
+        return part, source, adjust
+    return download
+
+
+def _delta(before: dict) -> dict:
+    after = get_cache_stats()
+    return {k: after[k] - before[k] for k in ("hits", "misses", "expired", "full")}
+
+
+# ===================== 磁盘缓存 =====================
+def test_normalize_akshare_columns():
+    raw = pd.DataFrame({"日期": ["2024-01-03", "2024-01-02", "2024-01-03"], "收盘": ["10.5", "10.0", "10.6"],
+                        "成交量": [200, 100, 300]})
+    df = normalize_daily_bars(raw)
+    assert list(df.columns) == ["close", "volume"]
+    assert list(df.index.strftime("%Y-%m-%d")) == ["2024-01-02", "2024-01-03"]
+    assert df["close"].tolist() == [10.0, 10.6]
+    assert len(normalize_daily_bars(pd.DataFrame({"x": [1]}))) == 0
+
+
+def test_miss_then_hit(daily, hours_freshness):
+    before = get_cache_stats()
+    calls = []
+    first = get_daily_bars(CODE, [(SOURCE, ADJUST)], _download(daily, calls=calls))
+    second = get_daily_bars(CODE, [(SOURCE, ADJUST)], _download(daily, calls=calls))
+    assert calls == [None]
+    pd.testing.assert_frame_equal(second, first, check_freq=False)
+    assert _delta(before) == {"hits": 1, "misses": 1, "expired": 0, "full": 1}
+    meta = read_meta(SOURCE, CODE, ADJUST)
+    assert meta["rows"] == len(daily) and meta["last_date"] == END_DATE
+
+
+def test_fallback_candidate_is_used(daily, hours_freshness):
+    save_bars("sina_daily", CODE, ADJUST, daily)
+    calls = []
+    df = get_daily_bars(CODE, [(SOURCE, ADJUST), ("sina_daily", ADJUST)], _download(daily, calls=calls))
+    assert calls == [] and len(df) == len(daily)
+
+
+def test_cache_must_cover_start_date(daily, hours_freshness):
+    save_bars(SOURCE, CODE, ADJUST, daily.iloc[-100:], start_date=daily.index[-100].strftime("%Y%m%d"))
+    calls = []
+    get_daily_bars(CODE, [(SOURCE, ADJUST)], _download(daily, calls=calls), start_date="20000101")
+    assert calls == ["20000101"]
+    assert read_meta(SOURCE, CODE, ADJUST)["start"] == "20000101"
+
+
+def test_use_cache_false_bypasses_disk(daily, bars_dir):
+    calls = []
+    df = get_daily_bars(CODE, [(SOURCE, ADJUST)], _download(daily, calls=calls), use_cache=False)
+    assert calls == [None] and len(df) == len(daily)
+    assert os.listdir(bars_dir) == []
+
+
+def test_corrupt_file_is_a_miss(daily, bars_dir, hours_freshness):
+    save_bars(SOURCE, CODE, ADJUST, daily)
+    data_path = next(p for p in bars_dir.iterdir() if p.suffix == ".parquet")
+    data_path.write_bytes(b"not parquet")
+    assert read_bars(SOURCE, CODE, ADJUST) is None
+    calls = []
+    df = get_daily_bars(CODE, [(SOURCE, ADJUST)], _download(daily, calls=calls))
+    assert calls == [None] and len(df) == len(daily)
+
+
+# ===================== 尾部同步 =====================
+def _sync(daily_stored, download):
+    save_bars(SOURCE, CODE, ADJUST, daily_stored)
+    return _sync_tail(CODE, SOURCE, ADJUST, read_meta(SOURCE, CODE, ADJUST), download)
+
+
+def test_tail_merge(daily):
+    calls = []
+    merged, _ = _sync(daily.iloc[:-5], _download(daily, calls=calls))
+    # 从倒数第二根（一定已收盘）开始下载
+    assert calls == [daily.index[-7].strftime("%Y%m%d")]
+    pd.testing.assert_frame_equal(merged, daily, check_freq=False)
+    pd.testing.assert_frame_equal(read_bars(SOURCE, CODE, ADJUST), daily, check_freq=False)
+    assert read_meta(SOURCE, CODE, ADJUST)["last_date"] == END_DATE
+
+
+def test_intraday_last_bar_is_replaced(daily):
+    # 盘中抓取的最后一根与收盘后的价格不同，不应视为复权因子变化
+    intraday = daily.iloc[:-5].copy()
+    intraday.iloc[-1, intraday.columns.get_loc("close")] *= 1.03
+    merged, _ = _sync(intraday, _download(daily))
+    pd.testing.assert_frame_equal(merged, daily, check_freq=False)
+
+
+def test_adjustment_change_needs_full_download(daily):
+    readjusted = daily.assign(close=daily["close"] * 1.05)
+    merged, fetched = _sync(daily.iloc[:-5], _download(readjusted))
+    assert merged is None and fetched[1:] == (SOURCE, ADJUST)
+
+
+def test_source_change_needs_full_download(daily):
+    merged, _ = _sync(daily.iloc[:-5], _download(daily, source="sina_daily"))
+    assert merged is None
+
+
+def test_upstream_unavailable_keeps_stored(daily):
+    save_bars(SOURCE, CODE, ADJUST, daily.iloc[:-5])
+    meta = read_meta(SOURCE, CODE, ADJUST)
+    stored, _ = _sync_tail(CODE, SOURCE, ADJUST, meta, lambda start: (pd.DataFrame(), SOURCE, ADJUST))
+    pd.testing.assert_frame_equal(stored, daily.iloc[:-5], check_freq=False)
+    assert read_meta(SOURCE, CODE, ADJUST)["fetched_at"] == meta["fetched_at"]
+
+
+def test_get_daily_bars_falls_back_to_full_download(daily):
+    save_bars(SOURCE, CODE, ADJUST, daily.iloc[:-5])
+    readjusted = daily.assign(close=daily["close"] * 1.05)
+    calls = []
+    df = get_daily_bars(CODE, [(SOURCE, ADJUST)], _download(readjusted, calls=calls), max_age_hours=0)
+    # 先尝试尾部同步，重叠日价格不一致后全量下载
+    assert calls == [daily.index[-7].strftime("%Y%m%d"), None]
+    pd.testing.assert_frame_equal(df, readjusted, check_freq=False)
+    pd.testing.assert_frame_equal(read_bars(SOURCE, CODE, ADJUST), readjusted, check_freq=False)
+
+
+def test_unranged_download_is_reused(daily):
+    # 基金净值接口忽略起始日期，尾部同步时下载的就是完整走势，合并失败时不再重复下载
+    save_bars(SOURCE, CODE, ADJUST, daily.iloc[:-5])
+    readjusted = daily.assign(close=daily["close"] * 1.05)
+    calls = []
+
+    def download(start):
+        calls.append(start)
+        return readjusted, SOURCE, ADJUST
+
+    df = get_daily_bars(CODE, [(SOURCE, ADJUST)], download, max_age_hours=0, ranged=False)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(df, readjusted, check_freq=False)
+    pd.testing.assert_frame_equal(read_bars(SOURCE, CODE, ADJUST), readjusted, check_freq=False)
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+from data_provider import DataProvider, ReplayProvider, RecordingProvider, ProviderError
+
+
+def test_provider_interface_is_abstract():
+    with pytest.raises(TypeError):
+        DataProvider()
+
+    class Partial(DataProvider):
+        def stock_info(self, stock_code):
+            return {}
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_replay_serves_recorded_data(replay_root):
+    root, universe = replay_root
+    provider = ReplayProvider(root)
+    code = universe["stocks"][0]
+    df, source, adjust = provider.stock_daily(code, "20000101", "20991231")
+    assert len(df) > 0 and source and isinstance(adjust, str)
+    window, _, _ = provider.stock_daily(code, df.index[10].strftime("%Y%m%d"), df.index[20].strftime("%Y%m%d"))
+    assert len(window) == 11
+    assert provider.stock_info(code)
+    assert len(provider.stock_daily("999999", "20000101", "20991231")[0]) == 0
+    assert provider.stats == {"requests": 4, "failures": 0, "missing": 1}
+
+
+def test_injected_failures_are_repeatable(replay_root):
+    root, universe = replay_root
+    code = universe["funds"][0]
+
+    def outcomes(seed):
+        provider = ReplayProvider(root, failure_rate=0.5, seed=seed)
+        result = []
+        for _ in range(30):
+            try:
+                provider.fund_nav(code)
+                result.append(True)
+            except ProviderError:
+                result.append(False)
+        return result, provider.stats["failures"]
+
+    first, failures = outcomes(1)
+    assert outcomes(1) == (first, failures)
+    assert 0 < failures < 30 and failures == first.count(False)
+
+
+def test_recording_round_trip(replay_root, tmp_path):
+    root, universe = replay_root
+    code = universe["stocks"][1]
+    recorder = RecordingProvider(ReplayProvider(root), str(tmp_path))
+    recorded = recorder.stock_daily(code, "20000101", "20991231")
+    info = recorder.stock_info(code)
+    recorder.stock_info("999999")   # 空结果不写入
+
+    replayed = ReplayProvider(str(tmp_path))
+    df, source, adjust = replayed.stock_daily(code, "20000101", "20991231")
+    pd.testing.assert_frame_equal(df, recorded[0], check_freq=False)
+    assert (source, adjust) == recorded[1:]
+    assert replayed.stock_info(code) == info
+    assert replayed.stock_info("999999") == {} and replayed.stats["missing"] == 1
+
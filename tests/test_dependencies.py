@@ -0,0 +1,46 @@
+import ast
+import os
+import subprocess
+import sys
+from run_app import REQUIRED_PACKAGES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 只在测试中使用的依赖
+TEST_PACKAGES = {"pytest"}
+
+
+def _requirements() -> set:
+    with open(os.path.join(ROOT, "requirements.txt"), encoding="utf-8") as f:
+        lines = [line.split("#")[0].strip() for line in f]
+    return {line.split(">")[0].split("=")[0].split("<")[0].strip() for line in lines if line}
+
+
+def _third_party_imports() -> set:
+    local = {name[:-3] for name in os.listdir(ROOT) if name.endswith(".py")}
+    found = set()
+    for name in os.listdir(ROOT):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(ROOT, name), encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                found.update(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0:
+                found.add(node.module.split(".")[0])
+    return found - local - set(sys.stdlib_module_names)
+
+
+def test_startup_check_matches_requirements():
+    assert set(REQUIRED_PACKAGES) == _requirements() - TEST_PACKAGES
+
+
+def test_every_import_is_a_requirement():
+    # akshare 通过 lazy_imports.timed_import 按需导入，不出现在 import 语句中
+    assert _third_party_imports() <= _requirements()
+
+
+def test_analysis_modules_do_not_import_akshare():
+    code = "import sys, advisor_stock, advisor_fund, api_server; print('akshare' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=120)
+    assert out.stdout.strip() == "False", out.stderr
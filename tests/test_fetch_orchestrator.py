@@ -0,0 +1,283 @@
+import asyncio
+import threading
+import time
+import uuid
+import pytest
+import pandas as pd
+import fetch_orchestrator
+import data_provider
+from fetch_orchestrator import (fetch, afetch, fetch_first, FetchError, CircuitOpenError, get_fetch_stats,
+                                get_hedge_stats, _CircuitBreaker, _TokenBucket, _endpoint)
+from config import DATA_CONFIG
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(fetch_orchestrator, "RETRY_BACKOFF", 0.0)
+
+
+def _names(*labels):
+    # 每个用例使用独立的接口名，接口状态（熔断器、耗时样本、统计）不会互相影响
+    suffix = uuid.uuid4().hex[:8]
+    return [f"test_{label}_{suffix}" for label in labels]
+
+
+def _flaky(failures: int, value="ok", error=ConnectionError):
+    """前 failures 次调用抛出 error，之后返回 value"""
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error("上游连接失败")
+        return value
+    return call, calls
+
+
+def _slow(value, seconds=0.5):
+    def call():
+        time.sleep(seconds)
+        return value
+    return call
+
+
+# ===================== 超时与重试 =====================
+def test_transient_failure_is_retried():
+    name, = _names("flaky")
+    call, calls = _flaky(2)
+    assert fetch(name, call, retries=3) == "ok"
+    stats = get_fetch_stats()[name]
+    assert len(calls) == 3
+    assert (stats["calls"], stats["attempts"], stats["retries"], stats["failures"], stats["successes"]) == (1, 3, 2, 2, 1)
+
+
+def test_gives_up_after_all_attempts():
+    name, = _names("down")
+    call, calls = _flaky(10)
+    with pytest.raises(FetchError, match="3次"):
+        fetch(name, call, retries=3)
+    assert len(calls) == 3
+
+
+def test_timeout_does_not_block_caller():
+    name, = _names("hung")
+    start = time.monotonic()
+    with pytest.raises(FetchError, match="超时"):
+        fetch(name, _slow("late", 1.0), timeout=0.05, retries=2)
+    assert time.monotonic() - start < 0.8
+    assert get_fetch_stats()[name]["timeouts"] == 2
+
+
+def test_async_entry_point():
+    name, = _names("async")
+
+    async def main():
+        return await asyncio.gather(*(afetch(name, lambda i=i: i) for i in range(5)))
+
+    assert asyncio.run(main()) == [0, 1, 2, 3, 4]
+    assert get_fetch_stats()[name]["successes"] == 5
+
+
+def test_endpoint_concurrency_is_bounded(monkeypatch):
+    monkeypatch.setitem(DATA_CONFIG, "endpoint_concurrency", 2)
+    name, = _names("bounded")
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def call():
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+        return 1
+
+    threads = [threading.Thread(target=fetch, args=(name, call)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert state["peak"] == 2 and get_fetch_stats()[name]["successes"] == 6
+
+
+def test_deterministic_error_is_not_retried():
+    name, = _names("malformed")
+    call, calls = _flaky(10, error=KeyError)
+    with pytest.raises(FetchError, match="KeyError，不重试"):
+        fetch(name, call, retries=3)
+    stats = get_fetch_stats()[name]
+    assert len(calls) == 1 and stats["deterministic"] == 1
+    assert _endpoint(name).breaker.failures == 0
+
+
+def test_unlimited_rate(monkeypatch):
+    monkeypatch.setitem(DATA_CONFIG, "rate_limit", 0)
+    monkeypatch.setitem(DATA_CONFIG, "rate_burst", 1)
+    name, = _names("unlimited")
+    assert [fetch(name, lambda i=i: i) for i in range(5)] == [0, 1, 2, 3, 4]
+    assert get_fetch_stats()[name]["throttled"] == 0
+    assert asyncio.run(_TokenBucket(None, 1).acquire()) == 0.0
+
+
+# ===================== 熔断器 =====================
+def test_breaker_opens_after_consecutive_failures():
+    breaker = _CircuitBreaker(failures=3, cooldown=60)
+    assert breaker.allow() == (True, False)
+    assert breaker.record(False) is False
+    assert breaker.record(True) is False          # 成功后连续失败计数清零
+    assert [breaker.record(False) for _ in range(3)] == [False, False, True]
+    assert breaker.state == "open"
+    assert breaker.allow() == (False, False)
+
+
+def test_half_open_allows_single_probe():
+    breaker = _CircuitBreaker(failures=1, cooldown=0)
+    breaker.record(False)
+    assert breaker.allow() == (True, True)
+    assert breaker.state == "half_open"
+    assert breaker.allow() == (False, False)
+    # 非探测请求的结果不释放探测名额
+    breaker.record(False)
+    breaker.release(False)
+    assert breaker.probing
+
+
+def test_probe_failure_reopens_and_success_closes():
+    breaker = _CircuitBreaker(failures=1, cooldown=0)
+    breaker.record(False)
+    allowed, probe = breaker.allow()
+    assert breaker.record(False, probe) is True
+    assert breaker.state == "open" and not breaker.probing
+    allowed, probe = breaker.allow()
+    assert allowed and probe
+    breaker.record(True, probe)
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.allow() == (True, False)
+
+
+def test_retries_count_as_one_breaker_failure(monkeypatch):
+    monkeypatch.setitem(DATA_CONFIG, "breaker_failures", 2)
+    name, = _names("retried")
+    call, calls = _flaky(100)
+    with pytest.raises(FetchError):
+        fetch(name, call, retries=3)
+    # 三次尝试只算一次失败的调用，没有熔断
+    assert len(calls) == 3 and _endpoint(name).breaker.failures == 1
+    assert _endpoint(name).breaker.state == "closed"
+    with pytest.raises(FetchError):
+        fetch(name, call, retries=3)
+    assert get_fetch_stats()[name]["breaker_trips"] == 1
+    with pytest.raises(CircuitOpenError):
+        fetch(name, call, retries=3)
+    assert len(calls) == 6
+
+
+def test_failed_probe_is_not_retried(monkeypatch):
+    monkeypatch.setitem(DATA_CONFIG, "breaker_failures", 1)
+    monkeypatch.setitem(DATA_CONFIG, "breaker_cooldown", 0)
+    name, = _names("probe")
+    call, calls = _flaky(100)
+    with pytest.raises(FetchError):
+        fetch(name, call, retries=3)
+    # 冷却结束后的探测请求失败立即重新熔断
+    with pytest.raises(FetchError, match="1次"):
+        fetch(name, call, retries=3)
+    assert len(calls) == 4 and get_fetch_stats()[name]["breaker_trips"] == 2
+
+
+# ===================== 对冲 =====================
+@pytest.fixture
+def hedge_config(monkeypatch):
+    monkeypatch.setitem(DATA_CONFIG, "hedging", True)
+    monkeypatch.setitem(DATA_CONFIG, "hedge_delay", 0.05)
+    monkeypatch.setitem(DATA_CONFIG, "hedge_min_samples", 10 ** 6)
+
+
+def test_slow_primary_is_hedged(hedge_config):
+    primary, backup = _names("primary", "backup")
+    before = get_hedge_stats()
+    assert fetch_first([(primary, _slow("a")), (backup, lambda: "b")]) == (1, "b")
+    after = get_hedge_stats()
+    assert after["hedged"] - before["hedged"] == 1 and after["fallback_wins"] - before["fallback_wins"] == 1
+    assert get_fetch_stats()[backup]["hedge_wins"] == 1
+    assert get_fetch_stats()[primary]["hedge_cancelled"] == 1
+
+
+def test_no_hedge_waits_for_primary(hedge_config):
+    primary, backup = _names("primary", "backup")
+    assert fetch_first([(primary, _slow("a", 0.2)), (backup, lambda: "b")], hedge=False) == (0, "a")
+    assert backup not in get_fetch_stats()
+
+
+def test_invalid_result_tries_next(hedge_config):
+    primary, backup = _names("primary", "backup")
+    assert fetch_first([(primary, lambda: []), (backup, lambda: [1])], hedge=False) == (1, [1])
+    assert get_fetch_stats()[primary]["invalid"] == 1
+
+
+def test_all_failed(hedge_config):
+    primary, backup = _names("primary", "backup")
+    with pytest.raises(FetchError, match="所有数据源均失败"):
+        fetch_first([(primary, lambda: []), (backup, lambda: None)])
+
+
+def test_hedged_probe_is_released(hedge_config):
+    primary, backup = _names("primary", "backup")
+    breaker = _endpoint(primary).breaker
+    breaker.state, breaker.opened_at = "open", time.monotonic() - breaker.cooldown
+    assert fetch_first([(primary, _slow("a")), (backup, lambda: "b")], hedge=True) == (1, "b")
+    # 被取消的探测请求释放名额，下一次请求可以继续探测
+    deadline = time.monotonic() + 2
+    while breaker.probing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert breaker.state == "half_open" and not breaker.probing
+
+
+class _FakeAkshare:
+    """stock_daily 用到的两个 akshare 接口：东财前复权慢，新浪前复权失败，新浪不复权立即返回"""
+
+    def __init__(self, em_seconds=0.3, sina_qfq_ok=False):
+        self.em_seconds = em_seconds
+        self.sina_qfq_ok = sina_qfq_ok
+        self.calls = []
+
+    @staticmethod
+    def _bars(close):
+        return pd.DataFrame({"date": ["2024-06-27", "2024-06-28"], "close": [close, close], "volume": [1, 1]})
+
+    def stock_zh_a_hist(self, symbol, period, start_date, end_date, adjust):
+        self.calls.append(("em", adjust))
+        time.sleep(self.em_seconds)
+        return self._bars(10.0)
+
+    def stock_zh_a_daily(self, symbol, start_date, end_date, adjust=""):
+        self.calls.append(("sina", adjust))
+        if adjust == "qfq" and not self.sina_qfq_ok:
+            return pd.DataFrame()
+        return self._bars(20.0 if adjust else 30.0)
+
+
+def test_unadjusted_source_does_not_race_adjusted(hedge_config, monkeypatch):
+    fake = _FakeAkshare()
+    monkeypatch.setattr(data_provider, "_akshare", lambda: fake)
+    df, source, adjust = data_provider.AkshareProvider().stock_daily("600000", "20240601", "20240628")
+    # 新浪前复权无效后不启动不复权数据源，等待东财前复权
+    assert (source, adjust) == ("em_hist", "qfq") and df["close"].iloc[-1] == 10.0
+    assert ("sina", "") not in fake.calls
+
+
+def test_unadjusted_is_the_last_resort(hedge_config, monkeypatch):
+    fake = _FakeAkshare(em_seconds=0.0)
+    fake.stock_zh_a_hist = lambda **kwargs: pd.DataFrame()
+    monkeypatch.setattr(data_provider, "_akshare", lambda: fake)
+    df, source, adjust = data_provider.AkshareProvider().stock_daily("600000", "20240601", "20240628")
+    assert (source, adjust) == ("sina_daily", "") and df["close"].iloc[-1] == 30.0
+    assert fake.calls == [("sina", "qfq"), ("sina", "")]
+
+
+def test_adjusted_backup_hedges_slow_primary(hedge_config, monkeypatch):
+    fake = _FakeAkshare(sina_qfq_ok=True)
+    monkeypatch.setattr(data_provider, "_akshare", lambda: fake)
+    _, source, adjust = data_provider.AkshareProvider().stock_daily("600000", "20240601", "20240628")
+    assert (source, adjust) == ("sina_daily", "qfq")
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+import pytest
+import advisor_fund
+import benchmark_store
+from synthetic_data import generate_fund_nav
+from advisor_fund import (build_fund_weekly, fund_signal_history, _history_row_results, judge_stage_enhanced,
+                          relative_strength_enhanced, risk_assessment, analyze_fund_enhanced, analyze_fund_history,
+                          fetch_fund_daily_nav)
+from conftest import N_DAYS, END_DATE
+
+
+def _approx_dict(actual: dict, expected: dict, path: str = ""):
+    assert actual.keys() == expected.keys(), path
+    for key, value in expected.items():
+        if isinstance(value, dict):
+            _approx_dict(actual[key], value, f"{path}/{key}")
+        elif isinstance(value, str):
+            assert actual[key] == value, f"{path}/{key}"
+        else:
+            # 结果中的数值已四舍五入，允许最后一位的舍入差异
+            assert actual[key] == pytest.approx(value, abs=0.011, nan_ok=True), f"{path}/{key}"
+
+
+def test_history_rows_match_truncated_analysis(index_weekly):
+    fund_weekly = build_fund_weekly(generate_fund_nav(N_DAYS, seed=5, end_date=END_DATE))
+    history = fund_signal_history(fund_weekly, index_weekly)
+    assert len(history) == len(fund_weekly)
+    rows = sorted(set(range(0, len(fund_weekly), 13)) | {19, 29, 51, len(fund_weekly) - 1})
+    for r in rows:
+        truncated = fund_weekly.iloc[:r + 1]
+        stage, rs, risk = _history_row_results(history.iloc[r])
+        _approx_dict(stage, judge_stage_enhanced(truncated))
+        _approx_dict(rs, relative_strength_enhanced(truncated, index_weekly))
+        _approx_dict(risk, risk_assessment(truncated))
+
+
+def _freeze_now(monkeypatch, now: datetime):
+    class Frozen(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    monkeypatch.setattr(advisor_fund, "datetime", Frozen)
+    monkeypatch.setattr(benchmark_store, "datetime", Frozen)
+
+
+def test_as_of_matches_live_analysis_on_that_day(replay, replay_root, monkeypatch):
+    code = replay_root[1]["funds"][0]
+    history = analyze_fund_history(code)
+    # 约 280 周净值，后面的周分析窗口只有最近 3 年
+    assert len(history) > 52 * 3 + 52
+    daily = fetch_fund_daily_nav(code)
+    week_last = daily.index.to_series().resample("W-FRI").last().reindex(history.index)
+    labels = list(history.index[::17]) + [history.index[-1]]
+    for label in labels:
+        # 当周最后一个净值日收盘后做最新分析，应与回看这一周的结果一致
+        _freeze_now(monkeypatch, week_last[label].to_pydatetime() + timedelta(hours=20))
+        live = analyze_fund_enhanced(code, timing=False)
+        back = analyze_fund_enhanced(code, as_of=label, timing=False)
+        assert "错误" not in live and "错误" not in back
+        for section in ("最新数据", "趋势分析", "相对强度分析", "风险评估", "投资建议"):
+            _approx_dict(back[section], live[section], f"{label.date()}/{section}")
+
+
+def test_history_benchmark_covers_fund(replay, replay_root):
+    code = replay_root[1]["funds"][0]
+    history = analyze_fund_history(code)
+    index_daily = benchmark_store.get_index_daily("sh000300")
+    # 净值历史超过 BENCHMARK_YEARS 时按需加载更长的指数
+    assert index_daily.index[0] <= fetch_fund_daily_nav(code).index[0] + timedelta(days=7)
+    assert history["rs_ready"].iloc[-1]
@@ -0,0 +1,70 @@
+import pickle
+import time
+import pytest
+from concurrent.futures import CancelledError
+from data_provider import ReplayProvider
+from job_queue import JobQueue, DONE, CANCELLED, FINISHED
+
+
+@pytest.fixture(scope="module")
+def queue(replay_root):
+    """单个工作进程的任务队列，工作进程使用回放数据源（每次请求延迟 0.2 秒）"""
+    queue = JobQueue(max_workers=1, provider=ReplayProvider(replay_root[0], latency=0.2))
+    yield queue
+    queue.shutdown()
+
+
+def _wait_for(queue, job_id, statuses, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = queue.status(job_id)
+        if status["status"] in statuses:
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"任务 {job_id} 未进入 {statuses}: {status}")
+
+
+def test_replay_provider_is_picklable(replay_root):
+    provider = pickle.loads(pickle.dumps(ReplayProvider(replay_root[0], latency=0.1)))
+    assert provider.latency == 0.1 and provider.stock_info(replay_root[1]["stocks"][0])
+
+
+def test_duplicate_submissions_share_one_job(queue, replay_root):
+    code = replay_root[1]["stocks"][0]
+    before = queue.stats()
+    first = queue.submit("股票分析", code)
+    assert queue.submit("stock", f" {code} ") == first
+    assert queue.submit("stock", code, timing=True) != first       # 参数不同是不同的任务
+    result = queue.result(first, timeout=60)
+    assert result["股票代码"] == code and "错误" not in result
+    status = queue.wait(first, poll_interval=0.05)
+    assert status["status"] == DONE and status["progress"] == 1.0
+    after = queue.stats()
+    assert after["submitted"] - before["submitted"] == 2 and after["deduplicated"] - before["deduplicated"] == 1
+    # 任务结束后同一代码重新提交会再次计算
+    assert queue.submit("stock", code) != first
+
+
+def test_cancel_queued_and_running_jobs(queue, replay_root):
+    running_code, queued_code = replay_root[1]["stocks"][1], replay_root[1]["stocks"][2]
+    running = queue.submit("stock", running_code)
+    _wait_for(queue, running, ("running",) + FINISHED)
+    queued = queue.submit("stock", queued_code)     # 唯一的工作进程被占用，排队等待
+    assert queue.cancel(queued)
+    assert queue.status(queued)["status"] == CANCELLED
+    with pytest.raises(CancelledError):
+        queue.result(queued)
+    # 取消后同一代码可以重新提交，得到新的任务
+    resubmitted = queue.submit("stock", queued_code)
+    assert resubmitted != queued
+
+    # 运行中的任务标记为已取消，工作进程的结果被丢弃
+    assert queue.cancel(running)
+    assert queue.result(resubmitted, timeout=60)["股票代码"] == queued_code   # 只有一个工作进程，此前的任务已结束
+    assert queue.status(running)["status"] == CANCELLED
+    assert not queue.cancel(running)
+
+
+def test_unknown_kind_is_rejected(queue):
+    with pytest.raises(ValueError, match="未知的分析类型"):
+        queue.submit("bond", "000001")
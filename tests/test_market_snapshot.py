@@ -0,0 +1,56 @@
+import threading
+import pandas as pd
+import pytest
+from market_snapshot import get_snapshot, lookup, lookup_many, snapshot_stock_info, get_snapshot_stats, reset_snapshot
+from data_provider import ReplayProvider, save_replay_bars, set_provider
+
+
+@pytest.fixture
+def spot_provider(tmp_path):
+    spot = pd.DataFrame({"代码": [600000, 1, 1], "名称": ["浦发银行", "平安银行", "重复"],
+                         "最新价": [8.1, 10.2, 0.0], "涨跌幅": [0.5, -1.2, 0.0]})
+    save_replay_bars(str(tmp_path), "market_snapshot", "spot", spot, "em_spot")
+    provider = ReplayProvider(str(tmp_path), latency=0.1)
+    previous = set_provider(provider)
+    reset_snapshot()
+    yield provider
+    set_provider(previous)
+    reset_snapshot()
+
+
+def test_lookup_by_code(spot_provider):
+    assert lookup("000001")["名称"] == "平安银行"     # 代码补齐为 6 位，重复代码保留第一条
+    assert lookup(600000)["最新价"] == 8.1
+    assert set(lookup_many(["600000", "000001", "999999"])) == {"600000", "000001"}
+    assert snapshot_stock_info("600000")["股票简称"] == "浦发银行"
+    assert snapshot_stock_info("999999") == {}
+    assert spot_provider.stats["requests"] == 1
+
+
+def test_concurrent_refresh_downloads_once(spot_provider):
+    before = get_snapshot_stats()
+    threads = [threading.Thread(target=get_snapshot) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    after = get_snapshot_stats()
+    assert spot_provider.stats["requests"] == 1
+    assert after["loads"] - before["loads"] == 1
+    assert after["waits"] - before["waits"] == 5 and after["codes"] == 2
+
+
+def test_expired_snapshot_is_reloaded(spot_provider):
+    get_snapshot()
+    get_snapshot(max_age_seconds=0)
+    assert spot_provider.stats["requests"] == 2
+
+
+def test_failure_backs_off(spot_provider, tmp_path):
+    spot_provider.root = str(tmp_path / "empty")
+    assert get_snapshot() == {}
+    assert get_snapshot() == {}     # 重试间隔内不再下载
+    assert spot_provider.stats["requests"] == 1 and get_snapshot_stats()["failures"] >= 1
+    spot_provider.root = str(tmp_path)
+    reset_snapshot()
+    assert len(get_snapshot()) == 2
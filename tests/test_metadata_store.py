@@ -0,0 +1,55 @@
+import argparse
+import pandas as pd
+import pytest
+import metadata_store
+from metadata_store import get_info, get_many, put_info, preload_listings, clear_metadata, get_metadata_stats
+from data_provider import ReplayProvider, save_replay_bars, set_provider
+from run_app import run_precompute
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    clear_metadata()
+    yield
+    clear_metadata()
+
+
+@pytest.fixture
+def listing_provider(tmp_path):
+    save_replay_bars(str(tmp_path), "listing", "stock",
+                     pd.DataFrame({"code": [600000, 1], "name": ["浦发银行", "平安银行"]}), "stock_code_name")
+    save_replay_bars(str(tmp_path), "listing", "fund",
+                     pd.DataFrame({"基金代码": ["110011"], "基金简称": ["易方达中小盘"], "基金类型": ["混合型"]}),
+                     "fund_name_em")
+    provider = ReplayProvider(str(tmp_path))
+    previous = set_provider(provider)
+    yield provider
+    set_provider(previous)
+
+
+def test_full_info_round_trip_and_expiry():
+    put_info("stock", "600000", {"股票简称": "浦发银行", "总市值": 1.0})
+    assert get_info("stock", "600000")["股票简称"] == "浦发银行"
+    assert get_info("stock", "600000", max_age_days=-1) is None
+    assert get_info("fund", "600000") is None
+    assert set(get_many("stock", ["600000", "600001", "600000"])) == {"600000"}
+
+
+def test_listing_is_a_fallback_only(listing_provider):
+    put_info("stock", "600000", {"股票简称": "浦发银行(完整)"})
+    assert preload_listings() == {"stock": 2, "fund": 1}
+    # 列表信息不覆盖完整信息，只在 full=False 时命中
+    assert get_info("stock", "600000")["股票简称"] == "浦发银行(完整)"
+    assert get_info("stock", "000001") is None
+    assert get_info("stock", "000001", full=False)["股票简称"] == "平安银行"
+    assert get_info("fund", "110011", full=False)["基金类型"] == "混合型"
+    assert get_metadata_stats()["rows"] == {"stock/full": 1, "stock/listing": 1, "fund/listing": 1}
+
+
+def test_precompute_command_preloads_listings(replay, replay_root, tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(metadata_store, "preload_listings", lambda kinds: calls.append(kinds) or {k: 0 for k in kinds})
+    watchlist = tmp_path / "watchlist.txt"
+    watchlist.write_text("\n".join(replay_root[1]["stocks"][:2]), encoding="utf-8")
+    run_precompute(argparse.Namespace(watchlist=str(watchlist), type="stock", processes=1, force=False))
+    assert calls == [("stock",)]
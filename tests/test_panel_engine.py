@@ -0,0 +1,69 @@
+import pytest
+from synthetic_data import generate_universe
+from panel_engine import build_weekly_panel, align_index_returns, compute_panel, latest_indicators
+from advisor_stock import (build_stock_weekly, judge_stage, relative_strength, detect_breakout, stock_params,
+                           stock_signal_history)
+from conftest import N_DAYS, END_DATE
+
+
+def _scalar_indicators(weekly, index_weekly, p) -> dict:
+    """逐只股票的指标（与 advisor_stock._analyze_stock_data 相同的调用方式）"""
+    breakout = bool(detect_breakout(weekly, p["breakout_lookback"], p["breakout_threshold"]))
+    volume_ok = True
+    if breakout:
+        recent = weekly.iloc[-(p["breakout_lookback"] + 1):-1]
+        volume_ok = bool(weekly.iloc[-1]["volume"] > recent["volume"].mean() * p["volume_multiplier"])
+    return {
+        "stage": judge_stage(weekly),
+        "rs": relative_strength(weekly, index_weekly, p["rs_lookback"]),
+        "breakout": breakout,
+        "volume_ok": volume_ok,
+        "support": float(weekly.iloc[-1]["support"]),
+        "resistance": float(weekly.iloc[-1]["resistance"]),
+    }
+
+
+@pytest.fixture(scope="module")
+def universe():
+    # 含停牌、晚上市的代码；短历史使部分代码的周线为空
+    bars = generate_universe(60, N_DAYS, seed=3, end_date=END_DATE)
+    bars.update({f"short{code}": df for code, df in generate_universe(3, 120, seed=4, end_date=END_DATE).items()})
+    return bars
+
+
+def test_panel_matches_per_stock(universe, index_weekly):
+    p = stock_params()
+    dates, codes, close, volume = build_weekly_panel(universe)
+    latest = latest_indicators(compute_panel(close, volume, align_index_returns(index_weekly, dates),
+                                             p["rs_lookback"], p["breakout_lookback"], p["breakout_threshold"],
+                                             p["volume_multiplier"]))
+    checked = 0
+    for j, code in enumerate(codes):
+        weekly = build_stock_weekly(universe[code])
+        assert bool(latest["valid"][j]) == (len(weekly) > 0), code
+        if len(weekly) == 0:
+            continue
+        expected = _scalar_indicators(weekly, index_weekly, p)
+        assert latest["stage"][j] == expected["stage"], code
+        assert latest["rs"][j] == pytest.approx(expected["rs"], abs=1e-12), code
+        assert bool(latest["breakout"][j]) == expected["breakout"], code
+        assert bool(latest["volume_ok"][j]) == expected["volume_ok"], code
+        assert latest["support"][j] == pytest.approx(expected["support"])
+        assert latest["resistance"][j] == pytest.approx(expected["resistance"])
+        checked += 1
+    assert checked >= 50
+
+
+def test_signal_history_matches_truncated_analysis(universe, index_weekly):
+    p = stock_params()
+    daily = universe[next(iter(universe))]
+    history = stock_signal_history(daily, index_weekly)
+    weekly = build_stock_weekly(daily)
+    assert list(history.index) == list(weekly.index)
+    for date in list(weekly.index[::17]) + [weekly.index[-1]]:
+        expected = _scalar_indicators(build_stock_weekly(daily.loc[:date]), index_weekly, p)
+        row = history.loc[date]
+        assert row["阶段"] == expected["stage"], date
+        assert row["相对强度"] == pytest.approx(expected["rs"], abs=1e-12), date
+        assert bool(row["是否突破"]) == expected["breakout"], date
+        assert bool(row["量能是否放大"]) == expected["volume_ok"], date
@@ -0,0 +1,47 @@
+import pytest
+from synthetic_data import generate_universe
+from advisor_stock import stock_signal_history, stock_params
+from param_sweep import parameter_grid, prepare_sweep, evaluate_params, sweep_panel
+from conftest import N_DAYS, END_DATE
+
+GRID = {"rs_threshold": [0.0, 0.01], "volume_multiplier": [1.2, 2.0]}
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return generate_universe(8, N_DAYS, seed=9, end_date=END_DATE)
+
+
+@pytest.fixture(scope="module")
+def base(bars, index_weekly):
+    return prepare_sweep(bars, index_weekly)
+
+
+def test_parameter_grid_fills_defaults():
+    combos = parameter_grid(GRID)
+    assert len(combos) == 4
+    defaults = stock_params()
+    for combo in combos:
+        assert combo.keys() == defaults.keys()
+        assert combo["rs_lookback"] == defaults["rs_lookback"]
+    assert {(c["rs_threshold"], c["volume_multiplier"]) for c in combos} == {(0.0, 1.2), (0.0, 2.0), (0.01, 1.2), (0.01, 2.0)}
+
+
+def test_buy_signals_match_per_stock_history(bars, base, index_weekly):
+    for params in parameter_grid(GRID):
+        expected = sum(int((stock_signal_history(daily, index_weekly, params)["投资建议"] == "买入").sum())
+                       for daily in bars.values())
+        assert evaluate_params(base, params)["买入信号数"] == expected
+
+
+def test_process_pool_matches_sequential(base):
+    sequential = sweep_panel(base, GRID, max_workers=1)
+    pooled = sweep_panel(base, GRID, max_workers=2)
+    assert len(sequential) == 4
+    assert sequential["组合夏普"].is_monotonic_decreasing
+    assert sequential.to_dict("records") == pooled.to_dict("records")
+
+
+def test_empty_input_is_rejected(index_weekly):
+    with pytest.raises(ValueError):
+        prepare_sweep({"600000": None}, index_weekly)
@@ -0,0 +1,42 @@
+import json
+import data_provider
+from perf_benchmark import run_benchmarks, compare_results, save_results, main, MIN_REGRESSION_SECONDS
+
+
+def _report(*records):
+    return {"meta": {}, "results": [{"name": n, "scale": s, "seconds": sec, "peak_mb": 1.0} for n, s, sec in records]}
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = _report(("a", 10, 1.0), ("b", 10, 0.001), ("c", 10, 1.0), ("gone", 10, 1.0))
+    current = _report(("a", 10, 1.5), ("b", 10, 0.002), ("c", 10, 1.1), ("new", 10, 1.0))
+    diff = compare_results(baseline, current).set_index("用例")
+    assert list(diff.index) == ["a", "b", "c"]
+    assert diff.loc["a", "回退"]
+    # 相对增幅超过容差但绝对增幅不足 MIN_REGRESSION_SECONDS，视为计时抖动
+    assert 0.001 < MIN_REGRESSION_SECONDS and not diff.loc["b", "回退"]
+    assert not diff.loc["c", "回退"]
+    assert diff.loc["a", "耗时比"] == 1.5
+
+
+def test_run_small_benchmark_restores_provider(replay):
+    report = run_benchmarks([1, 3], repeat=1, n_days=300, cases=["judge_stage_enhanced", "analyze_stock"],
+                            verbose=False)
+    assert data_provider.get_provider() is replay
+    assert {(r["name"], r["scale"]) for r in report["results"]} == \
+        {("judge_stage_enhanced", 1), ("judge_stage_enhanced", 3), ("analyze_stock", 1), ("analyze_stock", 3)}
+    for record in report["results"]:
+        assert record["seconds"] > 0 and record["peak_mb"] >= 0
+    assert report["meta"]["n_days"] == 300
+
+
+def test_main_returns_nonzero_on_regression(tmp_path):
+    args = ["--scales", "10", "--repeat", "1", "--days", "300", "--cases", "judge_stage_enhanced"]
+    first = tmp_path / "first.json"
+    assert main(args + ["--output", str(first)]) == 0
+    report = json.loads(first.read_text(encoding="utf-8"))
+    for record in report["results"]:
+        assert record["seconds"] > 2 * MIN_REGRESSION_SECONDS
+        record["seconds"] = record["seconds"] / 10
+    save_results(report, str(tmp_path / "fast.json"))
+    assert main(args + ["--output", str(tmp_path / "second.json"), "--baseline", str(tmp_path / "fast.json")]) == 1
@@ -0,0 +1,56 @@
+import math
+import precompute_store
+from precompute_store import (get_many, get_result, put_many, stored_codes, prune, precompute, param_version,
+                              session_for, get_store_stats)
+
+
+def test_results_are_keyed_by_session_and_version():
+    put_many("stock", {"900001": {"v": 1, "nan": float("nan")}}, session="2000-01-04", version="a")
+    put_many("stock", {"900001": {"v": 2}}, session="2000-01-05", version="a")
+    result = get_result("股票分析", "900001", session="2000-01-04", version="a")
+    assert result["v"] == 1 and math.isnan(result["nan"])
+    assert get_many("stock", ["900001", "900002"], session="2000-01-05", version="a") == {"900001": {"v": 2}}
+    assert get_result("stock", "900001", session="2000-01-05", version="b") is None
+    assert get_many("bond", ["900001"]) == {}
+    assert stored_codes("stock", session="2000-01-04", version="a") == {"900001"}
+
+
+def test_param_version_follows_analysis_version(monkeypatch):
+    version = param_version("stock")
+    assert param_version("股票分析") == version and param_version("fund") != version
+    monkeypatch.setattr(precompute_store, "ANALYSIS_VERSION", precompute_store.ANALYSIS_VERSION + 1)
+    assert param_version("stock") != version
+
+
+def test_precompute_writes_skips_and_forces(replay, replay_root):
+    codes = replay_root[1]["funds"][:2]
+    first = precompute("fund", codes + ["999999"], processes=1)
+    assert (first["写入"], first["出错"], first["跳过"]) == (2, 1, 0)
+    assert set(get_many("fund", codes)) == set(codes)
+    assert first["交易日"] == session_for("fund")
+
+    before = replay.stats["requests"]
+    second = precompute("fund", codes, processes=1)
+    assert (second["跳过"], second["写入"]) == (2, 0) and replay.stats["requests"] == before
+    forced = precompute("fund", codes, processes=1, force=True)
+    assert forced["写入"] == 2 and replay.stats["requests"] > before
+
+
+def test_stale_data_is_not_written(replay, replay_root, monkeypatch):
+    code = replay_root[1]["stocks"][0]
+    # 数据只到上一个交易日之前：不写入，留待数据更新后重跑
+    monkeypatch.setattr(precompute_store, "session_for", lambda kind: "2999-01-04")
+    stats = precompute("stock", [code], processes=1)
+    assert (stats["写入"], stats["未更新"]) == (0, 1)
+    assert get_result("stock", code, session="2999-01-04") is None
+
+
+def test_prune_keeps_recent_sessions():
+    for session in ("2001-01-02", "2001-01-03", "2001-01-04"):
+        put_many("fund", {"900003": {"v": session}}, session=session, version="prune")
+    # 无论库中是否已有更新的交易日，最早的一个都超出保留范围
+    assert prune(keep_sessions=2) >= 1
+    assert get_many("fund", ["900003"], session="2001-01-02", version="prune") == {}
+    assert get_many("fund", ["900003"], session="2001-01-04", version="prune") == {"900003": {"v": "2001-01-04"}}
+    stats = get_store_stats()
+    assert "fund/2001-01-04" in stats["rows"] and 0 <= stats["hit_rate"] <= 1
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from regression_kernels import rolling_linregress, last_window_linregress
+
+
+def _reference(window_values: np.ndarray) -> tuple:
+    """逐窗口的参考实现：np.polyfit 斜率、相对均值的标准化斜率、相关系数平方"""
+    x = np.arange(len(window_values), dtype=float)
+    slope = np.polyfit(x, window_values, 1)[0]
+    r2 = np.corrcoef(x, window_values)[0, 1] ** 2 if np.std(window_values) > 0 else 0.0
+    return slope, slope / window_values.mean() * 100, r2
+
+
+@pytest.mark.parametrize("window", [2, 5, 10, 30])
+def test_rolling_matches_polyfit(window):
+    rng = np.random.default_rng(window)
+    values = 50 + np.cumsum(rng.normal(0, 1, 300))
+    slope, slope_norm, r2 = rolling_linregress(values, window)
+    assert np.isnan(slope[:window - 1]).all()
+    for end in range(window - 1, len(values)):
+        expected = _reference(values[end - window + 1:end + 1])
+        np.testing.assert_allclose((slope[end], slope_norm[end], r2[end]), expected, rtol=1e-7, atol=1e-9)
+
+
+def test_windows_with_nan_are_nan():
+    values = np.arange(40, dtype=float) + 1
+    values[15] = np.nan
+    slope, _, r2 = rolling_linregress(values, 10)
+    assert np.isnan(slope[15:25]).all() and np.isnan(r2[15:25]).all()
+    np.testing.assert_allclose(slope[25:], 1.0)
+    np.testing.assert_allclose(slope[9:15], 1.0)
+
+
+def test_flat_window_has_zero_slope_and_r2():
+    values = np.concatenate([np.linspace(1, 2, 20), np.full(15, 2.0)])
+    slope, slope_norm, r2 = rolling_linregress(values, 10)
+    assert (slope[-6:] == 0).all() and (slope_norm[-6:] == 0).all() and (r2[-6:] == 0).all()
+
+
+def test_columns_match_one_dimensional():
+    rng = np.random.default_rng(1)
+    panel = 10 + np.cumsum(rng.normal(0, 1, (120, 4)), axis=0)
+    panel[:17, 2] = np.nan
+    slope, slope_norm, r2 = rolling_linregress(panel, 10)
+    for j in range(panel.shape[1]):
+        column = rolling_linregress(panel[:, j], 10)
+        np.testing.assert_allclose(slope[:, j], column[0], rtol=1e-9, equal_nan=True)
+        np.testing.assert_allclose(slope_norm[:, j], column[1], rtol=1e-9, equal_nan=True)
+        np.testing.assert_allclose(r2[:, j], column[2], rtol=1e-9, equal_nan=True)
+
+
+def test_last_window():
+    rng = np.random.default_rng(2)
+    values = 20 + np.cumsum(rng.normal(0, 1, 60))
+    np.testing.assert_allclose(last_window_linregress(values, 10), _reference(values[-10:]), rtol=1e-7)
+    assert all(np.isnan(v) for v in last_window_linregress(values[:5], 10))
@@ -0,0 +1,107 @@
+import threading
+from result_cache import ResultCache
+
+
+class Session:
+    """可手动切换的交易日"""
+
+    def __init__(self):
+        self.value = "2024-06-27"
+
+    def __call__(self, kind):
+        return self.value
+
+
+def _counting(results):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return results[len(calls) - 1]
+    return compute, calls
+
+
+def test_miss_then_hit():
+    cache = ResultCache(session_func=Session(), store_func=None)
+    compute, calls = _counting([{"v": 1}])
+    assert cache.get("股票分析", "600000", compute) == ({"v": 1}, "miss", None)
+    assert cache.get("股票分析", "600000", compute) == ({"v": 1}, "hit", None)
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_stale_result_is_returned_while_refreshing():
+    session = Session()
+    cache = ResultCache(session_func=session, store_func=None)
+    release = threading.Event()
+    results = iter([{"v": "old"}, {"v": "new"}])
+
+    def compute():
+        result = next(results)
+        if result["v"] == "new":
+            release.wait(5)
+        return result
+
+    cache.get("股票分析", "600000", compute)
+    session.value = "2024-06-28"
+    # 交易日切换后立即返回旧结果，后台刷新完成前不阻塞
+    result, status, future = cache.get("股票分析", "600000", compute)
+    assert (result, status) == ({"v": "old"}, "stale") and not future.done()
+    # 刷新进行中再次查询：仍返回旧结果，并共用同一个刷新
+    again = cache.lookup("股票分析", "600000", compute)
+    assert again[1] == "stale" and again[2] is future
+    release.set()
+    assert future.result(5) == {"v": "new"}
+    assert cache.get("股票分析", "600000", compute)[:2] == ({"v": "new"}, "hit")
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = ResultCache(session_func=Session(), store_func=None, max_workers=4)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"v": 1}
+
+    first = cache.lookup("基金分析", "100000", compute)
+    started.wait(5)
+    second = cache.lookup("基金分析", "100000", compute)
+    assert first[1] == second[1] == "miss" and second[2] is first[2]
+    release.set()
+    assert first[2].result(5) == {"v": 1} and len(calls) == 1
+    assert cache.stats()["waits"] == 1
+
+
+def test_errors_are_not_cached():
+    cache = ResultCache(session_func=Session(), store_func=None)
+    compute, calls = _counting([{"错误信息": "分析出错"}, {"错误信息": ""}])
+    assert cache.get("股票分析", "600000", compute)[0] == {"错误信息": "分析出错"}
+    assert cache.get("股票分析", "600000", compute)[:2] == ({"错误信息": ""}, "miss")
+    assert len(calls) == 2 and cache.stats()["errors"] == 1
+    assert not cache.put("股票分析", "600001", {"错误": "无数据"})
+
+
+def test_store_is_read_before_computing():
+    stored = {("股票分析", "600000", "2024-06-27"): {"v": "stored"}}
+    cache = ResultCache(session_func=Session(), store_func=lambda kind, code, session: stored.get((kind, code, session)))
+    compute, calls = _counting([{"v": "computed"}, {"v": "computed"}])
+    assert cache.get("股票分析", "600000", compute)[:2] == ({"v": "stored"}, "hit")
+    assert cache.get("股票分析", "600001", compute)[:2] == ({"v": "computed"}, "miss")
+    assert len(calls) == 1 and cache.stats()["store_hits"] == 1
+
+
+def test_lru_eviction_and_peek():
+    cache = ResultCache(max_entries=2, session_func=Session(), store_func=None)
+    for code in ("a", "b"):
+        cache.put("股票分析", code, {"v": code})
+    cache.peek("股票分析", "a")          # a 变为最近使用
+    cache.put("股票分析", "c", {"v": "c"})
+    assert cache.peek("股票分析", "b") == (None, "miss")
+    assert cache.peek("股票分析", "a") == ({"v": "a"}, "hit")
+    assert cache.entry_info("股票分析", "c")["session"] == "2024-06-27"
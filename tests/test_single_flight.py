@@ -0,0 +1,101 @@
+import threading
+import time
+import uuid
+from single_flight import SingleFlight, single_flight, get_single_flight_stats
+from advisor_stock import analyze_stock
+
+
+def _blocking(value=None, error=None):
+    """阻塞到 release 被设置后返回 value（或抛出 error）；started 表示已开始执行"""
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        if error is not None:
+            raise error
+        return value
+    return fn, started, release, calls
+
+
+def _call_in_threads(group, key, fn, started, n):
+    """先由一个线程开始执行，执行期间再启动 n - 1 个线程加入，返回 (线程列表, 结果列表, 异常列表)"""
+    results, errors = [], []
+
+    def target():
+        try:
+            results.append(group.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    deadline = time.monotonic() + 5
+    while group.stats()["coalesced"] < n - 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return threads, results, errors
+
+
+def _join(threads):
+    for t in threads:
+        t.join(5)
+
+
+def test_concurrent_calls_share_one_execution():
+    group = SingleFlight(f"test_{uuid.uuid4().hex[:8]}")
+    fn, started, release, calls = _blocking(value={"v": 1})
+    threads, results, errors = _call_in_threads(group, "600000", fn, started, 5)
+    release.set()
+    _join(threads)
+    assert len(calls) == 1 and not errors
+    assert len(results) == 5 and all(r is results[0] for r in results)
+    stats = group.stats()
+    assert (stats["calls"], stats["executions"], stats["coalesced"], stats["inflight"]) == (5, 1, 4, 0)
+    assert stats["coalesced_rate"] == 0.8
+
+
+def test_errors_are_shared_but_not_kept():
+    group = SingleFlight(f"test_{uuid.uuid4().hex[:8]}")
+    fn, started, release, calls = _blocking(error=ConnectionError("上游连接失败"))
+    threads, results, errors = _call_in_threads(group, "600000", fn, started, 3)
+    release.set()
+    _join(threads)
+    assert len(calls) == 1 and not results
+    assert len(errors) == 3 and all(isinstance(e, ConnectionError) for e in errors)
+    assert group.stats()["errors"] == 1
+    # 调用结束后不保留结果，下一次调用重新执行
+    assert group.do("600000", lambda: "retry") == "retry"
+
+
+def test_decorator_keys_on_arguments():
+    name = f"test_{uuid.uuid4().hex[:8]}"
+    calls = []
+
+    @single_flight(name)
+    def load(code, options=None):
+        calls.append((code, options))
+        return code
+
+    assert load("600000", options={"a": [1, 2]}) == "600000"   # 不可哈希的参数按内容比较
+    assert load("600001") == "600001"
+    assert calls == [("600000", {"a": [1, 2]}), ("600001", None)]
+    assert get_single_flight_stats()[name]["executions"] == 2
+
+
+def test_concurrent_analyses_are_coalesced(replay, replay_root):
+    code = replay_root[1]["stocks"][0]
+    replay.latency = 0.2
+    before = analyze_stock.single_flight.stats()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(analyze_stock(code))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    _join(threads)
+    after = analyze_stock.single_flight.stats()
+    assert len(results) == 4 and "错误" not in results[0]
+    assert after["executions"] - before["executions"] < 4
+    assert after["coalesced"] > before["coalesced"]
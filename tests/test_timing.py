@@ -0,0 +1,44 @@
+import time
+from timing import StageTimer, TIMING_KEY, set_stage_listener
+from advisor_stock import analyze_stock
+from advisor_fund import analyze_fund_enhanced
+
+
+def test_spans_are_recorded_in_order():
+    timer = StageTimer(True)
+    with timer.span("a"):
+        time.sleep(0.01)
+    with timer.span("b"):
+        pass
+    result = timer.attach({}, "test")
+    report = result[TIMING_KEY]
+    assert [s["阶段"] for s in report["阶段"]] == ["a", "b"]
+    assert report["阶段"][0]["耗时(ms)"] >= 10
+    assert report["总耗时(ms)"] >= report["阶段"][0]["耗时(ms)"]
+
+
+def test_disabled_timer_adds_nothing():
+    timer = StageTimer(False)
+    with timer.span("a"):
+        pass
+    assert timer.spans == [] and timer.attach({"x": 1}, "test") == {"x": 1}
+
+
+def test_listener_sees_stages_even_when_disabled():
+    seen = []
+    previous = set_stage_listener(seen.append)
+    try:
+        with StageTimer(False).span("a"):
+            pass
+    finally:
+        set_stage_listener(previous)
+    assert seen == ["a"]
+
+
+def test_analysis_results_carry_timing(replay, replay_root):
+    stock = analyze_stock(replay_root[1]["stocks"][0], timing=True)
+    assert [s["阶段"] for s in stock[TIMING_KEY]["阶段"]] == \
+        ["基本信息", "日线获取", "周线重采样", "基准指数", "指标计算", "投资建议"]
+    fund = analyze_fund_enhanced(replay_root[1]["funds"][0], timing=True)
+    assert [s["阶段"] for s in fund[TIMING_KEY]["阶段"]][:3] == ["基本信息", "净值获取", "周线重采样"]
+    assert TIMING_KEY not in analyze_stock(replay_root[1]["stocks"][0], timing=False)
@@ -0,0 +1,45 @@
+from datetime import date, datetime, time
+from trading_calendar import (is_trading_day, previous_trading_day, next_trading_day, last_publish, next_publish,
+                              current_session, is_fresh_since, FUND_NAV_TIME)
+
+
+def test_weekends_and_holidays_are_closed():
+    assert is_trading_day(date(2024, 9, 30))
+    assert not is_trading_day(date(2024, 10, 1))        # 国庆节
+    assert not is_trading_day(date(2024, 10, 5))        # 周六
+    assert next_trading_day(date(2024, 9, 30)) == date(2024, 10, 8)
+    assert previous_trading_day(date(2024, 10, 8)) == date(2024, 9, 30)
+
+
+def test_sessions_switch_at_publish_time():
+    assert current_session(datetime(2024, 6, 28, 14, 59)) == "2024-06-27"   # 盘中归入上一个交易日
+    assert current_session(datetime(2024, 6, 28, 15, 0)) == "2024-06-28"
+    assert current_session(datetime(2024, 6, 30, 10, 0)) == "2024-06-28"    # 周末
+    assert current_session(datetime(2024, 6, 28, 20, 0), FUND_NAV_TIME) == "2024-06-27"
+    assert current_session(datetime(2024, 6, 28, 21, 30), FUND_NAV_TIME) == "2024-06-28"
+    assert next_publish(datetime(2024, 9, 30, 16, 0)) == datetime(2024, 10, 8, 15, 0)
+    assert last_publish(datetime(2024, 10, 3, 12, 0)) == datetime(2024, 9, 30, 15, 0)
+
+
+def test_cache_stays_fresh_until_next_close():
+    fetched = datetime(2024, 9, 30, 15, 30)
+    # 国庆长假期间不会过期
+    assert is_fresh_since(fetched, "2024-09-30", now=datetime(2024, 10, 7, 20, 0))
+    assert not is_fresh_since(fetched, "2024-09-30", now=datetime(2024, 10, 8, 15, 1))
+    # 盘中抓取的数据收盘后过期
+    assert not is_fresh_since(datetime(2024, 9, 30, 10, 0), "2024-09-30", now=datetime(2024, 9, 30, 15, 1))
+
+
+def test_late_publication_is_retried_within_lag_window():
+    fetched = datetime(2024, 9, 30, 15, 5)   # 已过收盘但数据源还没有当天数据
+    assert is_fresh_since(fetched, "2024-09-27", now=datetime(2024, 9, 30, 15, 20))
+    assert not is_fresh_since(fetched, "2024-09-27", now=datetime(2024, 9, 30, 15, 40))
+    # 发布后超过 lag_window_hours 仍没有当天数据（停牌等），不再重试
+    assert is_fresh_since(datetime(2024, 9, 30, 20, 0), "2024-09-27", now=datetime(2024, 9, 30, 22, 0))
+
+
+def test_fund_nav_publish_time():
+    fetched = datetime(2024, 6, 28, 16, 0)
+    assert is_fresh_since(fetched, "2024-06-27", now=datetime(2024, 6, 28, 20, 59), publish_time=FUND_NAV_TIME)
+    assert not is_fresh_since(fetched, "2024-06-27", now=datetime(2024, 6, 28, 21, 1), publish_time=FUND_NAV_TIME)
+    assert FUND_NAV_TIME == time(21, 0)
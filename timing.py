@@ -0,0 +1,69 @@
+"""
+分阶段耗时统计
+在分析流程的各个阶段外包一层 span，结束后汇总为结果中的「耗时统计」并写入日志；
+关闭时 span 返回同一个空上下文，几乎没有额外开销
+"""
+
+import time
+from contextlib import contextmanager, nullcontext
+from config import LOGGING_CONFIG
+from app_logging import get_logger
+
+TIMING_KEY = "耗时统计"
+
+_NULL_SPAN = nullcontext()
+_logger = get_logger("timing")
+_stage_listener = None   # 每进入一个阶段时调用 listener(阶段名)，用于任务进度上报
+
+
+def set_stage_listener(listener):
+    """设置本进程的阶段监听函数（None 表示取消），返回之前的监听函数"""
+    global _stage_listener
+    previous, _stage_listener = _stage_listener, listener
+    return previous
+
+
+class StageTimer:
+    """
+    记录一次分析中各阶段的耗时
+    :param enabled: 是否计时，None 时取 LOGGING_CONFIG['timing']
+    """
+
+    def __init__(self, enabled: bool = None):
+        self.enabled = LOGGING_CONFIG.get('timing', False) if enabled is None else enabled
+        self.spans = []
+        self._start = time.perf_counter() if self.enabled else 0.0
+
+    def span(self, name: str):
+        """with timer.span("阶段名"): ... ；关闭时返回空上下文"""
+        if _stage_listener is not None:
+            _stage_listener(name)
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, (time.perf_counter() - start) * 1000))
+
+    def report(self) -> dict:
+        """汇总为 {"总耗时(ms)": ..., "阶段": [{"阶段": 名称, "耗时(ms)": ...}, ...]}"""
+        total = (time.perf_counter() - self._start) * 1000
+        return {
+            "总耗时(ms)": round(total, 2),
+            "阶段": [{"阶段": name, "耗时(ms)": round(ms, 2)} for name, ms in self.spans],
+        }
+
+    def attach(self, result: dict, label: str) -> dict:
+        """计时开启时把汇总写入 result[TIMING_KEY] 并记录日志，返回 result"""
+        if not self.enabled or not isinstance(result, dict):
+            return result
+        report = self.report()
+        result[TIMING_KEY] = report
+        stages = ", ".join(f"{s['阶段']} {s['耗时(ms)']:.1f}ms" for s in report["阶段"])
+        _logger.info(f"{label} 总耗时 {report['总耗时(ms)']:.1f}ms | {stages}")
+        return result
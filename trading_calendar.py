@@ -0,0 +1,122 @@
+"""
+A股交易日历与缓存新鲜度
+日线（及由其重采样的 W-FRI 周线）只在交易日收盘后更新，基金净值在当晚公布后更新；
+在两次数据发布之间，缓存中的数据不可能过期。节假日从本地日历文件读取
+（CALENDAR_CONFIG['holiday_file']，每行一个 YYYY-MM-DD，# 开头为注释），周末总是休市
+"""
+
+import os
+import threading
+from datetime import datetime, date, time, timedelta
+from typing import Optional
+from config import BASE_DIR, CALENDAR_CONFIG
+
+_lock = threading.Lock()
+_holidays = None   # frozenset[date]
+
+
+def _parse_time(value: str) -> time:
+    hour, minute = value.split(":")
+    return time(int(hour), int(minute))
+
+
+MARKET_CLOSE = _parse_time(CALENDAR_CONFIG['market_close'])
+FUND_NAV_TIME = _parse_time(CALENDAR_CONFIG['fund_nav_time'])
+
+
+# ===================== 节假日 =====================
+def load_holidays(path: str = None) -> frozenset:
+    """读取节假日文件；文件不存在时视为没有节假日（只排除周末）"""
+    if path is None:
+        path = os.path.join(BASE_DIR, CALENDAR_CONFIG['holiday_file'])
+    days = set()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    days.add(date.fromisoformat(line))
+    except OSError:
+        print(f"未找到交易日历文件 {path}，仅按周末判断休市")
+    return frozenset(days)
+
+
+def holidays() -> frozenset:
+    global _holidays
+    with _lock:
+        if _holidays is None:
+            _holidays = load_holidays()
+        return _holidays
+
+
+def reload_holidays(path: str = None):
+    """日历文件更新后重新读取"""
+    global _holidays
+    with _lock:
+        _holidays = load_holidays(path)
+
+
+def is_trading_day(day: date) -> bool:
+    return day.weekday() < 5 and day not in holidays()
+
+
+def previous_trading_day(day: date) -> date:
+    """day 之前（不含）最近的交易日"""
+    day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+
+def next_trading_day(day: date) -> date:
+    """day 之后（不含）最近的交易日"""
+    day += timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return day
+
+
+# ===================== 数据发布时间 =====================
+def last_publish(now: datetime = None, publish_time: time = None) -> datetime:
+    """now 之前最近一次数据发布的时刻（某个交易日的 publish_time，默认收盘）"""
+    now = now or datetime.now()
+    publish_time = publish_time or MARKET_CLOSE
+    day = now.date()
+    if not (is_trading_day(day) and now.time() >= publish_time):
+        day = previous_trading_day(day)
+    return datetime.combine(day, publish_time)
+
+
+def next_publish(now: datetime = None, publish_time: time = None) -> datetime:
+    """now 之后下一次数据发布的时刻"""
+    now = now or datetime.now()
+    publish_time = publish_time or MARKET_CLOSE
+    day = now.date()
+    if not (is_trading_day(day) and now.time() < publish_time):
+        day = next_trading_day(day)
+    return datetime.combine(day, publish_time)
+
+
+def current_session(now: datetime = None, publish_time: time = None) -> str:
+    """当前可用数据所属的交易日：最近一个已发布数据的交易日（盘中、周末和节假日归入上一个交易日）"""
+    return last_publish(now, publish_time).date().isoformat()
+
+
+def is_fresh_since(fetched_at: datetime, last_date: Optional[str] = None, now: datetime = None,
+                   publish_time: time = None) -> bool:
+    """
+    缓存新鲜度：抓取之后没有新的数据发布即为新鲜
+    :param last_date: 缓存中最后一条数据的日期（YYYY-MM-DD）
+    抓取时已过发布时间但数据源还没有当天数据（延迟发布、停牌、QDII 基金等）时，发布后的
+    CALENDAR_CONFIG['lag_window_hours'] 小时内每隔 lag_retry_minutes 分钟重试一次，之后不再重试；
+    盘中抓取的数据在收盘后一律过期
+    """
+    now = now or datetime.now()
+    published = last_publish(now, publish_time)
+    if fetched_at < published:
+        return False
+    if last_date is None or last_date >= published.date().isoformat():
+        return True
+    if now - published >= timedelta(hours=CALENDAR_CONFIG['lag_window_hours']):
+        return True
+    return now - fetched_at < timedelta(minutes=CALENDAR_CONFIG['lag_retry_minutes'])